@@ -1,12 +1,46 @@
 from django.contrib import admin
+from django.db.models import Prefetch, Q
+from healthcare.pagination import EstimatedCountPaginator
+from programs.cache import program_catalog
 from .models import Client, Enrollment
+from .search import get_search_backend
+
+class ProgramListFilter(admin.SimpleListFilter):
+    """Program filter whose choices come from the program catalog."""
+    title = 'program'
+    parameter_name = 'program'
+
+    def lookups(self, request, model_admin):
+        entries = sorted(program_catalog.entries().values(), key=lambda entry: entry.name)
+        return [(entry.pk, entry.name) for entry in entries]
+
+    def queryset(self, request, queryset):
+        if self.value() and self.value().isdigit():
+            return self.filter_program(queryset, int(self.value()))
+        return queryset
+
+    def filter_program(self, queryset, program_id):
+        return queryset.filter(program_id=program_id)
+
+class ClientProgramListFilter(ProgramListFilter):
+
+    def filter_program(self, queryset, program_id):
+        # A subquery rather than a join, so the changelist needs no DISTINCT.
+        return queryset.filter(id__in=Enrollment.objects.filter(program_id=program_id).values('client_id'))
+
+def search_client_ids(queryset, term, limit):
+    return get_search_backend(queryset.db).search(term, limit=limit)
 
 @admin.register(Client)
 class ClientAdmin(admin.ModelAdmin):
     list_display = ('first_name', 'last_name', 'age', 'phone_number', 'area_of_residence', 'profession', 'get_enrolled_programs', 'created_at')
     search_fields = ('first_name', 'last_name', 'phone_number')
-    list_filter = ('area_of_residence', 'created_at', 'enrollments__program')
-    ordering = ('last_name', 'first_name')
+    list_filter = ('area_of_residence', 'created_at', ClientProgramListFilter)
+    ordering = ('last_name', 'first_name', 'id')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # Upper bound on search matches; the search backend ranks them.
+    search_limit = 1000
     fieldsets = (
         ('Personal Information', {
             'fields': ('first_name', 'last_name', 'age', 'phone_number')
@@ -17,14 +51,51 @@ class ClientAdmin(admin.ModelAdmin):
     )
     readonly_fields = ('created_at', 'updated_at')
 
+    def get_queryset(self, request):
+        enrollments = Enrollment.objects.order_by('client_id', 'enrolled_at', 'id')
+        return super().get_queryset(request).prefetch_related(Prefetch('enrollments', queryset=enrollments))
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(id__in=search_client_ids(queryset, search_term, self.search_limit)), False
+
     def get_enrolled_programs(self, obj):
-        return ", ".join([f"{enrollment.program.name} ({enrollment.enrollment_id})" for enrollment in obj.enrollments.all()])
+        return ", ".join([
+            f"{program_catalog.get(enrollment.program_id).name} ({enrollment.enrollment_id})"
+            for enrollment in obj.enrollments.all()
+        ])
     get_enrolled_programs.short_description = 'Enrolled Programs'
 
 @admin.register(Enrollment)
 class EnrollmentAdmin(admin.ModelAdmin):
-    list_display = ('enrollment_id', 'client', 'program', 'enrolled_at')
+    list_display = ('enrollment_id', 'client', 'get_program', 'enrolled_at')
     search_fields = ('enrollment_id', 'client__first_name', 'client__last_name', 'program__name')
-    list_filter = ('program', 'enrolled_at')
+    list_filter = (ProgramListFilter, 'enrolled_at')
+    list_select_related = ('client',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    search_limit = 1000
     raw_id_fields = ('client', 'program')
-    readonly_fields = ('enrollment_id', 'enrolled_at')
\ No newline at end of file
+    readonly_fields = ('enrollment_id', 'enrolled_at')
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Match the enrollment id exactly, clients through the client search
+        index and programs by name or short code from the catalog.
+        """
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        programs = [
+            entry.pk for entry in program_catalog.entries().values()
+            if term.lower() in entry.name.lower() or term.upper() == entry.short_code
+        ]
+        condition = Q(enrollment_id=term) | Q(client_id__in=search_client_ids(queryset, term, self.search_limit))
+        if programs:
+            condition |= Q(program_id__in=programs)
+        return queryset.filter(condition), False
+
+    @admin.display(description='Program', ordering='program__name')
+    def get_program(self, obj):
+        return program_catalog.get(obj.program_id).name
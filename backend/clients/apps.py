@@ -1,6 +1,27 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete, pre_save
 
 
 class ClientsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'clients'
+
+    def ready(self):
+        from . import dedup, profile_cache, stats, sync
+        from programs.models import Program
+        from .models import Client, Enrollment
+        from .search import install_search_index
+        post_migrate.connect(install_search_index, sender=self)
+        pre_save.connect(stats.enrollment_pre_save, sender=Enrollment, dispatch_uid='clients.stats.enrollment_pre_save')
+        post_save.connect(stats.enrollment_post_save, sender=Enrollment, dispatch_uid='clients.stats.enrollment_save')
+        post_delete.connect(stats.enrollment_post_delete, sender=Enrollment, dispatch_uid='clients.stats.enrollment_delete')
+        pre_save.connect(stats.client_pre_save, sender=Client, dispatch_uid='clients.stats.client_pre_save')
+        post_save.connect(stats.client_post_save, sender=Client, dispatch_uid='clients.stats.client_save')
+        pre_delete.connect(stats.client_pre_delete, sender=Client, dispatch_uid='clients.stats.client_pre_delete')
+        post_delete.connect(stats.client_post_delete, sender=Client, dispatch_uid='clients.stats.client_delete')
+        post_save.connect(dedup.client_post_save, sender=Client, dispatch_uid='clients.dedup.client_save')
+        for model, handler in ((Client, profile_cache.client_changed), (Enrollment, profile_cache.enrollment_changed)):
+            post_save.connect(handler, sender=model, dispatch_uid=f'clients.profile_cache.{model.__name__}_save')
+            post_delete.connect(handler, sender=model, dispatch_uid=f'clients.profile_cache.{model.__name__}_delete')
+        for model in (Client, Enrollment, Program):
+            post_delete.connect(sync.record_deletion, sender=model, dispatch_uid=f'clients.sync.{model.__name__}_delete')
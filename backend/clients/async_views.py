@@ -0,0 +1,67 @@
+"""
+Async versions of the client search and profile endpoints, for ASGI
+deployments. They return the same payloads and headers as the
+ClientViewSet actions; see healthcare.async_api.
+"""
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from healthcare.async_api import async_api_view, json_response
+from healthcare.executor import blocking_executor
+from healthcare.instrumentation import timed_serialization
+from programs.cache import program_catalog
+from .models import Client
+from .profile_cache import acache_profile, aget_cached_profile, aprofile_validators, patch_profile_headers
+from .search import get_search_backend
+from .serializers import ClientSerializer
+from .views import ClientViewSet, enrollments_prefetch, search_params
+
+
+async def serializer_context(clients):
+    """
+    The serializer context for ``clients``, with every program they are
+    enrolled in resolved here rather than looked up, synchronously, by
+    CatalogProgramField.
+    """
+    program_ids = {enrollment.program_id for client in clients for enrollment in client.enrollments.all()}
+    entries = await program_catalog.aentries()
+    return {'program_catalog': {**entries, **await program_catalog.aget_many(program_ids)}}
+
+
+@async_api_view
+async def search(request):
+    if not request.query_params.get('q'):
+        return {"results": []}
+    query, limit, offset = search_params(
+        request.query_params, ClientViewSet.search_limit, ClientViewSet.max_search_limit
+    )
+    queryset = Client.objects.prefetch_related(enrollments_prefetch())
+    # The backends run raw SQL, which has no async API.
+    ids = await blocking_executor.run(get_search_backend(queryset.db).search, query, limit=limit, offset=offset)
+    clients = {client.pk: client async for client in queryset.filter(pk__in=ids)}
+    clients = [clients[pk] for pk in ids if pk in clients]
+    serializer = ClientSerializer(clients, many=True, context=await serializer_context(clients))
+    with timed_serialization():
+        data = serializer.data
+    return {"results": data}
+
+
+@async_api_view
+async def profile(request, pk):
+    validators = await aprofile_validators(pk)
+    if validators is None:
+        raise Http404
+    etag, last_modified = validators
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        data = await aget_cached_profile(pk, etag)
+        if data is None:
+            try:
+                client = await Client.objects.prefetch_related(enrollments_prefetch()).aget(pk=pk)
+            except Client.DoesNotExist:
+                raise Http404
+            serializer = ClientSerializer(client, context=await serializer_context([client]))
+            with timed_serialization():
+                data = serializer.data
+            await acache_profile(pk, etag, data)
+        response = json_response(data)
+    return patch_profile_headers(response, etag, last_modified)
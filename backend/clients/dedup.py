@@ -0,0 +1,288 @@
+"""
+Duplicate client detection.
+
+Comparing every client with every other is quadratic. Instead each client
+gets a few blocking keys, stored in ClientBlockingKey and kept current on
+save (bulk paths call index_clients()):
+
+    phone:<normalized phone>
+    name:<soundex(last)>:<soundex(first)>:a<age // 10>
+    name:<soundex(last)>:<soundex(first)>:b<(age + 5) // 10>
+
+The two age bandings overlap, so clients whose ages differ by at most five
+years share a name key. Only clients that share a key (a block) are
+compared, which keeps the work proportional to the number of clients
+as long as blocks stay small. Blocks above MAX_BLOCK_SIZE (a placeholder
+phone number used at intake, say) are skipped and reported rather than
+compared pairwise.
+
+Candidate pairs are scored from phone, name (Jaro-Winkler) and age
+agreement; pairs at or above the minimum score are returned as merge
+suggestions, with the reasons behind the score.
+"""
+from collections import defaultdict
+from functools import lru_cache
+from django.db import router, transaction
+from django.db.models import Count
+
+MAX_BLOCK_SIZE = 500
+DEFAULT_MIN_SCORE = 0.7
+# Clients whose records are loaded at a time during a full scan.
+SCAN_BATCH_SIZE = 5000
+RECORD_FIELDS = ['id', 'first_name', 'last_name', 'age', 'normalized_phone']
+MIN_PHONE_DIGITS = 7
+# Score of an exact phone match, of each name (scaled by its Jaro-Winkler
+# similarity) and of ages within a year (half as much within five years).
+PHONE_WEIGHT = 0.3
+NAME_WEIGHT = 0.3
+AGE_WEIGHT = 0.1
+
+SOUNDEX_CODES = {
+    **dict.fromkeys('BFPV', '1'), **dict.fromkeys('CGJKQSXZ', '2'), **dict.fromkeys('DT', '3'),
+    'L': '4', **dict.fromkeys('MN', '5'), 'R': '6',
+}
+
+
+@lru_cache(maxsize=65536)
+def soundex(name):
+    """American Soundex code of a name, e.g. ``soundex('Robert') == 'R163'``; '' if it has no letters."""
+    letters = [char for char in name.upper() if 'A' <= char <= 'Z']
+    if not letters:
+        return ''
+    code = letters[0]
+    previous = SOUNDEX_CODES.get(letters[0], '')
+    for char in letters[1:]:
+        digit = SOUNDEX_CODES.get(char, '')
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        # H and W do not separate letters with the same code; vowels do.
+        if char not in 'HW':
+            previous = digit
+    return code.ljust(4, '0')
+
+
+def blocking_keys(first_name, last_name, age, normalized_phone):
+    keys = []
+    if normalized_phone and len(normalized_phone) >= MIN_PHONE_DIGITS:
+        keys.append(f'phone:{normalized_phone}')
+    last, first = soundex(last_name or ''), soundex(first_name or '')
+    if last and first and age is not None:
+        keys.append(f'name:{last}:{first}:a{age // 10}')
+        keys.append(f'name:{last}:{first}:b{(age + 5) // 10}')
+    return keys
+
+
+def client_keys(client):
+    return blocking_keys(client.first_name, client.last_name, client.age, client.normalized_phone)
+
+
+def index_clients(clients, using=None):
+    """Add the blocking keys of clients written with bulk_create, which skips post_save."""
+    from .models import ClientBlockingKey
+
+    return ClientBlockingKey.objects.using(using or router.db_for_write(ClientBlockingKey)).bulk_create(
+        [ClientBlockingKey(client_id=client.pk, key=key) for client in clients for key in client_keys(client)],
+        batch_size=1000,
+    )
+
+
+def rebuild_blocking_keys(using=None, batch_size=SCAN_BATCH_SIZE):
+    """Recompute every client's blocking keys; returns the number of keys written."""
+    from .models import Client, ClientBlockingKey
+
+    using = using or router.db_for_write(ClientBlockingKey)
+    written = 0
+    with transaction.atomic(using=using):
+        ClientBlockingKey.objects.using(using).all().delete()
+        clients = Client.objects.using(using).order_by().only(*RECORD_FIELDS)
+        batch = []
+        for client in clients.iterator(chunk_size=batch_size):
+            batch.append(client)
+            if len(batch) >= batch_size:
+                written += len(index_clients(batch, using=using))
+                batch = []
+        written += len(index_clients(batch, using=using))
+    return written
+
+
+def client_post_save(sender, instance, created, raw=False, using=None, **kwargs):
+    """Keep a client's blocking keys in step with its name, age and phone."""
+    from .models import ClientBlockingKey
+
+    if raw:
+        return
+    keys = set(client_keys(instance))
+    existing = set() if created else set(
+        ClientBlockingKey.objects.using(using).filter(client=instance).values_list('key', flat=True)
+    )
+    if existing - keys:
+        ClientBlockingKey.objects.using(using).filter(client=instance, key__in=existing - keys).delete()
+    if keys - existing:
+        ClientBlockingKey.objects.using(using).bulk_create(
+            [ClientBlockingKey(client=instance, key=key) for key in sorted(keys - existing)]
+        )
+
+
+@lru_cache(maxsize=65536)
+def jaro_winkler(a, b):
+    """Jaro-Winkler similarity of two strings, from 0.0 to 1.0."""
+    if a == b:
+        return 1.0 if a else 0.0
+    if not a or not b:
+        return 0.0
+    window = max(max(len(a), len(b)) // 2 - 1, 0)
+    matched_b = [False] * len(b)
+    matches_a = []
+    for i, char in enumerate(a):
+        end = min(len(b), i + window + 1)
+        j = b.find(char, max(0, i - window), end)
+        while j != -1 and matched_b[j]:
+            j = b.find(char, j + 1, end)
+        if j != -1:
+            matched_b[j] = True
+            matches_a.append(char)
+    if not matches_a:
+        return 0.0
+    matches_b = [char for char, matched in zip(b, matched_b) if matched]
+    transpositions = sum(x != y for x, y in zip(matches_a, matches_b)) / 2
+    m = len(matches_a)
+    jaro = (m / len(a) + m / len(b) + (m - transpositions) / m) / 3
+    prefix = 0
+    for x, y in zip(a[:4], b[:4]):
+        if x != y:
+            break
+        prefix += 1
+    return jaro + prefix * 0.1 * (1 - jaro)
+
+
+def score_pair(a, b, min_score=0.0):
+    """
+    Return (score from 0 to 1, reasons) for two client records, or None if
+    the phone and age alone rule out reaching ``min_score``; the name
+    comparisons are by far the most expensive part.
+    """
+    reasons = []
+    score = 0.0
+    if a['normalized_phone'] and a['normalized_phone'] == b['normalized_phone']:
+        score += PHONE_WEIGHT
+        reasons.append('same phone number')
+    age_gap = abs(a['age'] - b['age'])
+    if age_gap <= 1:
+        score += AGE_WEIGHT
+        age_reason = 'same age' if not age_gap else 'age within a year'
+    elif age_gap <= 5:
+        score += AGE_WEIGHT / 2
+        age_reason = 'age within five years'
+    else:
+        age_reason = None
+    if score + 2 * NAME_WEIGHT < min_score:
+        return None
+    for field in ('first_name', 'last_name'):
+        similarity = jaro_winkler(a[field].strip().lower(), b[field].strip().lower())
+        score += NAME_WEIGHT * similarity
+        if similarity == 1.0:
+            reasons.append(f'same {field.replace("_", " ")}')
+        elif similarity >= 0.85:
+            reasons.append(f'similar {field.replace("_", " ")}')
+    if age_reason:
+        reasons.append(age_reason)
+    return round(score, 3), reasons
+
+
+def compare_block(records, min_score, seen):
+    """Yield suggestions for the pairs in one block not already in ``seen``."""
+    records = sorted(records, key=lambda record: record['id'])
+    for i, a in enumerate(records):
+        for b in records[i + 1:]:
+            pair = (a['id'], b['id'])
+            if pair in seen:
+                continue
+            seen.add(pair)
+            scored = score_pair(a, b, min_score)
+            if scored is not None and scored[0] >= min_score:
+                yield {'client_id': a['id'], 'duplicate_id': b['id'], 'score': scored[0], 'reasons': scored[1]}
+
+
+def find_duplicates_in_records(records, min_score=DEFAULT_MIN_SCORE, max_block_size=MAX_BLOCK_SIZE, stats=None):
+    """
+    Blocking and scoring over records held in memory (dicts with
+    RECORD_FIELDS); the same algorithm as find_duplicates(), without the
+    database. Returns (suggestions, skipped blocks as {key: size}); the
+    number of blocks and of pairs compared go in ``stats`` if a dict is given.
+    """
+    blocks = defaultdict(list)
+    for record in records:
+        for key in blocking_keys(record['first_name'], record['last_name'], record['age'], record['normalized_phone']):
+            blocks[key].append(record)
+    seen, suggestions, skipped = set(), [], {}
+    for key, members in blocks.items():
+        if len(members) > max_block_size:
+            skipped[key] = len(members)
+        elif len(members) > 1:
+            suggestions.extend(compare_block(members, min_score, seen))
+    if stats is not None:
+        stats.update(blocks=len(blocks), pairs=len(seen))
+    return suggestions, skipped
+
+
+def find_duplicates(min_score=DEFAULT_MIN_SCORE, max_block_size=MAX_BLOCK_SIZE, using=None, skipped=None):
+    """
+    Yield merge suggestions across the whole registry. Block membership is
+    read from the key index in key order; client records are loaded for
+    SCAN_BATCH_SIZE clients' worth of blocks at a time. Oversized blocks are
+    added to ``skipped`` ({key: size}) if a dict is given.
+    """
+    from .models import Client, ClientBlockingKey
+
+    keys = ClientBlockingKey.objects.using(using)
+    sizes = keys.order_by().values('key').annotate(size=Count('id')).filter(size__gt=1)
+    if skipped is not None:
+        skipped.update(sizes.filter(size__gt=max_block_size).values_list('key', 'size'))
+    members = (
+        keys.filter(key__in=sizes.filter(size__lte=max_block_size).values('key'))
+        .order_by('key', 'client_id')
+        .values_list('key', 'client_id')
+    )
+
+    seen = set()
+
+    def compare(batch):
+        ids = {client_id for block in batch.values() for client_id in block}
+        records = {row['id']: row for row in Client.objects.using(using).filter(id__in=ids).values(*RECORD_FIELDS)}
+        for block in batch.values():
+            yield from compare_block([records[client_id] for client_id in block if client_id in records], min_score, seen)
+
+    batch, batch_clients = defaultdict(list), 0
+    for key, client_id in members.iterator(chunk_size=10000):
+        if key not in batch and batch_clients >= SCAN_BATCH_SIZE:
+            yield from compare(batch)
+            batch, batch_clients = defaultdict(list), 0
+        batch[key].append(client_id)
+        batch_clients += 1
+    if batch:
+        yield from compare(batch)
+
+
+def duplicates_of(client, min_score=DEFAULT_MIN_SCORE, max_block_size=MAX_BLOCK_SIZE, using=None):
+    """Suggestions pairing one client with the other members of its blocks, best first."""
+    from .models import Client, ClientBlockingKey
+
+    keys = ClientBlockingKey.objects.using(using)
+    own_keys = keys.filter(client=client).values('key')
+    sizes = dict(keys.filter(key__in=own_keys).order_by().values('key').annotate(size=Count('id')).values_list('key', 'size'))
+    blocks = [key for key, size in sizes.items() if 1 < size <= max_block_size]
+    candidates = (
+        Client.objects.using(using)
+        .filter(id__in=keys.filter(key__in=blocks).exclude(client=client).values('client_id'))
+        .values(*RECORD_FIELDS)
+    )
+    own = {field: getattr(client, field) for field in RECORD_FIELDS}
+    suggestions = []
+    for record in candidates:
+        scored = score_pair(own, record, min_score)
+        if scored is not None and scored[0] >= min_score:
+            suggestions.append({'client_id': client.pk, 'duplicate_id': record['id'], 'score': scored[0], 'reasons': scored[1]})
+    suggestions.sort(key=lambda suggestion: (-suggestion['score'], suggestion['duplicate_id']))
+    return suggestions
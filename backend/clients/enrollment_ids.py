@@ -0,0 +1,75 @@
+import string
+from collections import defaultdict
+from django.db import IntegrityError, router, transaction
+from django.db.models import F
+from django.utils import timezone
+from programs.cache import program_catalog
+
+ALPHABET = string.ascii_letters + string.digits
+WIDTH = 8
+SPACE = len(ALPHABET) ** WIDTH
+# Multiplying by a constant coprime with SPACE permutes [0, SPACE), so
+# distinct counters always encode to distinct suffixes while consecutive
+# enrollments still get unrelated-looking ids.
+MULTIPLIER = 134941606347813
+OFFSET = 11
+
+
+def encode_counter(value):
+    """Encode a counter as a fixed-width suffix, e.g. 1 -> 'MtSX2vfg'."""
+    value = (value * MULTIPLIER + OFFSET) % SPACE
+    chars = []
+    for _ in range(WIDTH):
+        value, index = divmod(value, len(ALPHABET))
+        chars.append(ALPHABET[index])
+    return ''.join(reversed(chars))
+
+
+def allocate_counters(program_id, year, count=1):
+    """
+    Reserve ``count`` consecutive counters for a program and year and return
+    them as a range. The counter row is bumped with a single UPDATE before it
+    is read back, so the row (or, on SQLite, the database) is write-locked for
+    the rest of the transaction and concurrent allocators get disjoint blocks.
+    """
+    from .models import EnrollmentSequence
+
+    sequences = EnrollmentSequence.objects.filter(program_id=program_id, year=year)
+    with transaction.atomic(using=router.db_for_write(EnrollmentSequence), savepoint=False):
+        if not sequences.update(last_value=F('last_value') + count):
+            try:
+                with transaction.atomic(using=router.db_for_write(EnrollmentSequence)):
+                    EnrollmentSequence.objects.create(program_id=program_id, year=year, last_value=count)
+                return range(1, count + 1)
+            except IntegrityError:
+                # Another transaction created the row first; take the next block.
+                sequences.update(last_value=F('last_value') + count)
+        last_value = sequences.values_list('last_value', flat=True).get()
+    return range(last_value - count + 1, last_value + 1)
+
+
+def generate_enrollment_ids(program, count=1, year=None):
+    """
+    Return ``count`` new ids in the ``SHORTCODE/YEAR/xxxxxxxx`` format for a
+    Program or program catalog entry.
+    """
+    year = year or timezone.now().year
+    return [
+        f"{program.short_code}/{year}/{encode_counter(counter)}"
+        for counter in allocate_counters(program.pk, year, count)
+    ]
+
+
+def assign_enrollment_ids(enrollments):
+    """
+    Fill in ``enrollment_id`` on unsaved enrollments ahead of bulk_create,
+    allocating one block of counters per program.
+    """
+    by_program = defaultdict(list)
+    for enrollment in enrollments:
+        if not enrollment.enrollment_id:
+            by_program[enrollment.program_id].append(enrollment)
+    for program_id, pending in by_program.items():
+        ids = generate_enrollment_ids(program_catalog.get(program_id), len(pending))
+        for enrollment, enrollment_id in zip(pending, ids):
+            enrollment.enrollment_id = enrollment_id
@@ -0,0 +1,89 @@
+import csv
+import json
+from itertools import islice
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+from .fast_serializers import CLIENT_FIELDS, RowFormatter, serialize_clients
+
+EXPORT_CHUNK_SIZE = 2000
+CSV_COLUMNS = [
+    'id', 'first_name', 'last_name', 'age', 'phone_number', 'area_of_residence',
+    'profession', 'created_at', 'updated_at', 'programs', 'enrollment_ids',
+]
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Selects the CSV export through ?format=csv. Successful exports are
+    streamed by the view; this only renders error payloads.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return b'' if data is None else json.dumps(data, cls=JSONEncoder).encode()
+
+
+class NDJSONRenderer(CSVRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+class Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+def iter_chunks(queryset, chunk_size):
+    """
+    Yield lists of at most ``chunk_size`` clients. iterator() runs the
+    queryset's prefetches once per chunk, so enrollments are loaded in one
+    query per chunk and nothing outlives it.
+    """
+    rows = queryset.iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+        # Prefetching links each client and its enrollments both ways. Break
+        # the cycle so the chunk is freed now rather than by the cyclic GC.
+        for instance in chunk:
+            instance.__dict__.pop('_prefetched_objects_cache', None)
+
+
+def serialized_chunks(queryset, serializer_class, context, chunk_size=EXPORT_CHUNK_SIZE):
+    for chunk in iter_chunks(queryset, chunk_size):
+        yield serializer_class(chunk, many=True, context=context).data
+
+
+def fast_serialized_chunks(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """serialized_chunks() for ClientSerializer, built from value rows; see fast_serializers."""
+    formatter = RowFormatter()
+    rows = queryset.values(*CLIENT_FIELDS).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield serialize_clients(chunk, using=queryset.db, formatter=formatter)
+
+
+def stream_ndjson(chunks):
+    for data in chunks:
+        yield ''.join(json.dumps(row, cls=JSONEncoder, ensure_ascii=False) + '\n' for row in data)
+
+
+def stream_csv(chunks):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for data in chunks:
+        lines = []
+        for row in data:
+            enrollments = row['enrollments']
+            row['programs'] = ';'.join(e['program_short_code'] for e in enrollments)
+            row['enrollment_ids'] = ';'.join(e['enrollment_id'] for e in enrollments)
+            lines.append(writer.writerow([row[column] for column in CSV_COLUMNS]))
+        yield ''.join(lines)
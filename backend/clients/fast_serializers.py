@@ -0,0 +1,88 @@
+"""
+Read path for client and enrollment lists and exports.
+
+ClientSerializer and EnrollmentSerializer spend most of their time per
+field and per row: building field objects, walking attributes, formatting
+datetimes through the field machinery. For lists the same output is built
+here from .values() rows: one query for the page of clients and one for
+all of their enrollments, with program names and short codes from the
+program catalog, as CatalogProgramField does. The dicts have the same keys,
+in the same order, with the same values as the serializers' output;
+FastSerializationParityTests holds the two to byte-identical responses.
+"""
+from collections import defaultdict
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import serializers
+from programs.cache import program_catalog
+from .models import Enrollment
+from .serializers import ClientSerializer
+
+CLIENT_FIELDS = [name for name in ClientSerializer.Meta.fields if name != 'enrollments']
+CLIENT_DATETIMES = ['created_at', 'updated_at']
+# EnrollmentSerializer's fields without the catalog ones.
+ENROLLMENT_FIELDS = ['id', 'client_id', 'program_id', 'enrollment_id', 'enrolled_at']
+
+
+class RowFormatter:
+    """Turns value rows into serializer output, for the duration of one request or export."""
+
+    def __init__(self):
+        # Resolve the time zone once instead of per value, then format as
+        # DateTimeField does.
+        field_timezone = timezone.get_current_timezone() if settings.USE_TZ else None
+        self.datetime = serializers.DateTimeField(default_timezone=field_timezone).to_representation
+        self.programs = program_catalog.entries()
+
+    def program(self, program_id):
+        return self.programs.get(program_id) or program_catalog.get(program_id)
+
+    def enrollment(self, row):
+        program = self.program(row['program_id'])
+        return {
+            'id': row['id'],
+            'client_id': row['client_id'],
+            'program_id': row['program_id'],
+            'program_name': program.name if program else None,
+            'program_short_code': program.short_code if program else None,
+            'enrollment_id': row['enrollment_id'],
+            'enrolled_at': self.datetime(row['enrolled_at']),
+        }
+
+    def client_fields(self, row):
+        """The client's own fields, without its enrollments."""
+        data = {name: row[name] for name in CLIENT_FIELDS}
+        for name in CLIENT_DATETIMES:
+            data[name] = self.datetime(data[name])
+        return data
+
+    def client(self, row, enrollments):
+        data = self.client_fields(row)
+        data['enrollments'] = enrollments
+        return data
+
+
+def serialize_clients(rows, using=None, formatter=None):
+    """ClientSerializer(many=True).data for rows of ``.values(*CLIENT_FIELDS)``."""
+    formatter = formatter or RowFormatter()
+    enrollments = defaultdict(list)
+    if rows:
+        queryset = (
+            Enrollment.objects.using(using)
+            .filter(client_id__in=[row['id'] for row in rows])
+            .order_by('client_id', 'enrolled_at', 'id')
+            .values(*ENROLLMENT_FIELDS)
+        )
+        for row in queryset:
+            enrollments[row['client_id']].append(formatter.enrollment(row))
+    return [formatter.client(row, enrollments.get(row['id'], [])) for row in rows]
+
+
+def serialize_enrollments(rows, formatter=None):
+    """EnrollmentSerializer(many=True).data for rows of ``.values(*ENROLLMENT_FIELDS)``."""
+    formatter = formatter or RowFormatter()
+    return [formatter.enrollment(row) for row in rows]
+
+
+def fast_serialization_enabled():
+    return getattr(settings, 'FAST_READ_SERIALIZATION', True)
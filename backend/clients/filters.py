@@ -0,0 +1,70 @@
+"""
+Filters of GET /api/clients/ and /api/enrollments/ (see healthcare.filters).
+
+Both endpoints take the same parameters with the same meaning: age,
+area_of_residence, profession and created_* describe the client, program
+and enrolled_* an enrollment. On /api/clients/ the enrollment filters
+select clients with one enrollment matching all of them, e.g. clients
+enrolled in TB since March: ?program=TB&enrolled_since=2025-03-01.
+
+Every filter can be answered from an index, and QueryPlanTests checks
+that each combination is. Equality filters on the client lead an index
+that continues with the list ordering, so a page is read in order
+without a sort; ranges seek into an index of their own and the matches
+are sorted.
+"""
+from healthcare.filters import Filter, FilterSet, parse_integer, parse_timestamp
+from programs.cache import program_catalog
+
+
+def parse_program(value):
+    """A program id or short code (any case), as a program id."""
+    if value.isdigit():
+        return parse_integer(value)
+    for entry in program_catalog.entries().values():
+        if entry.short_code.lower() == value.lower():
+            return entry.pk
+    raise ValueError(value)
+
+
+def client_filters(prefix, enrollments):
+    """
+    The filters, with client fields under ``prefix`` and enrollment fields
+    under ``enrollments``.
+    """
+    return {
+        'age_min': Filter(
+            f'{prefix}age__gte', parse=parse_integer, error='Expected a whole number', help_text='Minimum age',
+            schema_type='integer',
+        ),
+        'age_max': Filter(
+            f'{prefix}age__lte', parse=parse_integer, error='Expected a whole number', help_text='Maximum age',
+            schema_type='integer',
+        ),
+        'area_of_residence': Filter(f'{prefix}area_of_residence', help_text='Area of residence, exactly'),
+        'profession': Filter(f'{prefix}profession', help_text='Profession, exactly'),
+        'created_since': Filter(
+            f'{prefix}created_at__gte', parse=parse_timestamp, error='Expected an ISO 8601 date or datetime',
+            help_text='Clients registered at or after this date or time',
+        ),
+        'created_before': Filter(
+            f'{prefix}created_at__lt', parse=parse_timestamp, error='Expected an ISO 8601 date or datetime',
+            help_text='Clients registered before this date or time',
+        ),
+        'program': Filter(
+            f'{enrollments}program_id', parse=parse_program, error='Expected a program id or short code',
+            help_text='Enrolled in this program (id or short code)',
+        ),
+        'enrolled_since': Filter(
+            f'{enrollments}enrolled_at__gte', parse=parse_timestamp, error='Expected an ISO 8601 date or datetime',
+            help_text='Enrolled at or after this date or time',
+        ),
+        'enrolled_before': Filter(
+            f'{enrollments}enrolled_at__lt', parse=parse_timestamp, error='Expected an ISO 8601 date or datetime',
+            help_text='Enrolled before this date or time',
+        ),
+    }
+
+
+ClientFilterSet = type('ClientFilterSet', (FilterSet,), client_filters('', 'enrollments__'))
+EnrollmentFilterSet = type('EnrollmentFilterSet', (FilterSet,), client_filters('client__', ''))
@@ -0,0 +1,191 @@
+import csv
+import json
+import os
+import time
+from itertools import islice
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from programs.cache import program_catalog
+from .dedup import index_clients
+from .enrollment_ids import assign_enrollment_ids
+from .models import Client, Enrollment
+from .stats import record_enrollments
+from .utils import normalize_phone
+
+IMPORT_FIELDS = ['first_name', 'last_name', 'age', 'phone_number', 'area_of_residence', 'profession']
+# Raised while reading records; UnicodeDecodeError and JSONDecodeError are ValueErrors.
+PARSE_ERRORS = (ValueError, csv.Error)
+
+
+class FileParseError(ValueError):
+    """
+    The file could not be read at record ``row``. The records before it
+    have been imported, as ``report`` shows.
+    """
+
+    def __init__(self, row, cause, report):
+        super().__init__(f"Could not parse row {row}: {cause}")
+        self.row = row
+        self.report = report
+
+
+def read_rows(stream, file_format):
+    """Yield one dict per record of a CSV (with header) or NDJSON text stream."""
+    if file_format == 'csv':
+        yield from csv.DictReader(stream)
+    elif file_format == 'ndjson':
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        raise ValueError(f"Unsupported format: {file_format}")
+
+
+def guess_format(filename):
+    extension = os.path.splitext(filename)[1].lower()
+    return 'ndjson' if extension in ('.ndjson', '.jsonl') else 'csv'
+
+
+class ClientImporter:
+    """
+    Imports client records a chunk at a time: rows are checked against the
+    Client field validators, duplicates (by normalized phone number, within
+    the chunk and against the database) are skipped, and each chunk's clients
+    and enrollments are written with bulk_create in one transaction.
+
+    With a checkpoint path, progress is saved after every committed chunk and
+    a later run with ``resume=True`` skips the rows already imported.
+
+    A record that cannot be parsed stops the import: the records read before
+    it are imported, then FileParseError is raised with the report.
+    """
+
+    def __init__(self, chunk_size=1000, checkpoint_path=None, resume=False, enroll=True, progress=None):
+        self.chunk_size = chunk_size
+        self.checkpoint_path = checkpoint_path
+        self.resume = resume
+        self.enroll = enroll
+        self.progress = progress
+        self.fields = {name: Client._meta.get_field(name) for name in IMPORT_FIELDS}
+        self.report = {
+            'rows': 0, 'created': 0, 'duplicates': 0, 'invalid': 0, 'enrollments': 0,
+            'errors': [], 'seconds': 0.0, 'rows_per_second': 0.0,
+        }
+
+    def run(self, stream, file_format):
+        started = time.monotonic()
+        rows = read_rows(stream, file_format)
+        skip = self.load_checkpoint()
+        if skip:
+            rows = islice(rows, skip, None)
+            self.report['rows'] = skip
+
+        failure = None
+        while failure is None:
+            chunk = []
+            try:
+                for row in islice(rows, self.chunk_size):
+                    chunk.append(row)
+            except PARSE_ERRORS as exc:
+                failure = exc
+            if not chunk:
+                break
+            self.import_chunk(chunk, first_row=self.report['rows'] + 1)
+            self.report['rows'] += len(chunk)
+            self.save_checkpoint()
+            self.report['seconds'] = time.monotonic() - started
+            self.report['rows_per_second'] = round(self.report['rows'] / self.report['seconds'], 1) if self.report['seconds'] else 0.0
+            if self.progress:
+                self.progress(self.report)
+        if failure is not None:
+            raise FileParseError(self.report['rows'] + 1, failure, self.report)
+        return self.report
+
+    def import_chunk(self, chunk, first_row):
+        short_codes = {entry.short_code: entry.pk for entry in program_catalog.entries().values()}
+        candidates = []
+        for row_number, row in enumerate(chunk, start=first_row):
+            client, program_ids, errors = self.clean_row(row, short_codes)
+            if errors:
+                self.report['invalid'] += 1
+                self.report['errors'].append({'row': row_number, 'errors': errors})
+            else:
+                candidates.append((client, program_ids))
+
+        existing = set(
+            Client.objects.filter(normalized_phone__in={client.normalized_phone for client, _ in candidates})
+            .values_list('normalized_phone', flat=True)
+        )
+        new = []
+        for client, program_ids in candidates:
+            if client.normalized_phone in existing:
+                self.report['duplicates'] += 1
+                continue
+            existing.add(client.normalized_phone)
+            new.append((client, program_ids))
+
+        with transaction.atomic():
+            clients = Client.objects.bulk_create([client for client, _ in new])
+            index_clients(clients)
+            enrollments = [
+                Enrollment(client=client, program_id=program_id)
+                for client, (_, program_ids) in zip(clients, new)
+                for program_id in program_ids
+            ]
+            assign_enrollment_ids(enrollments)
+            Enrollment.objects.bulk_create(enrollments)
+            record_enrollments(enrollments)
+        self.report['created'] += len(clients)
+        self.report['enrollments'] += len(enrollments)
+
+    def clean_row(self, row, short_codes):
+        """Return (unsaved client, program ids, errors) for one record."""
+        if not isinstance(row, dict):
+            return None, [], {'row': [f"Expected an object, got {type(row).__name__}"]}
+        values, errors = {}, {}
+        for name, field in self.fields.items():
+            raw = row.get(name)
+            raw = '' if raw is None else str(raw).strip()
+            try:
+                values[name] = field.clean(raw, None)
+            except ValidationError as exc:
+                errors[name] = exc.messages
+
+        program_ids = []
+        if self.enroll:
+            codes = row.get('programs') or []
+            if isinstance(codes, str):
+                codes = [code for code in codes.split(';') if code.strip()]
+            elif not isinstance(codes, list):
+                errors['programs'] = ["Expected a list of short codes"]
+                codes = []
+            for code in codes:
+                program_id = short_codes.get(str(code).strip())
+                if program_id is None:
+                    errors.setdefault('programs', []).append(f"Unknown program short code: {code}")
+                elif program_id not in program_ids:
+                    program_ids.append(program_id)
+
+        if errors:
+            return None, [], errors
+        client = Client(**values)
+        client.normalized_phone = normalize_phone(client.phone_number)
+        return client, program_ids, None
+
+    def load_checkpoint(self):
+        if not (self.resume and self.checkpoint_path and os.path.exists(self.checkpoint_path)):
+            return 0
+        with open(self.checkpoint_path) as checkpoint:
+            saved = json.load(checkpoint)
+        for key in ('created', 'duplicates', 'invalid', 'enrollments'):
+            self.report[key] = saved.get(key, 0)
+        return saved['rows']
+
+    def save_checkpoint(self):
+        if not self.checkpoint_path:
+            return
+        state = {key: self.report[key] for key in ('rows', 'created', 'duplicates', 'invalid', 'enrollments')}
+        partial = f'{self.checkpoint_path}.tmp'
+        with open(partial, 'w') as checkpoint:
+            json.dump(state, checkpoint)
+        os.replace(partial, self.checkpoint_path)
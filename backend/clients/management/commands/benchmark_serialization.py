@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from clients.fast_serializers import CLIENT_FIELDS, serialize_clients
+from clients.models import Client
+from clients.serializers import ClientSerializer
+from clients.views import enrollments_prefetch
+from healthcare.renderers import FastJSONRenderer
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure rows/sec of the client list read path: ClientSerializer with JSONRenderer '
+        'against value rows with FastJSONRenderer, over clients already in the database. '
+        'Fails if the two render different bytes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help='Clients per run (default 5000).')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per path; the best is reported (default 3).')
+
+    def handle(self, *args, **options):
+        queryset = Client.objects.order_by('last_name', 'first_name', 'id')[:options['rows']]
+        rows = queryset.count()
+        if not rows:
+            raise CommandError('The database has no clients; import or seed some first.')
+
+        def serializer_path():
+            clients = list(queryset.prefetch_related(enrollments_prefetch()))
+            return JSONRenderer().render(ClientSerializer(clients, many=True).data)
+
+        def fast_path():
+            return FastJSONRenderer().render(serialize_clients(list(queryset.values(*CLIENT_FIELDS))))
+
+        results = {}
+        for name, path in (('serializer', serializer_path), ('fast', fast_path)):
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                body = path()
+                timings.append(time.perf_counter() - started)
+            results[name] = (min(timings), body)
+            self.stdout.write(f'{name:<10} {rows / min(timings):>10.0f} rows/sec  ({len(body)} bytes)')
+
+        if results['fast'][1] != results['serializer'][1]:
+            raise CommandError('The fast path rendered different bytes from ClientSerializer')
+        self.stdout.write(self.style.SUCCESS(
+            f"Identical output, {results['serializer'][0] / results['fast'][0]:.1f}x faster"
+        ))
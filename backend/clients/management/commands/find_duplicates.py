@@ -0,0 +1,49 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from clients.dedup import DEFAULT_MIN_SCORE, MAX_BLOCK_SIZE, find_duplicates, rebuild_blocking_keys
+
+
+class Command(BaseCommand):
+    help = (
+        'List likely duplicate clients with a score and the reasons behind it. Only clients '
+        'sharing a blocking key (phone number, or phonetic name and age band) are compared.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-score', type=float, default=DEFAULT_MIN_SCORE,
+            help=f'Lowest score to report, from 0 to 1 (default {DEFAULT_MIN_SCORE}).',
+        )
+        parser.add_argument(
+            '--max-block-size', type=int, default=MAX_BLOCK_SIZE,
+            help=f'Skip (and report) blocks with more clients than this (default {MAX_BLOCK_SIZE}).',
+        )
+        parser.add_argument('--json', action='store_true', help='Write one JSON suggestion per line.')
+        parser.add_argument(
+            '--reindex', action='store_true',
+            help='Recompute every blocking key first, e.g. after changing clients with raw SQL.',
+        )
+
+    def handle(self, *args, **options):
+        if not 0 <= options['min_score'] <= 1:
+            raise CommandError('--min-score must be between 0 and 1')
+        if options['reindex']:
+            written = rebuild_blocking_keys()
+            self.stderr.write(f'Wrote {written} blocking keys')
+
+        skipped = {}
+        found = 0
+        for suggestion in find_duplicates(options['min_score'], options['max_block_size'], skipped=skipped):
+            found += 1
+            if options['json']:
+                self.stdout.write(json.dumps(suggestion))
+            else:
+                self.stdout.write(
+                    f"{suggestion['client_id']} ~ {suggestion['duplicate_id']}  {suggestion['score']:.3f}  "
+                    f"{', '.join(suggestion['reasons'])}"
+                )
+        for key, size in sorted(skipped.items()):
+            self.stderr.write(self.style.WARNING(f'Skipped block {key} with {size} clients'))
+        self.stderr.write(self.style.SUCCESS(f'{found} suggested duplicates'))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from clients.importer import ClientImporter, guess_format
+
+
+class Command(BaseCommand):
+    help = 'Import clients (and optionally their enrollments) from a CSV or NDJSON file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file with a header row, or NDJSON with one client per line.')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help='Defaults to the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows validated and written per transaction.')
+        parser.add_argument('--checkpoint', help='Progress file. Defaults to <path>.checkpoint.json.')
+        parser.add_argument('--resume', action='store_true', help='Skip the rows recorded in the checkpoint.')
+        parser.add_argument('--no-enrollments', action='store_true', help='Ignore the programs column.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        importer = ClientImporter(
+            chunk_size=options['chunk_size'],
+            checkpoint_path=options['checkpoint'] or f'{path}.checkpoint.json',
+            resume=options['resume'],
+            enroll=not options['no_enrollments'],
+            progress=self.write_progress,
+        )
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as stream:
+                report = importer.run(stream, options['format'] or guess_format(path))
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        for error in report['errors']:
+            self.stderr.write(f"row {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['created']} clients and {report['enrollments']} enrollments from {report['rows']} rows "
+            f"({report['duplicates']} duplicates, {report['invalid']} invalid) at {report['rows_per_second']} rows/sec"
+        ))
+
+    def write_progress(self, report):
+        self.stdout.write(
+            f"rows={report['rows']} created={report['created']} duplicates={report['duplicates']} "
+            f"invalid={report['invalid']} rows/sec={report['rows_per_second']}"
+        )
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from clients.sync import prune_tombstones, sync_setting
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the sync feed's records of deleted clients, enrollments and programs older than "
+        "SYNC_FEED['TOMBSTONE_DAYS']. Run daily; cursors older than that must sync from scratch."
+    )
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted} tombstones older than {sync_setting('TOMBSTONE_DAYS')} days"
+        ))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from clients.stats import check_stats, rebuild_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per program, area and month enrollment counts behind /api/programs/stats/.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Compare the stored counts with Enrollment without changing anything; fails on mismatch.',
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            mismatches = check_stats()
+            for (program_id, area, month), (stored, actual) in mismatches.items():
+                self.stdout.write(f"program={program_id} area={area} month={month:%Y-%m}: stored {stored}, actual {actual}")
+            if mismatches:
+                raise CommandError(f"{len(mismatches)} stat rows are out of date; run rebuild_enrollment_stats")
+            self.stdout.write(self.style.SUCCESS('Enrollment stats are consistent'))
+            return
+
+        rows = rebuild_stats()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(rows)} enrollment stat rows'))
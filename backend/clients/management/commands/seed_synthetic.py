@@ -0,0 +1,130 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from clients.dedup import index_clients
+from clients.enrollment_ids import assign_enrollment_ids
+from clients.models import Client, Enrollment
+from clients.stats import record_enrollments
+from clients.utils import normalize_phone
+from programs.models import Program
+
+FIRST_NAMES = [
+    'Achieng', 'Akinyi', 'Amina', 'Anne', 'Brian', 'Caroline', 'Daniel', 'David', 'Esther', 'Faith',
+    'Grace', 'Hassan', 'Irene', 'James', 'Jane', 'John', 'Joseph', 'Joy', 'Kevin', 'Lucy',
+    'Mary', 'Mercy', 'Michael', 'Mohamed', 'Nancy', 'Njeri', 'Otieno', 'Peter', 'Purity', 'Samuel',
+    'Sarah', 'Stephen', 'Wanjiku', 'Wambui', 'Wairimu', 'Ruth', 'Dennis', 'Collins', 'Brenda', 'Winnie',
+]
+LAST_NAMES = [
+    'Achieng', 'Atieno', 'Barasa', 'Chebet', 'Cheruiyot', 'Gitau', 'Kamau', 'Kariuki', 'Kibet', 'Kimani',
+    'Kiplagat', 'Koech', 'Langat', 'Macharia', 'Maina', 'Mohamed', 'Mugo', 'Mutai', 'Muthoni', 'Mutua',
+    'Mwangi', 'Mwende', 'Njoroge', 'Nyambura', 'Ochieng', 'Odhiambo', 'Omondi', 'Onyango', 'Otieno', 'Owino',
+    'Rotich', 'Wafula', 'Wambua', 'Wanjala', 'Wanjiru', 'Waweru', 'Were', 'Ali', 'Hassan', 'Juma',
+]
+AREAS = [
+    'Nairobi', 'Mombasa', 'Kisumu', 'Nakuru', 'Eldoret', 'Thika', 'Machakos', 'Nyeri', 'Meru', 'Kakamega',
+    'Kisii', 'Garissa', 'Malindi', 'Kitale', 'Naivasha', 'Embu', 'Bungoma', 'Kericho', 'Voi', 'Lamu',
+]
+# Areas are drawn with these weights, so a few are much larger than the rest.
+AREA_WEIGHTS = [30, 12, 10, 8, 6, 5, 4, 4, 3, 3, 3, 2, 2, 2, 2, 1, 1, 1, 1, 1]
+PROFESSIONS = ['', '', 'Farmer', 'Teacher', 'Trader', 'Nurse', 'Driver', 'Student', 'Mechanic', 'Tailor', 'Clerk']
+PROGRAMS = [
+    ('HIV Care', 'HIV'), ('Tuberculosis', 'TB'), ('Malaria', 'MAL'), ('Maternal Health', 'MCH'),
+    ('Diabetes', 'DM'), ('Hypertension', 'HTN'), ('Nutrition', 'NUT'), ('Immunization', 'IMM'),
+    ('Family Planning', 'FP'), ('Mental Health', 'MH'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Add synthetic clients, programs and enrollments for load testing and benchmarks, '
+        'written with bulk_create a batch at a time, with their blocking keys and enrollment '
+        'stats. Use a development or benchmark database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=10000, help='Clients to add (default 10000).')
+        parser.add_argument('--programs', type=int, default=10, help='Programs to add (default 10).')
+        parser.add_argument(
+            '--max-enrollments', type=int, default=3,
+            help='Each client is enrolled in 0 to this many programs (default 3).',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000, help='Clients per transaction (default 5000).')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for a repeatable data set (default 0).')
+
+    def handle(self, *args, **options):
+        if options['clients'] < 0 or options['programs'] < 0 or options['batch_size'] < 1:
+            raise CommandError('--clients and --programs must not be negative, --batch-size must be positive')
+        rng = random.Random(options['seed'])
+        started = time.monotonic()
+
+        self.create_programs(options['programs'])
+        program_ids = list(Program.objects.values_list('id', flat=True))
+        if options['clients'] and options['max_enrollments'] and not program_ids:
+            raise CommandError('There are no programs to enroll clients in; pass --programs')
+
+        phones = self.phone_numbers(rng)
+        created = enrolled = 0
+        while created < options['clients']:
+            size = min(options['batch_size'], options['clients'] - created)
+            clients = [self.make_client(rng, next(phones)) for _ in range(size)]
+            with transaction.atomic():
+                clients = Client.objects.bulk_create(clients)
+                index_clients(clients)
+                enrollments = [
+                    Enrollment(client=client, program_id=program_id)
+                    for client in clients
+                    for program_id in rng.sample(program_ids, rng.randint(0, min(options['max_enrollments'], len(program_ids))))
+                ]
+                assign_enrollment_ids(enrollments)
+                Enrollment.objects.bulk_create(enrollments, batch_size=1000)
+                record_enrollments(enrollments)
+            created += len(clients)
+            enrolled += len(enrollments)
+            self.stderr.write(f'{created}/{options["clients"]} clients')
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Added {options["programs"]} programs, {created} clients and {enrolled} enrollments '
+            f'in {elapsed:.1f}s ({created / elapsed if elapsed else 0:.0f} clients/sec)'
+        ))
+
+    def create_programs(self, count):
+        names = set(Program.objects.values_list('name', flat=True))
+        codes = set(Program.objects.values_list('short_code', flat=True))
+        programs, n = [], 0
+        while len(programs) < count:
+            name, code = PROGRAMS[n % len(PROGRAMS)]
+            if n >= len(PROGRAMS):
+                name, code = f'{name} {n // len(PROGRAMS) + 1}', f'{code}{n // len(PROGRAMS) + 1}'
+            n += 1
+            if name not in names and code not in codes:
+                programs.append(Program(name=name, short_code=code, description=f'Synthetic {name} program'))
+        # Saved one by one so that the program catalog picks them up.
+        for program in programs:
+            program.save()
+
+    def phone_numbers(self, rng):
+        """Yield random mobile numbers that no client has yet."""
+        taken = set()
+        while True:
+            # A dict rather than a set keeps the order, and so the data set, repeatable.
+            batch = {normalize_phone(phone): phone for phone in (f'+2547{rng.randrange(10 ** 8):08d}' for _ in range(1000))}
+            existing = set(Client.objects.filter(normalized_phone__in=list(batch)).values_list('normalized_phone', flat=True))
+            for number, phone in batch.items():
+                if number not in existing and number not in taken:
+                    taken.add(number)
+                    yield phone
+
+    def make_client(self, rng, phone_number):
+        return Client(
+            first_name=rng.choice(FIRST_NAMES),
+            last_name=rng.choice(LAST_NAMES),
+            age=min(int(rng.expovariate(1 / 28)), 100),
+            phone_number=phone_number,
+            normalized_phone=normalize_phone(phone_number),
+            area_of_residence=rng.choices(AREAS, AREA_WEIGHTS)[0],
+            profession=rng.choice(PROFESSIONS),
+        )
@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2025-04-26 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0002_enrollment'),
+        ('programs', '0002_program_short_code'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='client',
+            options={'ordering': ['last_name', 'first_name', 'id']},
+        ),
+        migrations.AlterModelOptions(
+            name='enrollment',
+            options={'ordering': ['enrolled_at', 'id']},
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['last_name', 'first_name', 'id'], name='client_ordering_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['enrolled_at', 'id'], name='enrollment_ordering_idx'),
+        ),
+    ]
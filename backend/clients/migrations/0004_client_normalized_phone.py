@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2025-04-27 09:20
+
+from django.db import migrations, models
+
+from clients.utils import normalize_phone
+
+
+def populate_normalized_phone(apps, schema_editor):
+    Client = apps.get_model('clients', 'Client')
+    clients = list(Client.objects.using(schema_editor.connection.alias).only('id', 'phone_number'))
+    for client in clients:
+        client.normalized_phone = normalize_phone(client.phone_number)
+    Client.objects.using(schema_editor.connection.alias).bulk_update(
+        clients, ['normalized_phone'], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0003_keyset_ordering_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='normalized_phone',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=15),
+        ),
+        migrations.RunPython(populate_normalized_phone, migrations.RunPython.noop),
+    ]
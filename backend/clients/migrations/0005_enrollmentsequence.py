@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2025-04-28 14:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0004_client_normalized_phone'),
+        ('programs', '0002_program_short_code'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EnrollmentSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('last_value', models.PositiveBigIntegerField(default=0)),
+                ('program', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='programs.program')),
+            ],
+            options={
+                'unique_together': {('program', 'year')},
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2 on 2025-05-06 10:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from clients.stats import compute_stats
+
+
+def populate_enrollment_stats(apps, schema_editor):
+    Enrollment = apps.get_model('clients', 'Enrollment')
+    EnrollmentStat = apps.get_model('clients', 'EnrollmentStat')
+    alias = schema_editor.connection.alias
+    EnrollmentStat.objects.using(alias).bulk_create([
+        EnrollmentStat(program_id=program_id, area_of_residence=area, month=month, count=count)
+        for (program_id, area, month), count in compute_stats(Enrollment.objects.using(alias)).items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0005_enrollmentsequence'),
+        ('programs', '0002_program_short_code'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EnrollmentStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('area_of_residence', models.CharField(max_length=100)),
+                ('month', models.DateField()),
+                ('count', models.IntegerField(default=0)),
+                ('program', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='programs.program')),
+            ],
+            options={
+                'unique_together': {('program', 'area_of_residence', 'month')},
+            },
+        ),
+        migrations.RunPython(populate_enrollment_stats, migrations.RunPython.noop),
+    ]
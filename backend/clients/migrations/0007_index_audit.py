@@ -0,0 +1,41 @@
+# Generated by Django 5.2 on 2025-05-12 11:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0006_enrollmentstat'),
+        ('programs', '0002_program_short_code'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='enrollment',
+            name='client',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='enrollments', to='clients.client'),
+        ),
+        migrations.AlterField(
+            model_name='enrollment',
+            name='program',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='enrollments', to='programs.program'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['area_of_residence', 'last_name', 'first_name', 'id'], name='client_area_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['created_at'], name='client_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['client', 'enrolled_at', 'id'], name='enrollment_client_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['program', 'enrolled_at', 'id'], name='enrollment_program_idx'),
+        ),
+    ]
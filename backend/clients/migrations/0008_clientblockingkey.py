@@ -0,0 +1,46 @@
+# Generated by Django 5.2 on 2025-05-19 09:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from clients.dedup import blocking_keys
+
+
+def populate_blocking_keys(apps, schema_editor):
+    Client = apps.get_model('clients', 'Client')
+    ClientBlockingKey = apps.get_model('clients', 'ClientBlockingKey')
+    alias = schema_editor.connection.alias
+    rows = Client.objects.using(alias).values_list('id', 'first_name', 'last_name', 'age', 'normalized_phone')
+    batch = []
+    for client_id, first_name, last_name, age, normalized_phone in rows.iterator(chunk_size=5000):
+        batch.extend(
+            ClientBlockingKey(client_id=client_id, key=key)
+            for key in blocking_keys(first_name, last_name, age, normalized_phone)
+        )
+        if len(batch) >= 5000:
+            ClientBlockingKey.objects.using(alias).bulk_create(batch, batch_size=1000)
+            batch = []
+    ClientBlockingKey.objects.using(alias).bulk_create(batch, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0007_index_audit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientBlockingKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64)),
+                ('client', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='blocking_keys', to='clients.client')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['key', 'client'], name='blocking_key_idx')],
+                'unique_together': {('client', 'key')},
+            },
+        ),
+        migrations.RunPython(populate_blocking_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2 on 2025-05-23 14:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def copy_enrolled_at(apps, schema_editor):
+    Enrollment = apps.get_model('clients', 'Enrollment')
+    Enrollment.objects.using(schema_editor.connection.alias).update(updated_at=models.F('enrolled_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0008_clientblockingkey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(choices=[('client', 'Client'), ('enrollment', 'Enrollment'), ('program', 'Program')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['deleted_at', 'id'], name='tombstone_feed_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_enrolled_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['updated_at', 'id'], name='client_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['updated_at', 'id'], name='enrollment_updated_idx'),
+        ),
+    ]
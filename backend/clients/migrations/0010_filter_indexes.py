@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2025-05-26 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0009_sync_feed'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['profession', 'last_name', 'first_name', 'id'], name='client_profession_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['age'], name='client_age_idx'),
+        ),
+    ]
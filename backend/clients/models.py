@@ -1,9 +1,10 @@
-import random
-import string
-from django.db import models
-from django.core.validators import RegexValidator, MinValueValidator, MaxValueValidator
+from django.db import models, router, transaction
 from django.utils import timezone
+from django.core.validators import RegexValidator, MinValueValidator, MaxValueValidator
+from programs.cache import program_catalog
 from programs.models import Program
+from .enrollment_ids import generate_enrollment_ids
+from .utils import normalize_phone
 
 class Client(models.Model):
     first_name = models.CharField(max_length=50)
@@ -18,36 +19,139 @@ class Client(models.Model):
         max_length=15,
         validators=[RegexValidator(r'^\+?1?\d{9,15}$', 'Enter a valid phone number (e.g., +1234567890).')]
     )
+    normalized_phone = models.CharField(max_length=15, blank=True, editable=False, db_index=True)
     area_of_residence = models.CharField(max_length=100)
     profession = models.CharField(max_length=100, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    def save(self, *args, **kwargs):
+        self.normalized_phone = normalize_phone(self.phone_number)
+        # The enrollment stats are updated from post_save; keep them in the
+        # same transaction as the row.
+        using = kwargs.get('using') or router.db_for_write(Client, instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
 
     class Meta:
-        ordering = ['last_name', 'first_name']
+        ordering = ['last_name', 'first_name', 'id']
+        indexes = [
+            models.Index(fields=['last_name', 'first_name', 'id'], name='client_ordering_idx'),
+            # Filtering by area keeps the default ordering without a sort.
+            models.Index(fields=['area_of_residence', 'last_name', 'first_name', 'id'], name='client_area_idx'),
+            models.Index(fields=['profession', 'last_name', 'first_name', 'id'], name='client_profession_idx'),
+            # Range filters (see clients.filters).
+            models.Index(fields=['age'], name='client_age_idx'),
+            models.Index(fields=['created_at'], name='client_created_at_idx'),
+            # Range scans of the sync feed.
+            models.Index(fields=['updated_at', 'id'], name='client_updated_idx'),
+        ]
 
 class Enrollment(models.Model):
-    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='enrollments')
-    program = models.ForeignKey(Program, on_delete=models.CASCADE, related_name='enrollments')
+    # Both foreign keys are indexed together with the ordering columns below,
+    # so filtering by either returns rows already in order.
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='enrollments', db_index=False)
+    program = models.ForeignKey(Program, on_delete=models.CASCADE, related_name='enrollments', db_index=False)
     enrollment_id = models.CharField(max_length=50, unique=True, editable=False)
     enrolled_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def generate_enrollment_id(self):
-        year = timezone.now().year
-        random_chars = ''.join(random.choices(string.ascii_letters + string.digits, k=8))
-        return f"{self.program.short_code}/{year}/{random_chars}"
+        return generate_enrollment_ids(program_catalog.get(self.program_id))[0]
 
     def save(self, *args, **kwargs):
-        if not self.enrollment_id:
-            self.enrollment_id = self.generate_enrollment_id()
-        super().save(*args, **kwargs)
+        using = kwargs.get('using') or router.db_for_write(Enrollment, instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            if not self.enrollment_id:
+                self.enrollment_id = self.generate_enrollment_id()
+            super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"{self.client} in {self.program} ({self.enrollment_id})"
+        # The program name comes from the catalog so that listing enrollments
+        # (e.g. in the admin) does not fetch each program.
+        return f"{self.client} in {program_catalog.get(self.program_id).name} ({self.enrollment_id})"
 
     class Meta:
         unique_together = ('client', 'program')
-        ordering = ['enrolled_at']
\ No newline at end of file
+        ordering = ['enrolled_at', 'id']
+        indexes = [
+            models.Index(fields=['enrolled_at', 'id'], name='enrollment_ordering_idx'),
+            models.Index(fields=['client', 'enrolled_at', 'id'], name='enrollment_client_idx'),
+            models.Index(fields=['program', 'enrolled_at', 'id'], name='enrollment_program_idx'),
+            models.Index(fields=['updated_at', 'id'], name='enrollment_updated_idx'),
+        ]
+
+class EnrollmentSequence(models.Model):
+    """Per program and year counter behind the enrollment id suffixes."""
+    program = models.ForeignKey(Program, on_delete=models.CASCADE, related_name='+')
+    year = models.PositiveSmallIntegerField()
+    last_value = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.program_id}/{self.year}: {self.last_value}"
+
+    class Meta:
+        unique_together = ('program', 'year')
+
+class EnrollmentStat(models.Model):
+    """
+    Number of enrollments per program, client area of residence and month,
+    maintained by clients.stats as enrollments are created and deleted.
+    """
+    program = models.ForeignKey(Program, on_delete=models.CASCADE, related_name='+')
+    area_of_residence = models.CharField(max_length=100)
+    month = models.DateField()
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.program_id}/{self.area_of_residence}/{self.month:%Y-%m}: {self.count}"
+
+    class Meta:
+        unique_together = ('program', 'area_of_residence', 'month')
+
+class ClientBlockingKey(models.Model):
+    """
+    A blocking key of a client (phone number, or phonetic name and age
+    band), maintained by clients.dedup. Duplicate detection only compares
+    clients that share a key.
+    """
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='blocking_keys', db_index=False)
+    key = models.CharField(max_length=64)
+
+    def __str__(self):
+        return f"{self.client_id}: {self.key}"
+
+    class Meta:
+        unique_together = ('client', 'key')
+        indexes = [
+            models.Index(fields=['key', 'client'], name='blocking_key_idx'),
+        ]
+
+class Tombstone(models.Model):
+    """
+    A deleted client, enrollment or program, recorded by clients.sync so
+    that the sync feed can tell offline copies to drop it.
+    """
+    CLIENT = 'client'
+    ENROLLMENT = 'enrollment'
+    PROGRAM = 'program'
+    MODEL_CHOICES = [
+        (CLIENT, 'Client'),
+        (ENROLLMENT, 'Enrollment'),
+        (PROGRAM, 'Program'),
+    ]
+
+    model = models.CharField(max_length=10, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.model} {self.object_id} deleted at {self.deleted_at:%Y-%m-%d %H:%M:%S}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'id'], name='tombstone_feed_idx'),
+        ]
@@ -0,0 +1,131 @@
+"""
+Validators and an optional payload cache for the client profile endpoint.
+
+The ETag covers everything the profile renders: the client's updated_at,
+the number, latest enrolled_at and latest updated_at of its enrollments
+(moving an enrollment to another program changes only the last), and the
+program catalog version (program names and short codes are part of the
+payload). It is computed with one aggregate query, so a 304 response never
+loads or serializes the enrollments.
+
+Last-Modified is the latest updated_at of the client and its enrollments.
+Removing an enrollment or renaming a program changes the ETag but not that
+date. If-None-Match takes precedence over If-Modified-Since, so clients
+should revalidate with the ETag.
+
+With CLIENT_PROFILE_CACHE set to a cache alias, serialized payloads are
+stored under the client id together with their ETag and only served while
+the ETag still matches, so a stale entry is never returned even when a
+change bypassed the signals below (bulk_create, queryset.update()). The
+signal handlers evict entries as soon as a client or enrollment changes.
+"""
+import hashlib
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Max
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from programs.cache import program_catalog
+
+
+def validators_query(client_id):
+    from .models import Client
+
+    return (
+        Client.objects.filter(pk=client_id).order_by()
+        .values('updated_at')
+        .annotate(
+            latest=Max('enrollments__enrolled_at'),
+            changed=Max('enrollments__updated_at'),
+            enrollments=Count('enrollments'),
+        )
+    )
+
+
+def profile_validators(client_id):
+    """Return (etag, Last-Modified timestamp) for a client, or None if it does not exist."""
+    return make_validators(client_id, next(iter(validators_query(client_id)), None), program_catalog.version)
+
+
+async def aprofile_validators(client_id):
+    row = next(iter([row async for row in validators_query(client_id)]), None)
+    return make_validators(client_id, row, await program_catalog.aversion())
+
+
+def make_validators(client_id, row, catalog_version):
+    if row is None:
+        return None
+    latest, changed = row['latest'], row['changed']
+    # HTTP dates have whole seconds.
+    last_modified = int((max(row['updated_at'], changed) if changed else row['updated_at']).timestamp())
+    state = ':'.join(map(str, (client_id, row['updated_at'].isoformat(), row['enrollments'],
+                               latest and latest.isoformat(), changed and changed.isoformat(), catalog_version)))
+    return f'"{hashlib.sha1(state.encode()).hexdigest()}"', last_modified
+
+
+def profile_cache():
+    alias = getattr(settings, 'CLIENT_PROFILE_CACHE', None)
+    return caches[alias] if alias else None
+
+
+def cache_key(client_id):
+    return f'clients:profile:{client_id}'
+
+
+def get_cached_profile(client_id, etag):
+    cache = profile_cache()
+    return cached_payload(cache.get(cache_key(client_id)), etag) if cache else None
+
+
+async def aget_cached_profile(client_id, etag):
+    cache = profile_cache()
+    return cached_payload(await cache.aget(cache_key(client_id)), etag) if cache else None
+
+
+def cached_payload(entry, etag):
+    if entry is not None and entry[0] == etag:
+        return entry[1]
+    return None
+
+
+def cache_profile(client_id, etag, data):
+    cache = profile_cache()
+    if cache is not None:
+        cache.set(cache_key(client_id), (etag, data), cache_timeout())
+
+
+async def acache_profile(client_id, etag, data):
+    cache = profile_cache()
+    if cache is not None:
+        await cache.aset(cache_key(client_id), (etag, data), cache_timeout())
+
+
+def cache_timeout():
+    return getattr(settings, 'CLIENT_PROFILE_CACHE_TIMEOUT', 300)
+
+
+def patch_profile_headers(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # Browsers must revalidate every time, and shared caches must not keep it.
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Authorization'])
+    return response
+
+
+def evict_profile(client_id):
+    cache = profile_cache()
+    if cache is not None:
+        cache.delete(cache_key(client_id))
+
+
+def client_changed(sender, instance, raw=False, **kwargs):
+    """post_save/post_delete handler for Client."""
+    if not raw:
+        evict_profile(instance.pk)
+
+
+def enrollment_changed(sender, instance, raw=False, **kwargs):
+    """post_save/post_delete handler for Enrollment."""
+    if not raw:
+        evict_profile(instance.client_id)
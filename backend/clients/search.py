@@ -0,0 +1,183 @@
+import re
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.utils.module_loading import import_string
+from .models import Client
+from .utils import normalize_phone
+
+WORD = re.compile(r'\w+')
+PHONE_QUERY = re.compile(r'^\+?[\d\s()-]+$')
+
+BACKENDS = {
+    'sqlite': 'clients.search.SQLiteFTSBackend',
+    'postgresql': 'clients.search.PostgresSearchBackend',
+}
+
+
+def get_search_backend(using='default'):
+    """
+    Return the client search backend for a database alias: the
+    CLIENT_SEARCH_BACKEND setting if given, otherwise the indexed backend
+    for the database vendor, falling back to plain prefix lookups.
+    """
+    connection = connections[using]
+    path = getattr(settings, 'CLIENT_SEARCH_BACKEND', None) or BACKENDS.get(connection.vendor, 'clients.search.ORMSearchBackend')
+    return import_string(path)(using)
+
+
+def install_search_index(sender, using='default', **kwargs):
+    """post_migrate handler that creates or repairs the search index."""
+    get_search_backend(using).install()
+
+
+class BaseSearchBackend:
+    def __init__(self, using='default'):
+        self.using = using
+
+    @property
+    def connection(self):
+        return connections[self.using]
+
+    def install(self):
+        """Create the index structures. Must be idempotent."""
+
+    def search(self, query, limit=20, offset=0):
+        """Return the ids of matching clients, best match first."""
+        raise NotImplementedError
+
+    @staticmethod
+    def phone_prefix(query):
+        query = query.strip()
+        if PHONE_QUERY.match(query) and sum(char.isdigit() for char in query) >= 3:
+            return normalize_phone(query)
+        return None
+
+
+class ORMSearchBackend(BaseSearchBackend):
+    """Prefix matching through the ORM for databases without a text index."""
+
+    def search(self, query, limit=20, offset=0):
+        phone = self.phone_prefix(query)
+        if phone:
+            condition = Q(normalized_phone__startswith=phone)
+        else:
+            words = WORD.findall(query)
+            if not words:
+                return []
+            condition = Q()
+            for word in words:
+                condition &= (
+                    Q(first_name__istartswith=word) |
+                    Q(last_name__istartswith=word) |
+                    Q(area_of_residence__istartswith=word)
+                )
+        queryset = Client.objects.using(self.using).filter(condition).values_list('id', flat=True)
+        return list(queryset[offset:offset + limit])
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """
+    FTS5 index over the client table. The table uses external content, so it
+    stores only the index, and triggers keep it in step with every insert,
+    update and delete on clients_client, including bulk_create and raw SQL.
+    """
+    table = 'clients_client_fts'
+    columns = ['first_name', 'last_name', 'phone_number', 'normalized_phone', 'area_of_residence']
+    # bm25 weights, in column order: names rank above phone numbers and area.
+    weights = [10.0, 10.0, 5.0, 5.0, 1.0]
+
+    def install(self):
+        columns = ', '.join(self.columns)
+        new = ', '.join(f'new.{column}' for column in self.columns)
+        old = ', '.join(f'old.{column}' for column in self.columns)
+        delete = f"INSERT INTO {self.table}({self.table}, rowid, {columns}) VALUES ('delete', old.id, {old});"
+        insert = f"INSERT INTO {self.table}(rowid, {columns}) VALUES (new.id, {new});"
+
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'clients_client' AND name LIKE %s",
+                [f'{self.table}_%'],
+            )
+            installed = cursor.fetchone()[0] == 3
+            if installed:
+                return
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+                f"{columns}, content='clients_client', content_rowid='id', prefix='2 3')"
+            )
+            # Triggers disappear whenever a migration rebuilds clients_client,
+            # so recreate them and rebuild the index from the content table.
+            cursor.execute(f"DROP TRIGGER IF EXISTS {self.table}_ai")
+            cursor.execute(f"DROP TRIGGER IF EXISTS {self.table}_ad")
+            cursor.execute(f"DROP TRIGGER IF EXISTS {self.table}_au")
+            cursor.execute(f"CREATE TRIGGER {self.table}_ai AFTER INSERT ON clients_client BEGIN {insert} END")
+            cursor.execute(f"CREATE TRIGGER {self.table}_ad AFTER DELETE ON clients_client BEGIN {delete} END")
+            cursor.execute(f"CREATE TRIGGER {self.table}_au AFTER UPDATE ON clients_client BEGIN {delete} {insert} END")
+            cursor.execute(f"INSERT INTO {self.table}({self.table}) VALUES ('rebuild')")
+
+    def build_match(self, query):
+        phone = self.phone_prefix(query)
+        if phone:
+            return f'normalized_phone : "{phone}"*'
+        words = WORD.findall(query)
+        if not words:
+            return None
+        return ' AND '.join(f'"{word}"*' for word in words)
+
+    def search(self, query, limit=20, offset=0):
+        match = self.build_match(query)
+        if not match:
+            return []
+        weights = ', '.join(str(weight) for weight in self.weights)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s "
+                f"ORDER BY bm25({self.table}, {weights}) LIMIT %s OFFSET %s",
+                [match, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    Full-text prefix search over names and area, ranked by ts_rank with
+    trigram similarity on the full name as tiebreaker and typo fallback.
+    Both are served by expression GIN indexes, which PostgreSQL keeps up to
+    date without triggers.
+    """
+    document = "to_tsvector('simple', first_name || ' ' || last_name || ' ' || area_of_residence)"
+    full_name = "(first_name || ' ' || last_name)"
+
+    def install(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS clients_client_search_fts ON clients_client USING gin (({self.document}))")
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS clients_client_search_trgm ON clients_client USING gin ({self.full_name} gin_trgm_ops)")
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS clients_client_search_phone ON clients_client (normalized_phone varchar_pattern_ops)"
+            )
+
+    def search(self, query, limit=20, offset=0):
+        phone = self.phone_prefix(query)
+        if phone:
+            return list(
+                Client.objects.using(self.using)
+                .filter(normalized_phone__startswith=phone)
+                .order_by('normalized_phone', 'id')
+                .values_list('id', flat=True)[offset:offset + limit]
+            )
+        words = WORD.findall(query)
+        if not words:
+            return []
+        tsquery = ' & '.join(f'{word}:*' for word in words)
+        text = ' '.join(words)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT id FROM clients_client "
+                f"WHERE {self.document} @@ to_tsquery('simple', %s) OR {self.full_name} %% %s "
+                f"ORDER BY ts_rank({self.document}, to_tsquery('simple', %s)) DESC, "
+                f"similarity({self.full_name}, %s) DESC, id LIMIT %s OFFSET %s",
+                [tsquery, text, tsquery, text, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
@@ -1,11 +1,16 @@
 # backend/clients/serializers.py
 from rest_framework import serializers
+from .dedup import index_clients
+from .enrollment_ids import assign_enrollment_ids
 from .models import Client, Enrollment
-from programs.models import Program
+from .stats import record_enrollments
+from .utils import normalize_phone
+from programs.cache import program_catalog
+from programs.serializers import CatalogProgramField
 
 class EnrollmentSerializer(serializers.ModelSerializer):
-    program_name = serializers.CharField(source='program.name', read_only=True)
-    program_short_code = serializers.CharField(source='program.short_code', read_only=True)
+    program_name = CatalogProgramField('name')
+    program_short_code = CatalogProgramField('short_code')
 
     class Meta:
         model = Enrollment
@@ -23,6 +28,16 @@ class ClientSerializer(serializers.ModelSerializer):
             'enrollments'
         ]
 
+class ClientBulkCreateSerializer(serializers.ListSerializer):
+    def create(self, validated_data):
+        clients = [Client(**attrs) for attrs in validated_data]
+        # bulk_create bypasses Client.save(), which normally fills this in.
+        for client in clients:
+            client.normalized_phone = normalize_phone(client.phone_number)
+        clients = Client.objects.bulk_create(clients)
+        index_clients(clients)
+        return clients
+
 class ClientCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Client
@@ -30,6 +45,60 @@ class ClientCreateSerializer(serializers.ModelSerializer):
             'id', 'first_name', 'last_name', 'age', 'phone_number',
             'area_of_residence', 'profession'
         ]
+        list_serializer_class = ClientBulkCreateSerializer
+
+class EnrollmentBulkCreateSerializer(serializers.ListSerializer):
+    """
+    Validates a batch of enrollments with two set-based queries (clients and
+    existing pairs, with programs resolved from the catalog) rather than
+    three queries per row, and writes the batch with a single bulk_create.
+    """
+
+    def run_child_validation(self, data):
+        # Field-level checks only; the lookups in the child's validate()
+        # are done for the whole batch in to_internal_value().
+        return self.child.to_internal_value(data)
+
+    def to_internal_value(self, data):
+        rows = super().to_internal_value(data)
+        clients = Client.objects.only('id', 'area_of_residence').in_bulk({row['client_id'] for row in rows})
+        # One lookup for the whole batch, however many rows name a program
+        # the catalog does not have.
+        programs = {
+            program_id for program_id, entry in program_catalog.get_many({row['program_id'] for row in rows}).items()
+            if entry is not None
+        }
+        existing = set(
+            Enrollment.objects.filter(client_id__in=clients, program_id__in=programs)
+            .values_list('client_id', 'program_id')
+        )
+
+        errors = []
+        for row in rows:
+            row_errors = {}
+            row['client'] = clients.get(row['client_id'])
+            if row['client'] is None:
+                row_errors['client_id'] = "Client does not exist"
+            if row['program_id'] not in programs:
+                row_errors['program_id'] = "Program does not exist"
+            pair = (row['client_id'], row['program_id'])
+            if not row_errors and pair in existing:
+                row_errors['non_field_errors'] = "Client is already enrolled in this program"
+            existing.add(pair)
+            errors.append(row_errors)
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return rows
+
+    def create(self, validated_data):
+        enrollments = [Enrollment(client=row['client'], program_id=row['program_id']) for row in validated_data]
+        # bulk_create bypasses Enrollment.save() and its signals, which
+        # normally assign the id and update the program stats.
+        assign_enrollment_ids(enrollments)
+        enrollments = Enrollment.objects.bulk_create(enrollments)
+        record_enrollments(enrollments)
+        return enrollments
 
 class EnrollmentCreateSerializer(serializers.ModelSerializer):
     client_id = serializers.IntegerField()
@@ -39,6 +108,7 @@ class EnrollmentCreateSerializer(serializers.ModelSerializer):
         model = Enrollment
         fields = ['id', 'client_id', 'program_id', 'enrollment_id', 'enrolled_at']
         read_only_fields = ['id', 'enrollment_id', 'enrolled_at']
+        list_serializer_class = EnrollmentBulkCreateSerializer
 
     def validate(self, data):
         # Ensure client and program exist
@@ -47,16 +117,13 @@ class EnrollmentCreateSerializer(serializers.ModelSerializer):
         except Client.DoesNotExist:
             raise serializers.ValidationError({"client_id": "Client does not exist"})
         
-        try:
-            program = Program.objects.get(id=data['program_id'])
-        except Program.DoesNotExist:
+        if program_catalog.get(data['program_id']) is None:
             raise serializers.ValidationError({"program_id": "Program does not exist"})
 
         # Check for duplicate enrollment
-        if Enrollment.objects.filter(client=client, program=program).exists():
+        if Enrollment.objects.filter(client=client, program_id=data['program_id']).exists():
             raise serializers.ValidationError({"non_field_errors": "Client is already enrolled in this program"})
 
-        # Set client and program on the instance
+        # Set client on the instance; the program is referenced by id only
         data['client'] = client
-        data['program'] = program
         return data
\ No newline at end of file
@@ -0,0 +1,219 @@
+"""
+Enrollment counts per program, area of residence and month.
+
+EnrollmentStat is kept up to date incrementally: signal handlers cover
+single saves and deletes, and the bulk paths (bulk enrollment, client
+import) call record_enrollments() after bulk_create. Reading the stats
+therefore costs one query over the summary rows however many enrollments
+there are. rebuild_enrollment_stats recomputes the table from scratch or,
+with --check, reports rows that have drifted.
+
+Deleting a client discounts its enrollments in one aggregate query before
+they cascade, and the per-enrollment handler then skips them, so the cost
+does not grow with the number of enrollments.
+"""
+import threading
+from collections import Counter
+from django.db import IntegrityError, router, transaction
+from django.db.models import Count, DateField, F
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from programs.cache import program_catalog
+
+# Per thread: {client id: ids of its enrollments discounted by client_pre_delete}.
+_cascading = threading.local()
+
+
+def month_of(moment):
+    """First day of the month of ``moment`` in the current time zone, as TruncMonth computes it."""
+    if timezone.is_aware(moment):
+        moment = timezone.localtime(moment)
+    return moment.date().replace(day=1)
+
+
+def stat_key(enrollment):
+    return (enrollment.program_id, enrollment.client.area_of_residence, month_of(enrollment.enrolled_at))
+
+
+def apply_deltas(deltas):
+    """
+    Add each delta to its (program id, area, month) row. Increments create
+    missing rows; decrements never do, so deleting enrollments whose row is
+    already gone (e.g. cascading from a program) is a no-op.
+    """
+    from .models import EnrollmentStat
+
+    using = router.db_for_write(EnrollmentStat)
+    with transaction.atomic(using=using, savepoint=False):
+        # A fixed order keeps concurrent writers from deadlocking on row locks.
+        for (program_id, area, month), delta in sorted(deltas.items()):
+            if not delta:
+                continue
+            stats = EnrollmentStat.objects.filter(program_id=program_id, area_of_residence=area, month=month)
+            if stats.update(count=F('count') + delta) or delta < 0:
+                continue
+            try:
+                with transaction.atomic(using=using):
+                    EnrollmentStat.objects.create(program_id=program_id, area_of_residence=area, month=month, count=delta)
+            except IntegrityError:
+                # Another transaction created the row first.
+                stats.update(count=F('count') + delta)
+
+
+def record_enrollments(enrollments):
+    """Count newly created enrollments; call after bulk_create."""
+    apply_deltas(Counter(stat_key(enrollment) for enrollment in enrollments))
+
+
+def discard_enrollments(enrollments):
+    apply_deltas(Counter({key: -count for key, count in Counter(map(stat_key, enrollments)).items()}))
+
+
+def enrollment_pre_save(sender, instance, raw=False, **kwargs):
+    """Remember where an existing enrollment was counted before it changes."""
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    previous = (
+        sender.objects.filter(pk=instance.pk)
+        .values_list('program_id', 'client__area_of_residence', 'enrolled_at')
+        .first()
+    )
+    if previous:
+        instance._previous_stat_key = (previous[0], previous[1], month_of(previous[2]))
+
+
+def enrollment_post_save(sender, instance, created, raw=False, **kwargs):
+    previous = instance.__dict__.pop('_previous_stat_key', None)
+    if raw:
+        return
+    if created:
+        record_enrollments([instance])
+    elif previous is not None:
+        key = stat_key(instance)
+        if key != previous:
+            apply_deltas(Counter({previous: -1, key: 1}))
+
+
+def enrollment_post_delete(sender, instance, **kwargs):
+    if instance.pk in cascading_enrollments().get(instance.client_id, ()):
+        return
+    discard_enrollments([instance])
+
+
+def cascading_enrollments():
+    if not hasattr(_cascading, 'enrollments'):
+        _cascading.enrollments = {}
+    return _cascading.enrollments
+
+
+def client_pre_delete(sender, instance, **kwargs):
+    """Discount the enrollments that are about to cascade, grouped by program and month."""
+    from .models import Enrollment
+
+    rows = (
+        Enrollment.objects.using(kwargs.get('using')).filter(client_id=instance.pk).order_by()
+        .values_list('id', 'program_id', 'client__area_of_residence', 'enrolled_at')
+    )
+    deltas, ids = Counter(), set()
+    for enrollment_id, program_id, area, enrolled_at in rows:
+        deltas[(program_id, area, month_of(enrolled_at))] -= 1
+        ids.add(enrollment_id)
+    apply_deltas(deltas)
+    cascading_enrollments()[instance.pk] = ids
+
+
+def client_post_delete(sender, instance, **kwargs):
+    cascading_enrollments().pop(instance.pk, None)
+
+
+def client_pre_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and 'area_of_residence' not in update_fields:
+        return
+    instance._previous_area = (
+        sender.objects.filter(pk=instance.pk).values_list('area_of_residence', flat=True).first()
+    )
+
+
+def client_post_save(sender, instance, raw=False, **kwargs):
+    """Move a client's enrollments to their new area of residence."""
+    previous = instance.__dict__.pop('_previous_area', None)
+    if raw or previous is None or previous == instance.area_of_residence:
+        return
+    deltas = Counter()
+    for program_id, enrolled_at in instance.enrollments.values_list('program_id', 'enrolled_at'):
+        month = month_of(enrolled_at)
+        deltas[(program_id, previous, month)] -= 1
+        deltas[(program_id, instance.area_of_residence, month)] += 1
+    apply_deltas(deltas)
+
+
+def compute_stats(enrollments):
+    """Count an Enrollment queryset by (program id, area, month)."""
+    rows = (
+        enrollments.order_by()
+        .values('program_id', 'client__area_of_residence', month=TruncMonth('enrolled_at', output_field=DateField()))
+        .annotate(count=Count('id'))
+        .values_list('program_id', 'client__area_of_residence', 'month', 'count')
+    )
+    return Counter({(program_id, area, month): count for program_id, area, month, count in rows})
+
+
+def stored_stats(stats):
+    rows = stats.exclude(count=0).values_list('program_id', 'area_of_residence', 'month', 'count')
+    return Counter({(program_id, area, month): count for program_id, area, month, count in rows})
+
+
+def check_stats():
+    """Return {key: (stored, actual)} for every row that disagrees with Enrollment."""
+    from .models import Enrollment, EnrollmentStat
+
+    actual = compute_stats(Enrollment.objects.all())
+    stored = stored_stats(EnrollmentStat.objects.all())
+    return {
+        key: (stored[key], actual[key])
+        for key in sorted(set(actual) | set(stored))
+        if stored[key] != actual[key]
+    }
+
+
+def rebuild_stats():
+    """Replace the summary table with counts computed from Enrollment."""
+    from .models import Enrollment, EnrollmentStat
+
+    with transaction.atomic(using=router.db_for_write(EnrollmentStat)):
+        EnrollmentStat.objects.all().delete()
+        return EnrollmentStat.objects.bulk_create([
+            EnrollmentStat(program_id=program_id, area_of_residence=area, month=month, count=count)
+            for (program_id, area, month), count in compute_stats(Enrollment.objects.all()).items()
+        ], batch_size=1000)
+
+
+def program_stats():
+    """Enrollment totals per program with breakdowns by area and by month."""
+    from .models import EnrollmentStat
+
+    summaries = {
+        entry.pk: {
+            'program_id': entry.pk, 'name': entry.name, 'short_code': entry.short_code,
+            'total': 0, 'by_area': {}, 'by_month': {},
+        }
+        for entry in sorted(program_catalog.entries().values())
+    }
+    rows = (
+        EnrollmentStat.objects.filter(count__gt=0)
+        .order_by('program_id', 'area_of_residence', 'month')
+        .values_list('program_id', 'area_of_residence', 'month', 'count')
+    )
+    for program_id, area, month, count in rows:
+        summary = summaries.get(program_id)
+        if summary is None:
+            continue
+        summary['total'] += count
+        summary['by_area'][area] = summary['by_area'].get(area, 0) + count
+        key = f'{month:%Y-%m}'
+        summary['by_month'][key] = summary['by_month'].get(key, 0) + count
+    for summary in summaries.values():
+        summary['by_month'] = dict(sorted(summary['by_month'].items()))
+    return list(summaries.values())
@@ -0,0 +1,164 @@
+"""
+Change feed for offline copies of the registry, served at GET /api/sync/.
+
+The feed has four streams: clients, enrollments and programs in
+(updated_at, id) order, and Tombstone rows, recorded as clients,
+enrollments and programs are deleted, in (deleted_at, id) order. A cursor
+holds a position in each stream, so a sync reads only the rows after it,
+with a range scan of the matching index and no more than ``limit`` rows
+per stream. Without a cursor the feed starts from the beginning of the
+tables (a full download, page by page) and from the current time for
+deletions.
+
+Timestamps are taken before a transaction commits, so a row can become
+visible after later-stamped rows have already been served. To pick such
+rows up, a cursor never moves past SETTLE_SECONDS ago, not even when a
+page ends inside that window. Changes made in the window are sent again
+by the next sync (and those beyond a full page only then), so applying
+the feed must be idempotent: upsert the rows, then drop the deleted ids.
+Apply a sync once ``has_more`` is false; until then the streams may be at
+different points in time.
+
+Tombstones older than TOMBSTONE_DAYS are removed by prune_tombstones. A
+cursor older than that gets 410 Gone, and the copy must be downloaded
+again from scratch.
+"""
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.exceptions import APIException
+from programs.models import Program
+from programs.serializers import ProgramSerializer
+from .fast_serializers import CLIENT_FIELDS, ENROLLMENT_FIELDS, RowFormatter
+from .models import Client, Enrollment, Tombstone
+
+SYNC_FEED_DEFAULTS = {
+    'PAGE_SIZE': 500,
+    'MAX_PAGE_SIZE': 2000,
+    'SETTLE_SECONDS': 10,
+    'TOMBSTONE_DAYS': 90,
+}
+
+PROGRAM_FIELDS = ProgramSerializer.Meta.fields
+TOMBSTONE_MODELS = {Client: Tombstone.CLIENT, Enrollment: Tombstone.ENROLLMENT, Program: Tombstone.PROGRAM}
+# Response key, cursor key, model, timestamp field, fields read.
+STREAMS = [
+    ('clients', 'c', Client, 'updated_at', CLIENT_FIELDS),
+    ('enrollments', 'e', Enrollment, 'updated_at', [*ENROLLMENT_FIELDS, 'updated_at']),
+    ('programs', 'p', Program, 'updated_at', PROGRAM_FIELDS),
+    ('deleted', 't', Tombstone, 'deleted_at', ['id', 'model', 'object_id', 'deleted_at']),
+]
+
+
+class CursorExpired(APIException):
+    status_code = 410
+    default_detail = 'The cursor predates the retained deletions; sync again without one.'
+    default_code = 'cursor_expired'
+
+
+def sync_setting(name):
+    return getattr(settings, 'SYNC_FEED', {}).get(name, SYNC_FEED_DEFAULTS[name])
+
+
+def record_deletion(sender, instance, using=None, **kwargs):
+    """post_delete handler for Client, Enrollment and Program."""
+    Tombstone.objects.using(using).create(model=TOMBSTONE_MODELS[sender], object_id=instance.pk)
+
+
+def encode_cursor(positions):
+    payload = {
+        key: None if position is None else [position[0].isoformat(), position[1]]
+        for key, position in positions.items()
+    }
+    return urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(encoded):
+    """Return {cursor key: (timestamp, id) or None}; ValidationError if malformed."""
+    try:
+        payload = json.loads(urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+        positions = {}
+        for _, key, *_ in STREAMS:
+            position = payload[key]
+            if position is not None:
+                timestamp = datetime.fromisoformat(position[0])
+                if timezone.is_naive(timestamp) or not isinstance(position[1], int):
+                    raise ValueError
+                position = (timestamp, position[1])
+            positions[key] = position
+    except (TypeError, ValueError, KeyError, IndexError, UnicodeError):
+        raise serializers.ValidationError({"since": "Invalid cursor"})
+    return positions
+
+
+def initial_positions(now):
+    # A fresh copy has nothing to delete, so deletions start from now.
+    positions = {key: None for _, key, *_ in STREAMS}
+    positions['t'] = (now - timedelta(seconds=sync_setting('SETTLE_SECONDS')), 0)
+    return positions
+
+
+def after(field, position):
+    """Rows past ``position`` in (field, id) order, as a condition an index range scan can answer."""
+    timestamp, pk = position
+    return Q(**{f'{field}__gte': timestamp}) & (Q(**{f'{field}__gt': timestamp}) | Q(**{field: timestamp, 'id__gt': pk}))
+
+
+def change_feed(since=None, limit=None, using=None):
+    """
+    The changes after the ``since`` cursor, or everything without one, as
+    the body of a GET /api/sync/ response.
+    """
+    now = timezone.now()
+    positions = decode_cursor(since) if since else initial_positions(now)
+    deletions = positions['t']
+    if deletions is not None and deletions[0] < now - timedelta(days=sync_setting('TOMBSTONE_DAYS')):
+        raise CursorExpired()
+    limit = limit or sync_setting('PAGE_SIZE')
+    horizon = (now - timedelta(seconds=sync_setting('SETTLE_SECONDS')), 0)
+
+    formatter = RowFormatter()
+    body = {'cursor': None, 'has_more': False}
+    for name, key, model, field, fields in STREAMS:
+        queryset = model.objects.using(using).order_by(field, 'id').values(*fields)
+        if positions[key] is not None:
+            queryset = queryset.filter(after(field, positions[key]))
+        rows = list(queryset[:limit + 1])
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = (rows[-1][field], rows[-1]['id'])
+            if last < horizon:
+                positions[key] = last
+                body['has_more'] = True
+                body[name] = rows
+                continue
+        # Every row before the horizon has been read. The cursor stops at
+        # the horizon, so rows from the settle window (served now or not)
+        # come again with the next sync.
+        if positions[key] is None or positions[key] < horizon:
+            positions[key] = horizon
+        body[name] = rows
+    body['cursor'] = encode_cursor(positions)
+
+    body['clients'] = [formatter.client_fields(row) for row in body['clients']]
+    body['enrollments'] = [formatter.enrollment(row) for row in body['enrollments']]
+    body['programs'] = [
+        {name: formatter.datetime(row[name]) if name in ('created_at', 'updated_at') else row[name] for name in PROGRAM_FIELDS}
+        for row in body['programs']
+    ]
+    deleted = {'clients': [], 'enrollments': [], 'programs': []}
+    for row in body['deleted']:
+        deleted[f"{row['model']}s"].append(row['object_id'])
+    body['deleted'] = deleted
+    return body
+
+
+def prune_tombstones(using=None):
+    """Delete tombstones older than TOMBSTONE_DAYS; returns how many."""
+    cutoff = timezone.now() - timedelta(days=sync_setting('TOMBSTONE_DAYS'))
+    deleted, _ = Tombstone.objects.using(using).filter(deleted_at__lt=cutoff).delete()
+    return deleted
@@ -1,3 +1,1466 @@
-from django.test import TestCase
+import csv
+import io
+import itertools
+import json
+import os
+import re
+import tempfile
+import threading
+import tracemalloc
+from base64 import b64encode
+from unittest import mock, skipUnless
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, OperationalError, close_old_connections, connection
+from django.db.models.functions import Mod
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from healthcare.pagination import EstimatedCountPaginator, KeysetPagination
+from programs.cache import program_catalog
+from programs.models import Program
+from .dedup import blocking_keys, find_duplicates, find_duplicates_in_records, jaro_winkler, soundex
+from .enrollment_ids import SPACE, encode_counter, generate_enrollment_ids
+from .importer import ClientImporter
+from .models import Client, ClientBlockingKey, Enrollment, EnrollmentStat, Tombstone
+from .search import get_search_backend
 
-# Create your tests here.
+
+class APITestMixin:
+    """Creates a staff user and authenticates the API client as that user."""
+
+    def setUp(self):
+        super().setUp()
+        self.admin = get_user_model().objects.create_user(
+            username='admin', email='admin@healthcare.local', password='pass12345', is_staff=True
+        )
+        self.client.force_authenticate(user=self.admin)
+
+    def create_programs(self, count, start=0):
+        return [
+            Program.objects.create(name=f'Program {i}', short_code=f'P{i}')
+            for i in range(start, start + count)
+        ]
+
+    def create_clients(self, count, programs=(), **fields):
+        clients = []
+        for i in range(count):
+            client = Client.objects.create(
+                first_name=fields.get('first_name', f'First{i}'),
+                last_name=fields.get('last_name', f'Last{i}'),
+                age=fields.get('age', 30),
+                phone_number=fields.get('phone_number', f'+2547000{i:05d}'),
+                area_of_residence=fields.get('area_of_residence', 'Nairobi'),
+                profession=fields.get('profession', ''),
+            )
+            for program in programs:
+                Enrollment.objects.create(client=client, program=program)
+            clients.append(client)
+        return clients
+
+
+class QueryCountTests(APITestMixin, APITestCase):
+    """Each read endpoint must issue a fixed number of queries regardless of row count."""
+
+    def assertConstantQueries(self, num, url, grow):
+        # Program names come from the catalog, which reloads only when
+        # programs change; measure the steady state.
+        program_catalog.entries()
+        with self.assertNumQueries(num):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        grow()
+        program_catalog.entries()
+        with self.assertNumQueries(num):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_client_list(self):
+        programs = self.create_programs(3)
+        self.create_clients(2, programs)
+        self.assertConstantQueries(
+            2, reverse('client-list'), lambda: self.create_clients(20, programs)
+        )
+
+    def test_client_search(self):
+        programs = self.create_programs(3)
+        self.create_clients(2, programs, first_name='Wanjiru')
+        self.assertConstantQueries(
+            3, reverse('client-search') + '?q=wanj',
+            lambda: self.create_clients(20, programs, first_name='Wanjiru'),
+        )
+
+    def assertConstantDetailQueries(self, url_name, num=2):
+        programs = self.create_programs(2)
+        client = self.create_clients(1, programs)[0]
+
+        def enroll_more():
+            for program in self.create_programs(8, start=2):
+                Enrollment.objects.create(client=client, program=program)
+
+        self.assertConstantQueries(num, reverse(url_name, args=[client.pk]), enroll_more)
+        self.assertEqual(client.enrollments.count(), 10)
+
+    def test_client_retrieve(self):
+        self.assertConstantDetailQueries('client-detail')
+
+    def test_client_profile(self):
+        # The ETag query, then the client and its enrollments.
+        self.assertConstantDetailQueries('client-profile', num=3)
+
+    def test_enrollment_list(self):
+        programs = self.create_programs(3)
+        self.create_clients(2, programs)
+        self.assertConstantQueries(
+            1, reverse('enrollment-list'), lambda: self.create_clients(20, programs)
+        )
+
+
+class ClientProfileCacheTests(APITestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.programs = self.create_programs(2)
+        self.profile = self.create_clients(1, self.programs[:1])[0]
+        self.url = reverse('client-profile', args=[self.profile.pk])
+        program_catalog.entries()
+
+    def revalidate(self, response):
+        return self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        with self.assertNumQueries(1):
+            self.assertEqual(self.revalidate(response).status_code, 304)
+        since = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(since.status_code, 304)
+
+    def rename_program(self):
+        program = self.programs[0]
+        program.name = 'Renamed'
+        program.save()
+
+    def reassign_program(self):
+        enrollment = self.profile.enrollments.get()
+        enrollment.program = self.programs[1]
+        enrollment.save()
+
+    def test_changes_invalidate_etag(self):
+        changes = [
+            lambda: Client.objects.filter(pk=self.profile.pk).update(updated_at=timezone.now() + timezone.timedelta(seconds=1)),
+            lambda: Enrollment.objects.create(client=self.profile, program=self.programs[1]),
+            lambda: self.profile.enrollments.filter(program=self.programs[1]).delete(),
+            self.rename_program,
+            self.reassign_program,
+        ]
+        response = self.client.get(self.url)
+        for number, change in enumerate(changes):
+            change()
+            fresh = self.revalidate(response)
+            self.assertEqual(fresh.status_code, 200, number)
+            self.assertNotEqual(fresh['ETag'], response['ETag'])
+            response = fresh
+
+    def test_unknown_client(self):
+        self.assertEqual(self.client.get(reverse('client-profile', args=[0])).status_code, 404)
+
+    @override_settings(CLIENT_PROFILE_CACHE='default')
+    def test_payload_cache(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(1):
+            cached = self.client.get(self.url)
+        self.assertEqual(cached.json(), first.json())
+
+        # Saving the client evicts the entry.
+        self.profile.profession = 'Teacher'
+        self.profile.save()
+        self.assertEqual(self.client.get(self.url).json()['profession'], 'Teacher')
+
+        # Changes that bypass the signals are caught by the ETag check.
+        Enrollment.objects.bulk_create([
+            Enrollment(client=self.profile, program=self.programs[1], enrollment_id='BULK-1')
+        ])
+        self.assertEqual(len(self.client.get(self.url).json()['enrollments']), 2)
+
+
+class AsyncEndpointTests(APITestMixin, TransactionTestCase):
+    """
+    The async endpoints, driven through the ASGI handler, must answer like
+    their DRF counterparts. A TransactionTestCase because the search
+    backend runs on the blocking executor's own connections.
+    """
+    client_class = APIClient
+
+    def setUp(self):
+        super().setUp()
+        self.headers = {'Authorization': f'Bearer {RefreshToken.for_user(self.admin).access_token}'}
+        self.client.force_authenticate(user=None)
+        self.client.credentials(HTTP_AUTHORIZATION=self.headers['Authorization'])
+        programs = self.create_programs(2)
+        self.clients = self.create_clients(3, programs, first_name='Akinyi')
+
+    def aget(self, url, **headers):
+        return async_to_sync(self.async_client.get)(url, headers={**self.headers, **headers})
+
+    def test_search_matches_sync_api(self):
+        query = '?q=akin&limit=2&offset=1'
+        response = self.aget(reverse('async-client-search') + query)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), self.client.get(reverse('client-search') + query).json())
+        self.assertEqual(len(response.json()['results']), 2)
+        self.assertEqual(self.aget(reverse('async-client-search') + '?limit=x&q=a').status_code, 400)
+
+    def test_profile_matches_sync_api(self):
+        pk = self.clients[0].pk
+        response = self.aget(reverse('async-client-profile', args=[pk]))
+        sync = self.client.get(reverse('client-profile', args=[pk]))
+        self.assertEqual(response.json(), sync.json())
+        self.assertEqual(response['ETag'], sync['ETag'])
+        self.assertEqual(self.aget(reverse('async-client-profile', args=[pk]), if_none_match=sync['ETag']).status_code, 304)
+        self.assertEqual(self.aget(reverse('async-client-profile', args=[0])).status_code, 404)
+
+    def test_programs_missing_from_the_catalog_are_resolved_off_the_event_loop(self):
+        program_catalog.entries()
+        # Created without the signals, so the catalog has not heard of it.
+        program = Program.objects.bulk_create([Program(name='Malaria', short_code='MAL')])[0]
+        Enrollment.objects.bulk_create([Enrollment(client=self.clients[0], program=program, enrollment_id='MAL-1')])
+        response = self.aget(reverse('async-client-profile', args=[self.clients[0].pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Malaria', [e['program_name'] for e in response.json()['enrollments']])
+        response = self.aget(reverse('async-client-search') + '?q=akin')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), self.client.get(reverse('client-search') + '?q=akin').json())
+
+    def test_program_list_matches_sync_api(self):
+        url = reverse('async-program-list') + '?page_size=1'
+        response = self.aget(url)
+        sync = self.client.get(reverse('program-list') + '?page_size=1').json()
+        self.assertEqual(response.json()['results'], sync['results'])
+        following = self.aget(response.json()['next']).json()
+        self.assertEqual(following['results'], self.client.get(sync['next']).json()['results'])
+        self.assertEqual(self.aget(url, if_none_match=response['ETag']).status_code, 304)
+
+    def test_requires_staff_token(self):
+        url = reverse('async-client-search') + '?q=akin'
+        self.assertEqual(async_to_sync(self.async_client.get)(url).status_code, 401)
+        self.assertEqual(self.aget(url, authorization='Bearer nonsense').status_code, 401)
+        self.admin.is_staff = False
+        self.admin.save()
+        self.assertEqual(self.aget(url).status_code, 403)
+        self.assertEqual(async_to_sync(self.async_client.post)(url, headers=self.headers).status_code, 405)
+
+
+class FastSerializationParityTests(APITestMixin, APITestCase):
+    """The value-row read path must produce exactly the serializers' bytes."""
+
+    def setUp(self):
+        super().setUp()
+        programs = self.create_programs(3)
+        Program.objects.filter(pk=programs[1].pk).update(name='Malária "Ñ" programme')
+        program_catalog.reload()
+        people = [
+            ('Wanjirũ', 'Kamau', 'Nurse\u2028"night" shift'),
+            ('Ñandú', "O'Brien", ''),
+            ('Amina', 'Kamau', 'Teacher\\tutor'),
+            ('Zawadi', 'Bett', 'Farmer'),
+            ('Juma', 'Ali', 'Driver'),
+        ]
+        for i, (first, last, profession) in enumerate(people):
+            client = Client.objects.create(
+                first_name=first, last_name=last, age=20 + i, phone_number=f'+2547100{i:05d}',
+                area_of_residence='Nairobi' if i % 2 else 'Kisumu', profession=profession,
+            )
+            # The last client has no enrollments.
+            for program in programs[:len(people) - 1 - i]:
+                Enrollment.objects.create(client=client, program=program)
+
+    def fetch(self, url, fast):
+        with override_settings(FAST_READ_SERIALIZATION=fast):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return b''.join(response.streaming_content) if response.streaming else response.content
+
+    def assertParity(self, url):
+        fast = self.fetch(url, fast=True)
+        self.assertEqual(fast, self.fetch(url, fast=False))
+        return fast
+
+    def assertPagesParity(self, url):
+        pages = 0
+        while url:
+            url = json.loads(self.assertParity(url))['next']
+            pages += 1
+        return pages
+
+    def test_client_list(self):
+        self.assertEqual(self.assertPagesParity(reverse('client-list') + '?page_size=2'), 3)
+        self.assertParity(reverse('client-list'))
+
+    def test_enrollment_list(self):
+        self.assertEqual(self.assertPagesParity(reverse('enrollment-list') + '?page_size=4'), 3)
+
+    def test_exports(self):
+        for query in ('?format=csv', '?format=ndjson', '?format=ndjson&area_of_residence=Kisumu'):
+            self.assertParity(reverse('client-export') + query)
+
+    def test_local_time_zone(self):
+        with timezone.override('Africa/Nairobi'):
+            body = self.assertParity(reverse('client-list'))
+            self.assertParity(reverse('enrollment-list'))
+        self.assertIn(b'+03:00', body)
+
+    def test_unicode_and_escapes(self):
+        body = self.assertParity(reverse('client-list'))
+        self.assertIn('Wanjirũ'.encode(), body)
+        self.assertIn(b'Nurse\\u2028\\"night\\" shift', body)
+
+
+class KeysetPaginationTests(APITestMixin, APITestCase):
+
+    def collect(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_walks_clients_in_meta_ordering(self):
+        self.create_clients(7, last_name='Otieno')
+        self.create_clients(5)
+        expected = list(Client.objects.values_list('id', flat=True))
+        self.assertEqual(self.collect(reverse('client-list') + '?page_size=3'), expected)
+
+    def test_stable_under_concurrent_inserts(self):
+        self.create_clients(6, last_name='Mwangi')
+        response = self.client.get(reverse('client-list') + '?page_size=3')
+        seen = [row['id'] for row in response.data['results']]
+
+        # Rows sorting before and after the cursor appear between page fetches.
+        self.create_clients(2, last_name='Achieng')
+        self.create_clients(2, last_name='Zawadi')
+        seen.extend(self.collect(response.data['next']))
+
+        expected = list(Client.objects.filter(last_name__in=['Mwangi', 'Zawadi']).values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_previous_link_returns_preceding_page(self):
+        self.create_clients(6)
+        first = self.client.get(reverse('client-list') + '?page_size=2')
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(back.data['results'], first.data['results'])
+        self.assertIsNone(first.data['previous'])
+
+    def test_enrollments_keyed_on_enrolled_at(self):
+        programs = self.create_programs(3)
+        self.create_clients(3, programs)
+        expected = list(Enrollment.objects.values_list('id', flat=True))
+        self.assertEqual(self.collect(reverse('enrollment-list') + '?page_size=4'), expected)
+
+    def test_page_size_is_capped(self):
+        self.create_clients(3)
+        with mock.patch.object(KeysetPagination, 'max_page_size', 2):
+            response = self.client.get(reverse('client-list') + '?page_size=100000')
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('client-list') + '?cursor=bm90LWpzb24=')
+        self.assertEqual(response.status_code, 404)
+
+        def cursor(position):
+            return b64encode(json.dumps({'r': 0, 'p': position}).encode()).decode()
+
+        self.create_clients(2)
+        tampered = [
+            ('client-list', ['Smith', 'A1', 'notint']),
+            ('client-list', ['Smith', 'A1', None]),
+            ('client-list', [[1], [2], [3]]),
+            ('client-list', ['Smith', 'A1', 2 ** 70]),
+            ('enrollment-list', ['notadate', 1]),
+            ('enrollment-list', [{'a': 1}, 1]),
+        ]
+        for name, position in tampered:
+            response = self.client.get(reverse(name), {'cursor': cursor(position)})
+            self.assertEqual(response.status_code, 404, position)
+        # A well-formed cursor still works.
+        response = self.client.get(reverse('client-list'), {'cursor': cursor(['A', 'A', 1])})
+        self.assertEqual(response.status_code, 200)
+
+
+class ListFilterTests(APITestMixin, APITestCase):
+
+    def ids(self, name, **params):
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return {row['id'] for row in response.data['results']}
+
+    def set_dates(self, queryset, field, value):
+        queryset.update(**{field: timezone.make_aware(timezone.datetime(*value))})
+
+    def test_client_fields(self):
+        young, old = self.create_clients(1, age=20), self.create_clients(1, age=60)
+        nurse = self.create_clients(1, profession='Nurse', area_of_residence='Kisumu', age=40)
+        self.set_dates(Client.objects.filter(pk=old[0].pk), 'created_at', (2024, 1, 5))
+        self.assertEqual(self.ids('client-list', age_min=30, age_max=50), {nurse[0].pk})
+        self.assertEqual(self.ids('client-list', age_max=20), {young[0].pk})
+        self.assertEqual(self.ids('client-list', area_of_residence='Kisumu'), {nurse[0].pk})
+        self.assertEqual(self.ids('client-list', profession='Nurse', age_min=41), set())
+        self.assertEqual(self.ids('client-list', created_before='2024-02-01'), {old[0].pk})
+        self.assertEqual(self.ids('client-list', created_since='2024-01-05T00:00:01Z'), {young[0].pk, nurse[0].pk})
+
+    def test_enrollment_filters_hold_for_one_enrollment(self):
+        tb, hiv = self.create_programs(2)
+        both = self.create_clients(1, [tb, hiv])[0]
+        tb_only = self.create_clients(1, [tb])[0]
+        self.set_dates(Enrollment.objects.filter(client=both, program=tb), 'enrolled_at', (2025, 1, 10))
+        self.set_dates(Enrollment.objects.filter(client=both, program=hiv), 'enrolled_at', (2025, 4, 1))
+        self.set_dates(Enrollment.objects.filter(client=tb_only), 'enrolled_at', (2025, 3, 2))
+
+        # Enrolled in TB since March: not a client enrolled in TB earlier and in HIV since.
+        self.assertEqual(self.ids('client-list', program=tb.short_code, enrolled_since='2025-03-01'), {tb_only.pk})
+        self.assertEqual(self.ids('client-list', enrolled_since='2025-03-01'), {both.pk, tb_only.pk})
+        self.assertEqual(self.ids('client-list', program=hiv.pk), {both.pk})
+        # A client with two matching enrollments is listed once.
+        response = self.client.get(reverse('client-list'), {'enrolled_since': '2025-01-01'})
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_enrollment_list(self):
+        tb, hiv = self.create_programs(2)
+        nairobi = self.create_clients(1, [tb, hiv])[0]
+        kisumu = self.create_clients(1, [tb], area_of_residence='Kisumu', age=50)[0]
+        self.set_dates(Enrollment.objects.filter(client=nairobi, program=hiv), 'enrolled_at', (2025, 6, 1))
+        enrollments = {(e.client_id, e.program_id): e.pk for e in Enrollment.objects.all()}
+        self.assertEqual(
+            self.ids('enrollment-list', program=tb.short_code.lower()),
+            {enrollments[nairobi.pk, tb.pk], enrollments[kisumu.pk, tb.pk]},
+        )
+        self.assertEqual(self.ids('enrollment-list', area_of_residence='Kisumu'), {enrollments[kisumu.pk, tb.pk]})
+        self.assertEqual(self.ids('enrollment-list', age_min=40, program=hiv.pk), set())
+        self.assertEqual(self.ids('enrollment-list', enrolled_before='2025-07-01'), {enrollments[nairobi.pk, hiv.pk]})
+
+    def test_same_results_without_fast_serialization(self):
+        program = self.create_programs(1)[0]
+        self.create_clients(3, [program], area_of_residence='Kisumu')
+        self.create_clients(2)
+        for name in ('client-list', 'enrollment-list'):
+            with override_settings(FAST_READ_SERIALIZATION=False):
+                slow = self.client.get(reverse(name), {'area_of_residence': 'Kisumu'}).data
+            self.assertEqual(self.client.get(reverse(name), {'area_of_residence': 'Kisumu'}).data, slow)
+            self.assertEqual(len(slow['results']), 3)
+
+    def test_invalid_values(self):
+        self.create_programs(1)
+        response = self.client.get(reverse('client-list'), {'age_min': 'old', 'created_since': 'March', 'program': 'XYZ'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {'age_min', 'created_since', 'program'})
+        response = self.client.get(reverse('enrollment-list'), {'enrolled_before': '2025-13-01'})
+        self.assertEqual(response.status_code, 400)
+        # Beyond the range of a 64-bit integer column.
+        response = self.client.get(reverse('client-list'), {'program': '9' * 30, 'age_max': str(2 ** 63)})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {'program', 'age_max'})
+        self.assertEqual(self.client.get(reverse('client-list'), {'program': str(2 ** 63 - 1)}).status_code, 200)
+
+    def test_blank_values_are_ignored(self):
+        self.create_clients(2)
+        self.assertEqual(len(self.ids('client-list', area_of_residence='', age_min='')), 2)
+
+
+class ClientSearchTests(APITestMixin, APITestCase):
+
+    def search(self, query, **params):
+        params['q'] = query
+        response = self.client.get(reverse('client-search'), params)
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data['results']]
+
+    def test_prefix_match_on_names_and_area(self):
+        wanjiru = self.create_clients(1, first_name='Wanjiru', last_name='Kamau')[0]
+        self.create_clients(1, first_name='Otieno', area_of_residence='Kisumu')
+        self.assertEqual(self.search('wanj'), [wanjiru.id])
+        self.assertEqual(self.search('Wanjiru Kam'), [wanjiru.id])
+        self.assertEqual(len(self.search('kisu')), 1)
+        self.assertEqual(self.search('zzz'), [])
+
+    def test_name_matches_rank_above_area_matches(self):
+        by_area = self.create_clients(1, first_name='Amina', area_of_residence='Kerugoya')[0]
+        by_name = self.create_clients(1, first_name='Kerubo', area_of_residence='Nairobi')[0]
+        self.assertEqual(self.search('keru'), [by_name.id, by_area.id])
+
+    def test_phone_numbers_match_in_any_format(self):
+        client = self.create_clients(1, phone_number='+254712345678')[0]
+        self.create_clients(1, phone_number='0722000000')
+        self.assertEqual(client.normalized_phone, '0712345678')
+        for query in ('+254 712 345', '254712', '0712-345-678', '07123'):
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query), [client.id])
+
+    def test_limit_and_offset(self):
+        clients = self.create_clients(5, last_name='Njoroge')
+        ids = self.search('njor', limit=10)
+        self.assertCountEqual(ids, [client.id for client in clients])
+        self.assertEqual(self.search('njor', limit=2, offset=1), ids[1:3])
+        response = self.client.get(reverse('client-search'), {'q': 'njor', 'limit': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_index_follows_updates_deletes_and_bulk_inserts(self):
+        client = self.create_clients(1, first_name='Baraka')[0]
+        client.first_name = 'Chege'
+        client.save()
+        self.assertEqual(self.search('bara'), [])
+        self.assertEqual(self.search('cheg'), [client.id])
+        client.delete()
+        self.assertEqual(self.search('cheg'), [])
+
+        Client.objects.bulk_create([
+            Client(first_name='Dede', last_name='Auma', age=20, phone_number='0700000001', area_of_residence='Busia'),
+        ])
+        self.assertEqual(len(self.search('dede')), 1)
+
+    def test_install_is_idempotent(self):
+        backend = get_search_backend()
+        backend.install()
+        backend.install()
+        self.create_clients(1, first_name='Halima')
+        self.assertEqual(len(backend.search('hali')), 1)
+
+
+class BulkCreateTests(APITestMixin, APITestCase):
+
+    def client_rows(self, count, start=0):
+        return [
+            {
+                'first_name': f'Bulk{i}', 'last_name': 'Client', 'age': 25,
+                'phone_number': f'+2547110{i:05d}', 'area_of_residence': 'Nakuru',
+            }
+            for i in range(start, start + count)
+        ]
+
+    def test_bulk_clients_created_in_one_transaction(self):
+        response = self.client.post(reverse('client-bulk'), self.client_rows(3), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 3)
+        self.assertTrue(all(row['id'] for row in response.data))
+        self.assertEqual(
+            set(Client.objects.values_list('normalized_phone', flat=True)),
+            {'0711000000', '0711000001', '0711000002'},
+        )
+
+    def test_bulk_clients_report_row_errors_and_write_nothing(self):
+        rows = self.client_rows(3)
+        rows[1]['phone_number'] = 'not-a-phone'
+        rows[2]['age'] = 200
+        response = self.client.post(reverse('client-bulk'), rows, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.data['detail']
+        self.assertEqual(errors[0], {})
+        self.assertIn('phone_number', errors[1])
+        self.assertIn('age', errors[2])
+        self.assertFalse(Client.objects.exists())
+
+    def test_bulk_enrollments(self):
+        programs = self.create_programs(2)
+        clients = self.create_clients(2)
+        rows = [{'client_id': c.id, 'program_id': p.id} for c in clients for p in programs]
+        response = self.client.post(reverse('enrollment-bulk'), rows, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Enrollment.objects.count(), 4)
+        self.assertTrue(all(row['enrollment_id'].startswith('P') for row in response.data))
+
+    def test_bulk_enrollment_errors(self):
+        program = self.create_programs(1)[0]
+        enrolled, fresh = self.create_clients(2)
+        Enrollment.objects.create(client=enrolled, program=program)
+        rows = [
+            {'client_id': fresh.id, 'program_id': program.id},
+            {'client_id': enrolled.id, 'program_id': program.id},
+            {'client_id': 0, 'program_id': program.id},
+            {'client_id': fresh.id, 'program_id': 0},
+            {'client_id': fresh.id, 'program_id': program.id},
+        ]
+        response = self.client.post(reverse('enrollment-bulk'), rows, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.data['detail']
+        self.assertEqual(errors[0], {})
+        self.assertIn('non_field_errors', errors[1])
+        self.assertIn('client_id', errors[2])
+        self.assertIn('program_id', errors[3])
+        self.assertIn('non_field_errors', errors[4])
+        self.assertEqual(Enrollment.objects.count(), 1)
+
+        # As with a single serializer, field errors are reported before lookups run.
+        rows = [{'client_id': fresh.id, 'program_id': program.id}, {'client_id': 'x', 'program_id': program.id}]
+        response = self.client.post(reverse('enrollment-bulk'), rows, format='json')
+        self.assertEqual(response.data['detail'][0], {})
+        self.assertIn('client_id', response.data['detail'][1])
+
+    def test_unknown_programs_are_looked_up_once_per_batch(self):
+        program = self.create_programs(1)[0]
+        clients = self.create_clients(3)
+        program_catalog.entries()
+        rows = [{'client_id': client.id, 'program_id': 999999 + i} for i, client in enumerate(clients * 10)]
+        rows.append({'client_id': clients[0].id, 'program_id': program.id})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('enrollment-bulk'), rows, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(all('program_id' in errors for errors in response.data['detail'][:-1]))
+        self.assertEqual(response.data['detail'][-1], {})
+        program_queries = [q['sql'] for q in queries.captured_queries if 'FROM "programs_program"' in q['sql']]
+        self.assertEqual(len(program_queries), 1, program_queries)
+
+    def test_batch_size_limit(self):
+        with mock.patch('clients.views.BulkCreateMixin.bulk_max_size', 2):
+            response = self.client.post(reverse('client-bulk'), self.client_rows(3), format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_query_count_is_constant_per_batch(self):
+        programs = self.create_programs(3)
+        # Warms the id sequences and the Nakuru stat rows, which outlive the client.
+        self.create_clients(1, programs, area_of_residence='Nakuru')
+        program_catalog.entries()
+        for size in (5, 60):
+            with self.subTest(size=size):
+                Client.objects.all().delete()
+                # Savepoint, clients, blocking keys.
+                with self.assertNumQueries(4):
+                    response = self.client.post(reverse('client-bulk'), self.client_rows(size), format='json')
+                self.assertEqual(response.status_code, 201)
+
+                rows = [
+                    {'client_id': row['id'], 'program_id': program.id}
+                    for row in response.data for program in programs
+                ]
+                # clients and existing pairs; savepoint; one id block
+                # (update + read) per program; insert; one stat update per
+                # program; release.
+                with self.assertNumQueries(14):
+                    response = self.client.post(reverse('enrollment-bulk'), rows, format='json')
+                self.assertEqual(response.status_code, 201)
+
+
+class EnrollmentIdTests(TestCase):
+
+    def test_format_and_uniqueness(self):
+        program = Program.objects.create(name='Tuberculosis', short_code='TB')
+        ids = generate_enrollment_ids(program, 500, year=2025)
+        self.assertEqual(len(set(ids)), 500)
+        for enrollment_id in ids:
+            short_code, year, suffix = enrollment_id.split('/')
+            self.assertEqual((short_code, year, len(suffix)), ('TB', '2025', 8))
+            self.assertTrue(suffix.isalnum())
+
+    def test_counters_are_per_program_and_year(self):
+        tb = Program.objects.create(name='Tuberculosis', short_code='TB')
+        hiv = Program.objects.create(name='HIV', short_code='HIV')
+        self.assertEqual(generate_enrollment_ids(tb, year=2025), [f'TB/2025/{encode_counter(1)}'])
+        self.assertEqual(generate_enrollment_ids(tb, year=2026), [f'TB/2026/{encode_counter(1)}'])
+        self.assertEqual(generate_enrollment_ids(hiv, 2, year=2025), [
+            f'HIV/2025/{encode_counter(1)}', f'HIV/2025/{encode_counter(2)}',
+        ])
+
+    def test_encoding_is_collision_free(self):
+        suffixes = {encode_counter(value) for value in range(100000)}
+        self.assertEqual(len(suffixes), 100000)
+        self.assertEqual(encode_counter(SPACE + 7), encode_counter(7))
+
+
+class ConcurrentEnrollmentTests(TransactionTestCase):
+
+    def test_parallel_enrollments_never_collide(self):
+        program = Program.objects.create(name='Malaria', short_code='MAL')
+        clients = [
+            Client.objects.create(
+                first_name=f'C{i}', last_name='Thread', age=40,
+                phone_number=f'+2547200{i:05d}', area_of_residence='Kilifi',
+            )
+            for i in range(80)
+        ]
+        integrity_errors = []
+        barrier = threading.Barrier(8)
+
+        def enroll(batch):
+            barrier.wait()
+            try:
+                for client in batch:
+                    try:
+                        Enrollment.objects.create(client=client, program=program)
+                    except IntegrityError as exc:
+                        integrity_errors.append(exc)
+            finally:
+                close_old_connections()
+                connection.close()
+
+        threads = [threading.Thread(target=enroll, args=(clients[i::8],)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(integrity_errors, [])
+        ids = list(Enrollment.objects.values_list('enrollment_id', flat=True))
+        self.assertEqual(len(ids), 80)
+        self.assertEqual(len(set(ids)), 80)
+
+
+class ConcurrentWriterStressTests(TransactionTestCase):
+    """
+    Concurrent writers on the enrollment endpoints against the configured
+    database; with the default settings, a WAL-mode SQLite file. Every
+    request must succeed without "database is locked" errors.
+    """
+
+    def test_enrollment_endpoints_under_concurrent_writers(self):
+        # ENROLLMENT_STRESS_WRITERS=32 for a heavier run.
+        writers = int(os.environ.get('ENROLLMENT_STRESS_WRITERS', 8))
+        per_writer = 12
+        admin = get_user_model().objects.create_user(
+            username='admin', email='admin@healthcare.local', password='pass12345', is_staff=True
+        )
+        programs = [Program.objects.create(name=f'Program {i}', short_code=f'P{i}') for i in range(3)]
+        clients = Client.objects.bulk_create([
+            Client(
+                first_name=f'C{i}', last_name='Stress', age=30, phone_number=f'07{i:08d}',
+                normalized_phone=f'07{i:08d}', area_of_residence=f'Area{i % 3}',
+            )
+            for i in range(writers * per_writer)
+        ])
+        failures = []
+        barrier = threading.Barrier(writers)
+
+        def write(batch):
+            api = APIClient()
+            api.force_authenticate(user=admin)
+            barrier.wait()
+            try:
+                for n, client in enumerate(batch):
+                    if n % 4 == 3:
+                        rows = [{'client_id': client.pk, 'program_id': program.pk} for program in programs]
+                        response = api.post(reverse('enrollment-bulk'), rows, format='json')
+                    else:
+                        row = {'client_id': client.pk, 'program_id': programs[n % 3].pk}
+                        response = api.post(reverse('enrollment-list'), row, format='json')
+                    if response.status_code != 201:
+                        failures.append((response.status_code, response.data))
+                    api.get(reverse('enrollment-list'))
+            except Exception as exc:
+                failures.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=write, args=(clients[i::writers],)) for i in range(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(failures, [])
+        expected = writers * sum(3 if n % 4 == 3 else 1 for n in range(per_writer))
+        ids = list(Enrollment.objects.values_list('enrollment_id', flat=True))
+        self.assertEqual(len(ids), expected)
+        self.assertEqual(len(set(ids)), expected)
+        call_command('rebuild_enrollment_stats', '--check', stdout=io.StringIO())
+
+
+class ClientExportTests(APITestMixin, APITestCase):
+
+    def export(self, **params):
+        response = self.client.get(reverse('client-export'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export(self):
+        programs = self.create_programs(2)
+        self.create_clients(2, programs)
+        rows = list(csv.DictReader(io.StringIO(self.export(format='csv'))))
+        self.assertEqual([row['first_name'] for row in rows], ['First0', 'First1'])
+        self.assertEqual(rows[0]['programs'], 'P0;P1')
+        self.assertEqual(len(rows[0]['enrollment_ids'].split(';')), 2)
+
+    def test_ndjson_export_matches_client_serializer(self):
+        programs = self.create_programs(1)
+        client = self.create_clients(1, programs)[0]
+        lines = self.export(format='ndjson').splitlines()
+        self.assertEqual(len(lines), 1)
+        expected = self.client.get(reverse('client-detail', args=[client.pk])).data
+        self.assertEqual(json.loads(lines[0]), json.loads(json.dumps(expected)))
+
+    def test_filters(self):
+        tb, hiv = self.create_programs(2)
+        self.create_clients(2, [tb], area_of_residence='Kisumu')
+        self.create_clients(3, [hiv], area_of_residence='Nairobi')
+        self.assertEqual(len(self.export(format='ndjson', program=tb.pk).splitlines()), 2)
+        self.assertEqual(len(self.export(format='ndjson', area_of_residence='Nairobi').splitlines()), 3)
+        self.assertEqual(self.export(format='ndjson', program=tb.pk, area_of_residence='Nairobi'), '')
+
+    def test_memory_stays_flat(self):
+        # EXPORT_TEST_ROWS=1000000 runs the full-size registry check.
+        total = int(os.environ.get('EXPORT_TEST_ROWS', 3000))
+        program = self.create_programs(1)[0]
+        for start in range(0, total, 5000):
+            clients = Client.objects.bulk_create([
+                Client(
+                    first_name=f'First{i}', last_name=f'Last{i}', age=30, phone_number=f'07{i:08d}',
+                    normalized_phone=f'07{i:08d}', area_of_residence='Nairobi',
+                )
+                for i in range(start, min(start + 5000, total))
+            ])
+            Enrollment.objects.bulk_create(
+                [Enrollment(client=client, program=program, enrollment_id=f'P0/{client.pk}') for client in clients]
+            )
+
+        response = self.client.get(reverse('client-export'), {'format': 'ndjson'})
+        tracemalloc.start()
+        try:
+            rows = sum(chunk.count(b'\n') for chunk in response.streaming_content)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(rows, total)
+        self.assertLess(peak, 32 * 1024 * 1024)
+
+
+class ClientImportTests(APITestMixin, APITestCase):
+    header = 'first_name,last_name,age,phone_number,area_of_residence,profession,programs\n'
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def csv_rows(self, count, start=0):
+        return ''.join(f'First{i},Last{i},30,07{i:08d},Nairobi,Teacher,P0\n' for i in range(start, start + count))
+
+    def test_command_imports_valid_rows_and_skips_duplicates(self):
+        self.create_programs(2)
+        self.create_clients(1, phone_number='+254700000001')
+        path = self.write('clients.csv', self.header + self.csv_rows(4) + (
+            'Dup,Row,40,0700000002,Kisumu,,P0;P1\n'   # same phone as row 3 in this file
+            'Bad,Age,-1,0700000009,Kisumu,,\n'
+            'Bad,Program,30,0700000010,Kisumu,,XX\n'
+        ))
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_clients', path, '--chunk-size', '3', stdout=out, stderr=err)
+
+        self.assertEqual(Client.objects.count(), 4)
+        self.assertEqual(Enrollment.objects.filter(program__short_code='P0').count(), 3)
+        self.assertTrue(all(Enrollment.objects.values_list('enrollment_id', flat=True)))
+        self.assertIn('Imported 3 clients and 3 enrollments from 7 rows (2 duplicates, 2 invalid)', out.getvalue())
+        self.assertIn('rows/sec', out.getvalue())
+        self.assertIn('row 6:', err.getvalue())
+        self.assertIn('row 7:', err.getvalue())
+        call_command('rebuild_enrollment_stats', '--check', stdout=io.StringIO())
+
+    def test_resume_skips_committed_chunks(self):
+        self.create_programs(1)
+        path = self.write('clients.csv', self.header + self.csv_rows(6))
+        checkpoint = path + '.checkpoint.json'
+        original = ClientImporter.import_chunk
+        calls = []
+
+        def fail_on_second_chunk(importer, chunk, first_row):
+            calls.append(first_row)
+            if len(calls) == 2:
+                raise OperationalError('database is locked')
+            return original(importer, chunk, first_row)
+
+        with mock.patch.object(ClientImporter, 'import_chunk', fail_on_second_chunk), self.assertRaises(OperationalError):
+            call_command('import_clients', path, '--chunk-size', '2', stdout=io.StringIO())
+        self.assertEqual(Client.objects.count(), 2)
+        with open(checkpoint) as f:
+            self.assertEqual(json.load(f)['rows'], 2)
+
+        with mock.patch.object(ClientImporter, 'import_chunk', autospec=True, side_effect=original) as import_chunk:
+            call_command('import_clients', path, '--chunk-size', '2', '--resume', stdout=io.StringIO())
+        self.assertEqual([c.kwargs['first_row'] for c in import_chunk.call_args_list], [3, 5])
+        self.assertEqual(Client.objects.count(), 6)
+
+    def test_upload_endpoint(self):
+        self.create_programs(1)
+        lines = [
+            {'first_name': 'Amina', 'last_name': 'Otieno', 'age': 34, 'phone_number': '+254711000001',
+             'area_of_residence': 'Kisumu', 'programs': ['P0']},
+            {'first_name': 'Amina', 'last_name': 'Otieno', 'age': 34, 'phone_number': '0711000001',
+             'area_of_residence': 'Kisumu'},
+            {'first_name': '', 'last_name': 'Nobody', 'age': 20, 'phone_number': '0711000002',
+             'area_of_residence': 'Kisumu'},
+        ]
+        upload = SimpleUploadedFile('clients.ndjson', ''.join(json.dumps(line) + '\n' for line in lines).encode())
+        response = self.client.post(reverse('client-import-clients'), {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {key: response.data[key] for key in ('rows', 'created', 'duplicates', 'invalid', 'enrollments')},
+            {'rows': 3, 'created': 1, 'duplicates': 1, 'invalid': 1, 'enrollments': 1},
+        )
+        self.assertEqual(response.data['errors'], [{'row': 3, 'errors': {'first_name': ['This field cannot be blank.']}}])
+        self.assertEqual(Client.objects.get().enrollments.get().program.short_code, 'P0')
+
+        response = self.client.post(reverse('client-import-clients'), {}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+
+    def test_records_that_are_not_objects_are_row_errors(self):
+        lines = ['[1, 2]', '"text"', json.dumps({'first_name': 'Amina', 'last_name': 'Otieno', 'age': 34,
+                                                 'phone_number': '0711000001', 'area_of_residence': 'Kisumu',
+                                                 'programs': 7})]
+        upload = SimpleUploadedFile('clients.ndjson', '\n'.join(lines).encode())
+        response = self.client.post(reverse('client-import-clients'), {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['invalid'], 3)
+        self.assertEqual([error['row'] for error in response.data['errors']], [1, 2, 3])
+        self.assertEqual(response.data['errors'][0]['errors'], {'row': ['Expected an object, got list']})
+        self.assertEqual(response.data['errors'][2]['errors'], {'programs': ['Expected a list of short codes']})
+
+    def test_parse_failure_reports_the_rows_imported_before_it(self):
+        lines = [json.dumps({'first_name': f'First{i}', 'last_name': 'Otieno', 'age': 30,
+                             'phone_number': f'07110000{i:02d}', 'area_of_residence': 'Kisumu'}) for i in range(5)]
+        lines.insert(3, '{"first_name": ')
+        upload = SimpleUploadedFile('clients.ndjson', '\n'.join(lines).encode())
+        with mock.patch('clients.views.ClientImporter', lambda: ClientImporter(chunk_size=2)):
+            response = self.client.post(reverse('client-import-clients'), {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual((response.data['rows'], response.data['created']), (3, 3))
+        self.assertIn('Could not parse row 4', response.data['file'][0])
+        self.assertEqual(Client.objects.count(), 3)
+
+    def test_export_round_trips_through_import(self):
+        programs = self.create_programs(2)
+        self.create_clients(3, programs)
+        export = b''.join(self.client.get(reverse('client-export'), {'format': 'csv'}).streaming_content)
+        Client.objects.all().delete()
+
+        upload = SimpleUploadedFile('clients.csv', export)
+        response = self.client.post(reverse('client-import-clients'), {'file': upload}, format='multipart')
+        self.assertEqual((response.data['created'], response.data['enrollments']), (3, 6))
+
+
+class EnrollmentStatTests(APITestMixin, APITestCase):
+
+    def stats(self):
+        response = self.client.get(reverse('program-stats'))
+        self.assertEqual(response.status_code, 200)
+        return {row['short_code']: row for row in response.data['results']}
+
+    def assertConsistent(self):
+        call_command('rebuild_enrollment_stats', '--check', stdout=io.StringIO())
+
+    def test_counts_follow_every_write_path(self):
+        tb, hiv = self.create_programs(2)
+        kisumu = self.create_clients(2, [tb], area_of_residence='Kisumu')
+        self.create_clients(1, [tb, hiv], area_of_residence='Nairobi', phone_number='+254711000000')
+        newcomer = self.create_clients(1, area_of_residence='Mombasa', phone_number='+254722000000')[0]
+        response = self.client.post(
+            reverse('enrollment-bulk'), [{'client_id': newcomer.pk, 'program_id': hiv.pk}], format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertConsistent()
+
+        month = f'{timezone.now():%Y-%m}'
+        stats = self.stats()
+        self.assertEqual(stats['P0']['total'], 3)
+        self.assertEqual(stats['P0']['by_area'], {'Kisumu': 2, 'Nairobi': 1})
+        self.assertEqual(stats['P0']['by_month'], {month: 3})
+        self.assertEqual(stats['P1']['by_area'], {'Mombasa': 1, 'Nairobi': 1})
+
+        kisumu[0].enrollments.get().delete()
+        kisumu[1].delete()
+        newcomer.area_of_residence = 'Nakuru'
+        newcomer.save()
+        self.assertConsistent()
+        stats = self.stats()
+        self.assertEqual(stats['P0']['by_area'], {'Nairobi': 1})
+        self.assertEqual(stats['P1']['by_area'], {'Nairobi': 1, 'Nakuru': 1})
+
+    def test_deleting_a_client_does_not_query_per_enrollment(self):
+        programs = self.create_programs(6)
+
+        def stat_queries(enrollments):
+            client = self.create_clients(1, programs[:enrollments], phone_number=f'+25471100000{enrollments}')[0]
+            with CaptureQueriesContext(connection) as queries:
+                client.delete()
+            return [q['sql'] for q in queries if 'clients_enrollmentstat' in q['sql'] or 'FROM "clients_client"' in q['sql']]
+
+        self.assertEqual(len(stat_queries(6)), len(stat_queries(1)) + 5)  # one UPDATE per program
+        self.assertConsistent()
+
+    def test_client_updates_without_area_skip_the_lookup(self):
+        client = self.create_clients(1)[0]
+        client.profession = 'Teacher'
+        with CaptureQueriesContext(connection) as queries:
+            client.save(update_fields=['profession'])
+        self.assertFalse([q for q in queries if q['sql'].startswith('SELECT') and 'FROM "clients_client"' in q['sql']])
+        client.area_of_residence = 'Nakuru'
+        client.save(update_fields=['area_of_residence'])
+        self.assertConsistent()
+
+    def test_reads_cost_one_query_however_many_enrollments(self):
+        programs = self.create_programs(3)
+        self.create_clients(20, programs)
+        program_catalog.entries()
+        with self.assertNumQueries(1):
+            self.client.get(reverse('program-stats'))
+
+    def test_check_and_rebuild(self):
+        program = self.create_programs(1)[0]
+        self.create_clients(3, [program])
+        EnrollmentStat.objects.update(count=1)
+        out = io.StringIO()
+        with self.assertRaisesMessage(CommandError, '1 stat rows are out of date'):
+            call_command('rebuild_enrollment_stats', '--check', stdout=out)
+        self.assertIn('stored 1, actual 3', out.getvalue())
+
+        call_command('rebuild_enrollment_stats', stdout=io.StringIO())
+        self.assertConsistent()
+        self.assertEqual(self.stats()['P0']['total'], 3)
+
+
+class SeedSyntheticTests(TestCase):
+
+    def test_seeds_consistent_data_with_bulk_inserts(self):
+        with CaptureQueriesContext(connection) as queries:
+            call_command('seed_synthetic', clients=120, programs=4, batch_size=50, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(Client.objects.count(), 120)
+        self.assertEqual(Program.objects.count(), 4)
+        self.assertEqual(Client.objects.values('normalized_phone').distinct().count(), 120)
+        self.assertEqual(ClientBlockingKey.objects.values('client').distinct().count(), 120)
+        self.assertTrue(Enrollment.objects.exists())
+        call_command('rebuild_enrollment_stats', '--check', stdout=io.StringIO())
+        # One insert per table and batch.
+        for table in ('clients_client', 'clients_enrollment', 'clients_clientblockingkey'):
+            inserts = [q for q in queries.captured_queries if q['sql'].startswith(f'INSERT INTO "{table}"')]
+            self.assertEqual(len(inserts), 3, table)
+
+        # Programs already present are kept; only new names are added.
+        call_command('seed_synthetic', clients=0, programs=2, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(Program.objects.count(), 6)
+        self.assertEqual(Program.objects.filter(short_code__in=['HIV', 'TB', 'MAL', 'MCH', 'DM', 'HTN']).count(), 6)
+
+
+class DuplicateDetectionTests(APITestMixin, APITestCase):
+
+    def register(self, first_name, last_name, age, phone_number):
+        return self.create_clients(1, first_name=first_name, last_name=last_name, age=age, phone_number=phone_number)[0]
+
+    def keys(self, client):
+        return set(client.blocking_keys.values_list('key', flat=True))
+
+    def test_phonetic_codes_and_similarity(self):
+        self.assertEqual([soundex(name) for name in ('Robert', 'Rupert', 'Ashcraft', 'Tymczak', 'Lee')],
+                         ['R163', 'R163', 'A261', 'T522', 'L000'])
+        self.assertEqual(soundex("O'Brien-2"), soundex('OBrien'))
+        self.assertAlmostEqual(jaro_winkler('martha', 'marhta'), 0.961, places=3)
+        self.assertAlmostEqual(jaro_winkler('dwayne', 'duane'), 0.84, places=3)
+        self.assertEqual(jaro_winkler('abc', 'xyz'), 0.0)
+        # Overlapping age bands: ages five years apart always share a name key.
+        for age in range(0, 100):
+            self.assertTrue(set(blocking_keys('Ann', 'Otieno', age, '')) & set(blocking_keys('Ann', 'Otieno', age + 5, '')))
+
+    def test_keys_follow_every_write_path(self):
+        client = self.register('Grace', 'Achieng', 34, '+254700111222')
+        self.assertEqual(self.keys(client), {'phone:0700111222', 'name:A252:G620:a3', 'name:A252:G620:b3'})
+
+        client.phone_number = '0711 000 111'
+        client.age = 36
+        client.save()
+        self.assertEqual(self.keys(client), {'phone:0711000111', 'name:A252:G620:a3', 'name:A252:G620:b4'})
+
+        payload = [{'first_name': 'Brian', 'last_name': 'Kamau', 'age': 20, 'phone_number': '+254733000001',
+                    'area_of_residence': 'Nairobi', 'profession': ''}]
+        self.assertEqual(self.client.post(reverse('client-bulk'), payload, format='json').status_code, 201)
+        importer = ClientImporter()
+        importer.run(io.StringIO('first_name,last_name,age,phone_number,area_of_residence\n'
+                                 'Cynthia,Wanjiru,41,+254744000001,Nakuru\n'), 'csv')
+        for last_name in ('Kamau', 'Wanjiru'):
+            self.assertEqual(len(self.keys(Client.objects.get(last_name=last_name))), 3)
+
+        client.delete()
+        self.assertEqual(ClientBlockingKey.objects.count(), 6)
+
+    def test_suggests_scored_merges_within_blocks(self):
+        original = self.register('Grace', 'Achieng', 34, '+254700111222')
+        typo = self.register('Grace', 'Acheing', 35, '+254700111222')
+        moved = self.register('Grace', 'Achieng', 34, '+254799999999')
+        self.register('Grace', 'Achieng', 70, '+254788888888')  # same name, another person
+        self.register('Peter', 'Mwangi', 34, '+254700111333')
+
+        response = self.client.get(reverse('client-duplicates', args=[original.pk]))
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual([result['duplicate_id'] for result in results], [typo.pk, moved.pk])
+        self.assertEqual(results[0]['reasons'], ['same phone number', 'same first name', 'similar last name', 'age within a year'])
+        self.assertGreater(results[0]['score'], results[1]['score'])
+
+        response = self.client.get(reverse('client-duplicates', args=[original.pk]), {'min_score': '0.95'})
+        self.assertEqual([result['duplicate_id'] for result in response.data['results']], [typo.pk])
+        self.assertEqual(self.client.get(reverse('client-duplicates', args=[original.pk]), {'min_score': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('client-duplicates', args=[0])).status_code, 404)
+
+        # A misspelt name and another phone number is too little to go on.
+        pairs = {(s['client_id'], s['duplicate_id']) for s in find_duplicates()}
+        self.assertEqual(pairs, {(original.pk, typo.pk), (original.pk, moved.pk)})
+        records = Client.objects.values('id', 'first_name', 'last_name', 'age', 'normalized_phone')
+        in_memory, _ = find_duplicates_in_records(list(records))
+        self.assertEqual({(s['client_id'], s['duplicate_id']) for s in in_memory}, pairs)
+
+    def test_command_skips_oversized_blocks_and_reindexes(self):
+        # A placeholder number used at intake.
+        self.create_clients(4, phone_number='+254700000000', first_name='Unknown', age=50)
+        self.register('Grace', 'Achieng', 34, '+254700111222')
+        self.register('Grace', 'Achieng', 34, '+254700111223')
+        ClientBlockingKey.objects.all().delete()
+
+        out, err = io.StringIO(), io.StringIO()
+        call_command('find_duplicates', '--reindex', '--json', '--max-block-size', '3', stdout=out, stderr=err)
+        suggestions = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([s['reasons'] for s in suggestions], [['same first name', 'same last name', 'same age']])
+        self.assertIn('Skipped block phone:0700000000 with 4 clients', err.getvalue())
+        self.assertIn('1 suggested duplicates', err.getvalue())
+        with self.assertRaisesMessage(CommandError, '--min-score must be between 0 and 1'):
+            call_command('find_duplicates', '--min-score', '2', stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_full_scan_reads_in_batches(self):
+        self.create_clients(30, first_name='Ann', last_name='Otieno')
+        with mock.patch('clients.dedup.SCAN_BATCH_SIZE', 7), CaptureQueriesContext(connection) as queries:
+            suggestions = list(find_duplicates(max_block_size=50))
+        # Every pair of the 30 namesakes shares a name key; each is scored once.
+        self.assertEqual(len(suggestions), 30 * 29 // 2)
+        self.assertGreater(len(queries), 2)
+
+
+@override_settings(SYNC_FEED={'PAGE_SIZE': 500, 'MAX_PAGE_SIZE': 2000, 'SETTLE_SECONDS': 0, 'TOMBSTONE_DAYS': 90})
+class SyncFeedTests(APITestMixin, APITestCase):
+
+    def sync(self, since=None, **params):
+        if since:
+            params['since'] = since
+        response = self.client.get(reverse('sync'), params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def ids(self, rows):
+        return [row['id'] for row in rows]
+
+    def test_full_download_in_pages(self):
+        programs = self.create_programs(2)
+        clients = self.create_clients(5, programs[:1])
+        pages, cursor = [], None
+        while True:
+            page = self.sync(cursor, limit=2)
+            pages.append(page)
+            cursor = page['cursor']
+            if not page['has_more']:
+                break
+        self.assertEqual(len(pages), 3)
+        self.assertEqual([client.pk for client in clients], [i for page in pages for i in self.ids(page['clients'])])
+        self.assertEqual(sum(len(page['enrollments']) for page in pages), 5)
+        self.assertEqual(sum(len(page['programs']) for page in pages), 2)
+        self.assertEqual(pages[0]['deleted'], {'clients': [], 'enrollments': [], 'programs': []})
+        # Rows match the API's own representation, without nesting.
+        detail = self.client.get(reverse('client-detail', args=[clients[0].pk])).json()
+        self.assertEqual(pages[0]['clients'][0], {k: v for k, v in detail.items() if k != 'enrollments'})
+        self.assertEqual(pages[0]['enrollments'][0], detail['enrollments'][0])
+
+    def test_returns_only_what_changed(self):
+        tb, hiv = self.create_programs(2)
+        clients = self.create_clients(10, [tb])
+        cursor = self.sync()['cursor']
+        self.assertEqual(self.sync(cursor)['clients'], [])
+
+        clients[3].profession = 'Teacher'
+        clients[3].save()
+        enrollment = Enrollment.objects.create(client=clients[4], program=hiv)
+        deleted_client, deleted_enrollments = clients[5].pk, list(clients[5].enrollments.values_list('id', flat=True))
+        clients[5].delete()
+        tb.description = 'Tuberculosis'
+        tb.save()
+        program_catalog.entries()
+        # One range scan per stream.
+        with self.assertNumQueries(4):
+            page = self.sync(cursor)
+        self.assertEqual(self.ids(page['clients']), [clients[3].pk])
+        self.assertEqual(page['clients'][0]['profession'], 'Teacher')
+        self.assertEqual(self.ids(page['enrollments']), [enrollment.pk])
+        self.assertEqual(self.ids(page['programs']), [tb.pk])
+        self.assertEqual(page['deleted'], {'clients': [deleted_client], 'enrollments': deleted_enrollments, 'programs': []})
+
+        cursor = page['cursor']
+        hiv_id, hiv_enrollments = hiv.pk, list(hiv.enrollments.values_list('id', flat=True))
+        hiv.delete()
+        page = self.sync(cursor)
+        self.assertEqual(page['deleted'], {'clients': [], 'enrollments': hiv_enrollments, 'programs': [hiv_id]})
+        self.assertEqual(self.sync(page['cursor'])['deleted'], {'clients': [], 'enrollments': [], 'programs': []})
+
+    def test_late_commits_inside_the_settle_window_are_sent(self):
+        self.create_clients(1)
+        with override_settings(SYNC_FEED={'SETTLE_SECONDS': 60}):
+            cursor = self.sync()['cursor']
+            # Stamped before the sync above, committed after it.
+            late = self.create_clients(1, phone_number='+254711000000')[0]
+            Client.objects.filter(pk=late.pk).update(updated_at=timezone.now() - timezone.timedelta(seconds=30))
+            page = self.sync(cursor)
+        self.assertIn(late.pk, self.ids(page['clients']))
+
+    def test_late_commits_are_sent_when_they_arrive_while_paging(self):
+        clients = self.create_clients(5)
+        seen = []
+        with override_settings(SYNC_FEED={'SETTLE_SECONDS': 60}):
+            page = self.sync(limit=2)
+            # Stamped inside the settle window, committed after the first page.
+            late = self.create_clients(1, phone_number='+254711000000')[0]
+            Client.objects.filter(pk=late.pk).update(updated_at=timezone.now() - timezone.timedelta(seconds=5))
+            for _ in range(10):
+                seen.extend(self.ids(page['clients']))
+                page = self.sync(page['cursor'], limit=2)
+        self.assertIn(late.pk, seen)
+        # Within the window the cursor stays put rather than paging on.
+        self.assertFalse(page['has_more'])
+        # The rest of the window is sent once it has settled.
+        cursor = page['cursor']
+        while True:
+            page = self.sync(cursor, limit=2)
+            seen.extend(self.ids(page['clients']))
+            cursor = page['cursor']
+            if not page['has_more']:
+                break
+        self.assertEqual({client.pk for client in clients} | {late.pk}, set(seen))
+
+    def test_rejects_bad_parameters_and_expired_cursors(self):
+        self.assertEqual(self.client.get(reverse('sync'), {'since': 'nonsense'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('sync'), {'limit': '0'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('sync'), {'limit': '2001'}).status_code, 400)
+        cursor = self.sync()['cursor']
+        with override_settings(SYNC_FEED={'TOMBSTONE_DAYS': 0, 'SETTLE_SECONDS': 10}):
+            response = self.client.get(reverse('sync'), {'since': cursor})
+        self.assertEqual(response.status_code, 410)
+        self.assertIn('sync again without one', response.json()['detail'])
+
+    def test_prune_tombstones(self):
+        self.create_clients(2)[0].delete()
+        Tombstone.objects.create(model=Tombstone.CLIENT, object_id=999, deleted_at=timezone.now() - timezone.timedelta(days=91))
+        out = io.StringIO()
+        call_command('prune_tombstones', stdout=out)
+        self.assertIn('Deleted 1 tombstones older than 90 days', out.getvalue())
+        self.assertEqual(Tombstone.objects.count(), 1)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Reads SQLite EXPLAIN QUERY PLAN output')
+class QueryPlanTests(APITestMixin, APITestCase):
+    """
+    Runs every API and admin page against a seeded registry and checks the
+    plan of each query it issues. Reading a large table is only accepted as
+    a walk along an index that stops at a LIMIT.
+    """
+    large_tables = ('clients_client', 'clients_enrollment')
+    # Inherently whole-table queries, matched on their SQL prefix.
+    allowed = (
+        'SELECT DISTINCT "clients_client"."area_of_residence"',  # admin area filter choices
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        # QUERY_PLAN_TEST_ROWS=1000000 checks the plans at full registry size.
+        total = int(os.environ.get('QUERY_PLAN_TEST_ROWS', 3000))
+        cls.programs = [Program.objects.create(name=f'Program {i}', short_code=f'P{i}') for i in range(5)]
+        for start in range(0, total, 5000):
+            clients = Client.objects.bulk_create([
+                Client(
+                    first_name=f'First{i}', last_name=f'Last{i % 500}', age=20 + i % 60, phone_number=f'07{i:08d}',
+                    normalized_phone=f'07{i:08d}', area_of_residence=f'Area{i % 40}', profession=f'Job{i % 10}',
+                )
+                for i in range(start, min(start + 5000, total))
+            ])
+            Enrollment.objects.bulk_create([
+                Enrollment(client=client, program=cls.programs[client.pk % 5], enrollment_id=f'P/{client.pk}')
+                for client in clients
+            ])
+        # Registrations and enrollments spread over 2024, a month per id.
+        for month in range(12):
+            created = timezone.make_aware(timezone.datetime(2024, month + 1, 1))
+            Client.objects.alias(month=Mod('id', 12)).filter(month=month).update(created_at=created)
+            Enrollment.objects.alias(month=Mod('id', 12)).filter(month=month).update(enrolled_at=created)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        super().setUp()
+        self.admin.is_superuser = True
+        self.admin.save()
+        self.client.force_login(self.admin)
+        # Estimate unfiltered changelist counts as on a full-size registry.
+        patcher = mock.patch.object(EstimatedCountPaginator, 'exact_count_limit', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def query_plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[3] for row in cursor.fetchall()]
+
+    def full_scans(self, sql):
+        scans = []
+        for step in self.query_plan(sql):
+            match = re.match(r'SCAN (\w+)( USING (?:COVERING )?INDEX \w+)?', step)
+            # Subquery aliases (U0, U1, ...) are always on a large table here.
+            if not match or not (match.group(1) in self.large_tables or re.fullmatch(r'U\d+', match.group(1))):
+                continue
+            if match.group(2) is None or ' LIMIT ' not in sql:
+                scans.append(step)
+        return scans
+
+    def assertNoFullScans(self, url, params=None, indexes=None):
+        """With ``indexes``, one of them must also be searched (not walked)."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200, url)
+        searched = set()
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if sql.startswith('SELECT') and not sql.startswith(self.allowed):
+                self.assertEqual(self.full_scans(sql), [], f'{url} {params or ""}: {sql}')
+                for step in self.query_plan(sql):
+                    match = re.match(r'SEARCH \w+ USING (?:COVERING )?INDEX (\w+)', step)
+                    if match:
+                        searched.add(match.group(1))
+        if indexes is not None:
+            self.assertTrue(searched & indexes, f'{url} {params or ""}: searched only {sorted(searched)}')
+        return response
+
+    def test_api_queries_use_indexes(self):
+        client = Client.objects.first()
+        program = self.programs[0]
+        first_page = self.assertNoFullScans(reverse('client-list'))
+        self.assertNoFullScans(first_page.data['next'])
+        self.assertNoFullScans(reverse('client-detail', args=[client.pk]))
+        self.assertNoFullScans(reverse('client-profile', args=[client.pk]))
+        self.assertNoFullScans(reverse('client-search'), {'q': 'First12'})
+        self.assertNoFullScans(reverse('client-export'), {'format': 'ndjson', 'area_of_residence': 'Area3'})
+        self.assertNoFullScans(reverse('client-export'), {'format': 'ndjson', 'program': program.pk})
+        self.assertNoFullScans(reverse('enrollment-list'))
+        self.assertNoFullScans(reverse('program-list'))
+        sync = self.assertNoFullScans(reverse('sync'), {'limit': 100})
+        self.assertNoFullScans(reverse('sync'), {'since': sync.json()['cursor']})
+        self.assertNoFullScans(reverse('program-stats'))
+
+    # The indexes that can answer each group of filters (see clients.filters).
+    filter_indexes = {
+        'age': ({'age_min': 25, 'age_max': 30}, {'client_age_idx'}),
+        'area': ({'area_of_residence': 'Area3'}, {'client_area_idx'}),
+        'profession': ({'profession': 'Job4'}, {'client_profession_idx'}),
+        'created': ({'created_since': '2024-03-01', 'created_before': '2024-04-01'}, {'client_created_at_idx'}),
+        'program': ({'program': 'P2'}, {'enrollment_program_idx'}),
+        'enrolled': (
+            {'enrolled_since': '2024-03-01', 'enrolled_before': '2024-04-01'},
+            {'enrollment_ordering_idx', 'enrollment_program_idx', 'enrollment_client_idx'},
+        ),
+    }
+
+    def test_filter_combinations_use_indexes(self):
+        groups = list(self.filter_indexes)
+        for url in (reverse('client-list'), reverse('enrollment-list')):
+            for n in range(1, len(groups) + 1):
+                for combination in itertools.combinations(groups, n):
+                    params, indexes = {}, set()
+                    for group in combination:
+                        params.update(self.filter_indexes[group][0])
+                        indexes |= self.filter_indexes[group][1]
+                    with self.subTest(url=url, filters=combination):
+                        response = self.assertNoFullScans(url, params, indexes)
+                        # Later pages may seek to the cursor in the ordering index instead.
+                        if response.data['next']:
+                            self.assertNoFullScans(response.data['next'])
+
+    def test_admin_queries_use_indexes(self):
+        since = '2020-01-01 00:00:00+00:00'
+        program = self.programs[1]
+        for url, params in (
+            ('admin:clients_client_changelist', {}),
+            ('admin:clients_client_changelist', {'area_of_residence': 'Area1'}),
+            ('admin:clients_client_changelist', {'created_at__gte': since}),
+            ('admin:clients_client_changelist', {'program': program.pk}),
+            ('admin:clients_enrollment_changelist', {}),
+            ('admin:clients_enrollment_changelist', {'program': program.pk}),
+            ('admin:clients_enrollment_changelist', {'enrolled_at__gte': since}),
+            ('admin:clients_client_changelist', {'q': 'First12'}),
+            ('admin:clients_enrollment_changelist', {'q': 'Program 2'}),
+        ):
+            with self.subTest(url=url, **params):
+                self.assertNoFullScans(reverse(url), params)
+
+
+class AdminChangelistTests(APITestMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.admin.is_superuser = True
+        self.admin.save()
+        self.client.force_login(self.admin)
+
+    def changelist(self, model, **params):
+        response = self.client.get(reverse(f'admin:clients_{model}_changelist'), params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def assertConstantQueries(self, num, model, grow, **params):
+        program_catalog.entries()
+        with self.assertNumQueries(num):
+            self.changelist(model, **params)
+        grow()
+        program_catalog.entries()
+        with self.assertNumQueries(num):
+            self.changelist(model, **params)
+
+    def test_client_changelist(self):
+        programs = self.create_programs(3)
+        self.create_clients(2, programs)
+        grow = lambda: self.create_clients(30, programs, first_name='More')
+        # session, user, area choices, row estimate and (small table) exact
+        # count, page, enrollments
+        self.assertConstantQueries(7, 'client', grow)
+        self.assertConstantQueries(6, 'client', grow, program=programs[0].pk)
+
+    def test_enrollment_changelist(self):
+        programs = self.create_programs(3)
+        self.create_clients(2, programs)
+        # session, user, row estimate and count, page joined with clients
+        self.assertConstantQueries(5, 'enrollment', lambda: self.create_clients(30, programs, first_name='More'))
+
+    def test_large_tables_get_estimated_counts(self):
+        self.create_clients(3)
+        with mock.patch.object(EstimatedCountPaginator, 'exact_count_limit', 2), \
+                CaptureQueriesContext(connection) as queries:
+            response = self.changelist('client')
+        self.assertEqual(response.context['cl'].result_count, Client.objects.order_by('-id').values_list('id', flat=True)[0])
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries.captured_queries))
+
+        # Filtered changelists are still counted exactly.
+        response = self.changelist('client', area_of_residence='Nairobi')
+        self.assertEqual(response.context['cl'].result_count, 3)
+
+    def test_search_uses_search_backend(self):
+        tb, hiv = self.create_programs(2)
+        wanjiru = self.create_clients(1, [tb], first_name='Wanjiru', phone_number='+254711000001')[0]
+        self.create_clients(2, [hiv])
+        with mock.patch('clients.admin.get_search_backend', wraps=get_search_backend) as backend:
+            response = self.changelist('client', q='wanj')
+        backend.assert_called_once()
+        self.assertEqual(list(response.context['cl'].result_list), [wanjiru])
+        self.assertEqual(len(self.changelist('client', q='0711 000 001').context['cl'].result_list), 1)
+
+        enrollment_id = wanjiru.enrollments.get().enrollment_id
+        for term, expected in ((enrollment_id, 1), ('wanjiru', 1), ('Program 1', 2), ('P1', 2)):
+            with self.subTest(term=term):
+                self.assertEqual(len(self.changelist('enrollment', q=term).context['cl'].result_list), expected)
@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ClientViewSet, EnrollmentViewSet
+from . import async_views
+from .views import ClientViewSet, EnrollmentViewSet, SyncView
 
 router = DefaultRouter()
 router.register(r'clients', ClientViewSet)
@@ -8,4 +9,7 @@ router.register(r'enrollments', EnrollmentViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('async/clients/search/', async_views.search, name='async-client-search'),
+    path('async/clients/<int:pk>/profile/', async_views.profile, name='async-client-profile'),
+    path('sync/', SyncView.as_view(), name='sync'),
 ]
\ No newline at end of file
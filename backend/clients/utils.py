@@ -0,0 +1,17 @@
+import re
+from django.conf import settings
+
+NON_DIGITS = re.compile(r'\D')
+
+
+def normalize_phone(value):
+    """
+    Reduce a phone number to its national digits so that "+254 712 345678",
+    "254712345678" and "0712345678" all compare equal. Works on prefixes too,
+    which lets search match a partially typed number.
+    """
+    digits = NON_DIGITS.sub('', value or '')
+    country_code = getattr(settings, 'PHONE_COUNTRY_CODE', '254')
+    if country_code and digits.startswith(country_code):
+        return '0' + digits[len(country_code):]
+    return digits
@@ -1,45 +1,233 @@
 # backend/clients/views.py
-from rest_framework import viewsets
+import io
+from rest_framework import viewsets, serializers
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
-from django.db.models import Q
+from rest_framework.views import APIView
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import Http404, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from healthcare.instrumentation import timed_serialization
+from healthcare.renderers import FastJSONRenderer, TimedJSONRenderer
+from .dedup import DEFAULT_MIN_SCORE, duplicates_of
+from .export import CSVRenderer, NDJSONRenderer, fast_serialized_chunks, serialized_chunks, stream_csv, stream_ndjson
+from .filters import ClientFilterSet, EnrollmentFilterSet
+from .fast_serializers import CLIENT_FIELDS, ENROLLMENT_FIELDS, fast_serialization_enabled, serialize_clients, serialize_enrollments
+from .importer import ClientImporter, FileParseError, guess_format
 from .models import Client, Enrollment
+from .profile_cache import cache_profile, get_cached_profile, patch_profile_headers, profile_validators
+from .search import get_search_backend
+from .sync import change_feed, sync_setting
 from .serializers import ClientSerializer, ClientCreateSerializer, EnrollmentSerializer, EnrollmentCreateSerializer
 
-class ClientViewSet(viewsets.ModelViewSet):
+class BulkCreateMixin:
+    """
+    POST a JSON array to ``<list>/bulk/`` to create every row in one
+    transaction. Nothing is written unless all rows are valid; errors come
+    back as a list aligned with the input, with ``{}`` for valid rows.
+    """
+    bulk_max_size = 5000
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        serializer = self.get_serializer(data=request.data, many=True, max_length=self.bulk_max_size)
+        if not serializer.is_valid():
+            return Response({"detail": serializer.errors}, status=400)
+        with transaction.atomic():
+            serializer.save()
+        with timed_serialization():
+            data = serializer.data
+        return Response(data, status=201)
+
+class FastReadMixin:
+    """
+    Serves ``fast_read_actions`` from .values() rows (see fast_serializers)
+    and renders them with FastJSONRenderer, unless FAST_READ_SERIALIZATION
+    is off. The output is byte for byte what the serializer would produce.
+    """
+    fast_read_actions = ['list']
+
+    @property
+    def fast_read(self):
+        return self.action in self.fast_read_actions and fast_serialization_enabled()
+
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        if self.fast_read:
+            # The fast rows hold only strings, integers and None, which
+            # FastJSONRenderer encodes exactly as JSONRenderer does.
+            renderers = [
+                FastJSONRenderer() if type(renderer) is TimedJSONRenderer else renderer for renderer in renderers
+            ]
+        return renderers
+
+    def fast_list(self, fields, serialize):
+        queryset = self.filter_queryset(self.get_queryset()).values(*fields)
+        page = self.paginate_queryset(queryset)
+        rows = list(queryset) if page is None else page
+        with timed_serialization():
+            data = serialize(rows, queryset.db)
+        if page is None:
+            return Response(data)
+        return self.get_paginated_response(data)
+
+def enrollments_prefetch():
+    # Ordering by client first lets enrollment_client_idx return the
+    # prefetched rows in order; each client's enrollments keep Meta.ordering.
+    return Prefetch('enrollments', queryset=Enrollment.objects.order_by('client_id', 'enrolled_at', 'id'))
+
+def search_params(query_params, default_limit, max_limit):
+    """Return (query, limit, offset) from ?q=&limit=&offset=."""
+    try:
+        limit = min(int(query_params.get('limit', default_limit)), max_limit)
+        offset = int(query_params.get('offset', 0))
+    except ValueError:
+        raise serializers.ValidationError({"detail": "limit and offset must be integers"})
+    if limit < 1 or offset < 0:
+        raise serializers.ValidationError({"detail": "limit must be positive and offset non-negative"})
+    return query_params.get('q', ''), limit, offset
+
+class ClientViewSet(FastReadMixin, BulkCreateMixin, viewsets.ModelViewSet):
     queryset = Client.objects.all()
+    filterset_class = ClientFilterSet
+
+    # Actions rendered with ClientSerializer, which nests every enrollment.
+    # Program names and short codes come from the program catalog.
+    read_actions = ['list', 'retrieve', 'profile', 'search', 'export']
+    fast_read_actions = ['list', 'export']
+    search_limit = 20
+    max_search_limit = 100
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in self.read_actions and not self.fast_read:
+            queryset = queryset.prefetch_related(enrollments_prefetch())
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        if not self.fast_read:
+            return super().list(request, *args, **kwargs)
+        return self.fast_list(CLIENT_FIELDS, lambda rows, using: serialize_clients(rows, using=using))
 
     def get_serializer_class(self):
-        if self.action in ['create', 'update', 'partial_update']:
+        if self.action in ['create', 'bulk', 'update', 'partial_update']:
             return ClientCreateSerializer
         return ClientSerializer
 
     @action(detail=False, methods=['get'])
     def search(self, request):
-        query = request.query_params.get('q', '')
-        if not query:
+        if not request.query_params.get('q'):
             return Response({"results": []})
+        query, limit, offset = search_params(request.query_params, self.search_limit, self.max_search_limit)
+
+        # The backend returns ids in relevance order; load them in one batch.
+        ids = get_search_backend(self.get_queryset().db).search(query, limit=limit, offset=offset)
+        clients = self.get_queryset().in_bulk(ids)
 
-        clients = Client.objects.filter(
-            Q(first_name__icontains=query) |
-            Q(last_name__icontains=query) |
-            Q(phone_number__icontains=query)
-        ).distinct()
+        serializer = self.get_serializer([clients[pk] for pk in ids if pk in clients], many=True)
+        with timed_serialization():
+            data = serializer.data
+        return Response({"results": data})
 
-        serializer = self.get_serializer(clients, many=True)
-        return Response({"results": serializer.data})
+    @action(detail=False, methods=['get'], renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def export(self, request):
+        """
+        Stream every client with its enrollments as CSV (?format=csv, the
+        default) or newline-delimited JSON (?format=ndjson), optionally
+        narrowed with the list filters (clients.filters). Rows are read and
+        serialized a chunk at a time, so memory use does not grow with the
+        size of the registry.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+
+        if self.fast_read:
+            chunks = fast_serialized_chunks(queryset)
+        else:
+            chunks = serialized_chunks(queryset, self.get_serializer_class(), self.get_serializer_context())
+        renderer = request.accepted_renderer
+        stream = stream_ndjson if renderer.format == 'ndjson' else stream_csv
+        response = StreamingHttpResponse(
+            stream(chunks),
+            content_type=f'{renderer.media_type}; charset=utf-8',
+        )
+        response['Content-Disposition'] = f'attachment; filename="clients.{renderer.format}"'
+        return response
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_clients(self, request):
+        """
+        Upload a CSV or NDJSON ``file`` in the format read by the
+        import_clients command. Valid rows are imported a chunk at a time;
+        duplicates are skipped and invalid rows reported by row number.
+        A file that cannot be parsed to the end gets a 400 with the report
+        of the rows before the failure, which have been imported.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise serializers.ValidationError({"file": "No file was submitted"})
+        file_format = request.data.get('file_format') or guess_format(upload.name)
+        if file_format not in ('csv', 'ndjson'):
+            raise serializers.ValidationError({"file_format": "Expected csv or ndjson"})
+
+        stream = io.TextIOWrapper(upload, encoding='utf-8-sig', newline='')
+        try:
+            report = ClientImporter().run(stream, file_format)
+        except FileParseError as exc:
+            return Response({"file": [str(exc)], **exc.report}, status=400)
+        return Response(report)
 
     @action(detail=True, methods=['get'])
     def profile(self, request, pk=None):
+        """
+        The client with its enrollments, with an ETag and Last-Modified so
+        that polling clients get a 304 while nothing has changed. See
+        clients.profile_cache.
+        """
+        validators = profile_validators(pk) if str(pk).isdigit() else None
+        if validators is None:
+            raise Http404
+        etag, last_modified = validators
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            data = get_cached_profile(pk, etag)
+            if data is None:
+                client = self.get_object()
+                with timed_serialization():
+                    data = self.get_serializer(client).data
+                cache_profile(pk, etag, data)
+            response = Response(data)
+        return patch_profile_headers(response, etag, last_modified)
+
+    @action(detail=True, methods=['get'])
+    def duplicates(self, request, pk=None):
+        """
+        Merge suggestions for one client: other clients sharing one of its
+        blocking keys that score at least ?min_score (default 0.7), best
+        first. See clients.dedup.
+        """
         client = self.get_object()
-        serializer = self.get_serializer(client)
-        return Response(serializer.data)
+        try:
+            min_score = float(request.query_params.get('min_score', DEFAULT_MIN_SCORE))
+        except ValueError:
+            min_score = None
+        if min_score is None or not 0 <= min_score <= 1:
+            raise serializers.ValidationError({"min_score": "Expected a number between 0 and 1"})
+        return Response({"results": duplicates_of(client, min_score=min_score, using=self.get_queryset().db)})
 
-class EnrollmentViewSet(viewsets.ModelViewSet):
+class EnrollmentViewSet(FastReadMixin, BulkCreateMixin, viewsets.ModelViewSet):
     queryset = Enrollment.objects.all()
+    filterset_class = EnrollmentFilterSet
+
+    def list(self, request, *args, **kwargs):
+        if not self.fast_read:
+            return super().list(request, *args, **kwargs)
+        return self.fast_list(ENROLLMENT_FIELDS, lambda rows, using: serialize_enrollments(rows))
 
     def get_serializer_class(self):
-        if self.action in ['create']:
+        if self.action in ['create', 'bulk']:
             return EnrollmentCreateSerializer
         return EnrollmentSerializer
 
@@ -48,6 +236,26 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
         try:
             serializer.is_valid(raise_exception=True)
             self.perform_create(serializer)
-            return Response(serializer.data, status=201)
+            with timed_serialization():
+                data = serializer.data
+            return Response(data, status=201)
         except serializers.ValidationError as e:
-            return Response({"detail": e.detail}, status=400)
\ No newline at end of file
+            return Response({"detail": e.detail}, status=400)
+
+class SyncView(APIView):
+    """
+    GET /api/sync/?since=<cursor>&limit=<rows per stream>: the clients,
+    enrollments and programs created, updated or deleted since the cursor
+    of the previous response. See clients.sync.
+    """
+    # The feed holds only strings, integers and None; see FastReadMixin.
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', sync_setting('PAGE_SIZE')))
+        except ValueError:
+            limit = 0
+        if not 0 < limit <= sync_setting('MAX_PAGE_SIZE'):
+            raise serializers.ValidationError({"limit": f"Expected 1 to {sync_setting('MAX_PAGE_SIZE')}"})
+        return Response(change_feed(request.query_params.get('since'), limit, using=Client.objects.db))
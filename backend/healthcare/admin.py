@@ -0,0 +1,8 @@
+from django.contrib import admin
+from .models import QueuedEmail
+
+@admin.register(QueuedEmail)
+class QueuedEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'recipients', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    readonly_fields = ('claim_token', 'created_at', 'sent_at')
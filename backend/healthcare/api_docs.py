@@ -0,0 +1,134 @@
+"""
+API documentation: the OpenAPI (Swagger 2.0) schema, and the Swagger UI
+and ReDoc pages that display it.
+
+drf_yasg introspects every view and serializer to build the schema, so it
+is built once rather than per request: by ``manage.py build_schema``,
+which writes openapi-<version>.json and .yaml to API_DOCS['SCHEMA_DIR'] at
+deploy time, or else on the first request for it in each process. The
+documents are served from memory with a strong ETag, gzip compressed
+ahead of time for clients that accept it. The UI pages are rendered
+without the schema and load it from /swagger.json.
+
+drf_yasg is only imported inside the functions below, so workers that run
+with the documentation off never load it.
+"""
+import gzip
+import hashlib
+import re
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.views.decorators.http import require_safe
+
+SCHEMA_VERSION = 'v1'
+MEDIA_TYPES = {'json': 'application/json', 'yaml': 'application/yaml'}
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+
+def schema_info():
+    from drf_yasg import openapi
+
+    return openapi.Info(
+        title="Healthcare API",
+        default_version=SCHEMA_VERSION,
+        description="API for managing clients, programs, and enrollments. Authenticate using email and password.",
+        terms_of_service="https://www.example.com/terms/",
+        contact=openapi.Contact(email="contact@example.com"),
+        license=openapi.License(name="MIT License"),
+    )
+
+
+def generate_schema():
+    """Introspect the API into a drf_yasg Swagger object, as a public schema."""
+    from drf_yasg.app_settings import swagger_settings
+
+    generator = swagger_settings.DEFAULT_GENERATOR_CLASS(schema_info())
+    # Without a request the schema has no host, and the UI uses its own.
+    return generator.get_schema(request=None, public=True)
+
+
+def encode_schema(schema, file_format):
+    from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+
+    codec_class = OpenAPICodecJson if file_format == 'json' else OpenAPICodecYaml
+    return codec_class(validators=[]).encode(schema)
+
+
+def schema_path(file_format, directory=None):
+    return Path(directory or settings.API_DOCS['SCHEMA_DIR']) / f'openapi-{SCHEMA_VERSION}.{file_format}'
+
+
+class SchemaDocument:
+    """An encoded schema, its gzip copy and the ETag of each."""
+
+    def __init__(self, content, media_type):
+        self.content = content
+        self.media_type = media_type
+        # mtime=0 keeps the compressed bytes the same from one process to the next.
+        self.gzipped = gzip.compress(content, mtime=0)
+        digest = hashlib.sha256(content).hexdigest()[:32]
+        # A strong ETag stands for the exact bytes sent, so each encoding gets its own.
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gzip"'
+
+    def response(self, request):
+        gzipped = bool(ACCEPTS_GZIP.search(request.META.get('HTTP_ACCEPT_ENCODING', '')))
+        etag = self.gzip_etag if gzipped else self.etag
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(
+                self.gzipped if gzipped else self.content, content_type=f'{self.media_type}; charset=utf-8',
+            )
+            if gzipped:
+                response['Content-Encoding'] = 'gzip'
+        response['ETag'] = etag
+        # Revalidated on every use; while the schema is unchanged that is a 304.
+        patch_cache_control(response, public=True, no_cache=True)
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
+
+
+@lru_cache(maxsize=None)
+def generated_schema():
+    return generate_schema()
+
+
+@lru_cache(maxsize=None)
+def schema_document(file_format):
+    """The document built by build_schema if there is one, else generated here (once)."""
+    path = schema_path(file_format)
+    if path.exists():
+        content = path.read_bytes()
+    else:
+        content = encode_schema(generated_schema(), file_format)
+    return SchemaDocument(content, MEDIA_TYPES[file_format])
+
+
+def clear_schema_cache():
+    generated_schema.cache_clear()
+    schema_document.cache_clear()
+
+
+@require_safe
+def schema_view(request, file_format='json'):
+    return schema_document(file_format).response(request)
+
+
+@require_safe
+def docs_ui_view(request, ui):
+    """The Swagger UI or ReDoc page; the page fetches the schema from schema_view."""
+    # drf_yasg's own pages took ?format=openapi for the schema; keep old links working.
+    if request.GET.get('format') == 'openapi':
+        return schema_view(request)
+    from drf_yasg.renderers import ReDocRenderer, SwaggerUIRenderer
+
+    renderer = SwaggerUIRenderer() if ui == 'swagger' else ReDocRenderer()
+    context = {'request': request}
+    renderer.set_context(context)
+    context.update(title=schema_info().title, version=SCHEMA_VERSION)
+    return HttpResponse(render_to_string(renderer.template, context, request))
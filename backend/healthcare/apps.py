@@ -1,8 +1,16 @@
 from django.apps import AppConfig
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 
 class HealthcareConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'healthcare'
 
     def ready(self):
-        pass
\ No newline at end of file
+        from .authentication import invalidate_cached_user
+        from .instrumentation import install_query_timer
+        user_model = get_user_model()
+        post_save.connect(invalidate_cached_user, sender=user_model, dispatch_uid='healthcare.user_cache.save')
+        post_delete.connect(invalidate_cached_user, sender=user_model, dispatch_uid='healthcare.user_cache.delete')
+        connection_created.connect(install_query_timer, dispatch_uid='healthcare.instrumentation.query_timer')
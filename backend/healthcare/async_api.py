@@ -0,0 +1,67 @@
+"""
+Plain Django async views for the busiest read endpoints.
+
+DRF views are synchronous, so behind an ASGI server every API request holds
+a thread for its whole duration. The views decorated here run on the event
+loop instead: they authenticate with the same JWTs and in-process caches as
+the API (healthcare.authentication.aauthenticate), await the ORM, hand any
+other blocking call to healthcare.executor.blocking_executor, and render
+the same JSON as their DRF counterparts. Like the API, they are open to
+staff users only.
+"""
+import functools
+
+from django.http import Http404, HttpResponse
+from rest_framework import exceptions
+from rest_framework.request import Request
+
+from .authentication import aauthenticate
+from .executor import ExecutorBusy
+from .renderers import TimedJSONRenderer
+
+
+class ServiceUnavailable(exceptions.APIException):
+    status_code = 503
+    default_detail = 'Too many requests in progress, try again shortly.'
+    default_code = 'service_unavailable'
+
+
+def json_response(data, status=200):
+    return HttpResponse(TimedJSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def error_response(exc):
+    detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    response = json_response(detail, status=exc.status_code)
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        response.status_code = 401
+        response['WWW-Authenticate'] = 'Bearer realm="api"'
+    return response
+
+
+def async_api_view(view):
+    """
+    Wrap ``async def view(request, *args, **kwargs)`` returning data to
+    render as JSON (or an HttpResponse, returned as is). The view receives
+    a DRF Request for query_params; GET and HEAD only.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return error_response(exceptions.MethodNotAllowed(request.method))
+        try:
+            authenticated = await aauthenticate(request)
+            if authenticated is None:
+                raise exceptions.NotAuthenticated()
+            request.user, request.auth = authenticated
+            if not request.user.is_staff:
+                raise exceptions.PermissionDenied()
+            result = await view(Request(request), *args, **kwargs)
+        except Http404:
+            return error_response(exceptions.NotFound())
+        except ExecutorBusy:
+            return error_response(ServiceUnavailable())
+        except exceptions.APIException as exc:
+            return error_response(exc)
+        return result if isinstance(result, HttpResponse) else json_response(result)
+    return wrapper
@@ -0,0 +1,198 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import AccessToken, BlacklistMixin
+
+AUTH_CACHE_DEFAULTS = {
+    'USER_TTL': 60,
+    'USER_MAX_SIZE': 1024,
+    'BLACKLIST_REFRESH_INTERVAL': 30,
+}
+
+
+def auth_cache_setting(name):
+    return getattr(settings, 'JWT_AUTH_CACHE', {}).get(name, AUTH_CACHE_DEFAULTS[name])
+
+
+class RevocableAccessToken(BlacklistMixin, AccessToken):
+    """Access token that can be added to the blacklist, e.g. on logout."""
+
+
+class UserCache:
+    """Thread-safe LRU of user objects whose entries expire after a TTL."""
+
+    def __init__(self, max_size=None, ttl=None):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def max_size(self):
+        return self._max_size or auth_cache_setting('USER_MAX_SIZE')
+
+    @property
+    def ttl(self):
+        return self._ttl if self._ttl is not None else auth_cache_setting('USER_TTL')
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def set(self, key, user):
+        with self._lock:
+            self._entries[key] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class BlacklistCache:
+    """
+    In-memory mirror of the blacklisted token ids. Rather than querying the
+    blacklist per request, it reloads the ids of unexpired tokens at most
+    once per BLACKLIST_REFRESH_INTERVAL, and forgets ids whose token has
+    expired. Tokens revoked by another process are therefore rejected
+    within one refresh interval; tokens revoked in this process are
+    rejected immediately.
+
+    The whole unexpired set is read each time, not just rows with a higher
+    id than the last one seen: ids are allocated before commit, so a row
+    can become visible after rows with higher ids. The set is bounded by
+    the refresh token lifetime.
+    """
+
+    def __init__(self):
+        self._expiry = {}
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+
+    def __contains__(self, jti):
+        self.refresh_if_due()
+        return self.has(jti)
+
+    def has(self, jti):
+        """Membership as of the last refresh, without refreshing."""
+        return jti in self._expiry
+
+    def add(self, jti, expires_at):
+        with self._lock:
+            self._expiry[jti] = expires_at
+
+    def refresh_due(self):
+        interval = auth_cache_setting('BLACKLIST_REFRESH_INTERVAL')
+        return self._refreshed_at is None or time.monotonic() - self._refreshed_at >= interval
+
+    def refresh_if_due(self):
+        if self.refresh_due():
+            self.refresh()
+
+    def refresh(self):
+        now = timezone.now()
+        rows = (
+            BlacklistedToken.objects.filter(token__expires_at__gt=now)
+            .order_by()
+            .values_list('token__jti', 'token__expires_at')
+        )
+        loaded = dict(rows)
+        with self._lock:
+            # Keep ids added here since the query; their rows may not be committed yet.
+            self._expiry = {
+                **{jti: expires for jti, expires in self._expiry.items() if expires > now},
+                **loaded,
+            }
+            self._refreshed_at = time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            self._expiry = {}
+            self._refreshed_at = None
+
+    def __len__(self):
+        return len(self._expiry)
+
+
+user_cache = UserCache()
+blacklist = BlacklistCache()
+
+
+def invalidate_cached_user(sender, instance, **kwargs):
+    """post_save/post_delete handler for the user model."""
+    user_cache.invalidate(getattr(instance, api_settings.USER_ID_FIELD))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that serves users from an in-process cache and
+    rejects blacklisted tokens, so an authenticated request normally costs
+    no database queries at all.
+    """
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if validated_token.get(api_settings.JTI_CLAIM) in blacklist:
+            raise InvalidToken(_('Token is blacklisted'))
+        return validated_token
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        user = user_cache.get(user_id)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user)
+        # Hand out a copy so request-level changes never leak between requests.
+        return copy.copy(user)
+
+
+async def aauthenticate(request):
+    """
+    CachedJWTAuthentication.authenticate() for async views: returns
+    (user, token) or None, and raises AuthenticationFailed/InvalidToken.
+    With the user cached and the blacklist fresh this runs inline without
+    touching the database; otherwise the refresh or user lookup runs
+    through sync_to_async.
+    """
+    authenticator = CachedJWTAuthentication()
+    header = authenticator.get_header(request)
+    raw_token = header and authenticator.get_raw_token(header)
+    if raw_token is None:
+        return None
+
+    if blacklist.refresh_due():
+        await sync_to_async(blacklist.refresh)()
+    validated_token = JWTAuthentication.get_validated_token(authenticator, raw_token)
+    if blacklist.has(validated_token.get(api_settings.JTI_CLAIM)):
+        raise InvalidToken(_('Token is blacklisted'))
+    user = user_cache.get(validated_token.get(api_settings.USER_ID_CLAIM))
+    if user is None:
+        return await sync_to_async(authenticator.get_user)(validated_token), validated_token
+    return copy.copy(user), validated_token
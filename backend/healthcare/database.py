@@ -0,0 +1,122 @@
+"""
+Builds ``DATABASES['default']`` from environment variables.
+
+DB_ENGINE selects ``sqlite`` (the default, for small sites and local
+development) or ``postgresql`` (production). Shared variables:
+
+    DB_NAME                 database name, or file path for SQLite
+    DB_TEST_NAME            SQLite test database file (default test_db.sqlite3)
+
+PostgreSQL:
+
+    DB_USER, DB_PASSWORD, DB_HOST, DB_PORT
+    DB_CONN_MAX_AGE         seconds to keep a connection open (default 60)
+    DB_CONN_HEALTH_CHECKS   ping persistent connections before reuse (default on)
+    DB_CONNECT_TIMEOUT      seconds (default 10)
+    DB_POOL                 use psycopg's connection pool instead of
+                            persistent connections (default off)
+    DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT
+    DB_REPLICA_HOSTS        comma-separated read replicas (host or host:port),
+                            added as aliases replica1, replica2, ...
+    DB_REPLICA_LAG_TOLERANCE
+                            seconds a client reads from the primary after
+                            a write (default 5); see healthcare/routers.py
+
+SQLite:
+
+    SQLITE_BUSY_TIMEOUT     milliseconds a writer waits for the lock (default 5000)
+"""
+import os
+
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+
+
+def env_bool(environ, name, default=False):
+    value = environ.get(name)
+    return default if value is None or value == '' else value.lower() in TRUE_VALUES
+
+
+def env_int(environ, name, default):
+    value = environ.get(name)
+    return default if value is None or value == '' else int(value)
+
+
+def database_config(base_dir, environ=os.environ):
+    engine = environ.get('DB_ENGINE', 'sqlite').lower()
+    if engine in ('postgres', 'postgresql'):
+        return postgresql_config(environ)
+    if engine in ('sqlite', 'sqlite3'):
+        return sqlite_config(base_dir, environ)
+    raise ValueError(f"Unsupported DB_ENGINE {engine!r}; use 'sqlite' or 'postgresql'")
+
+
+def postgresql_config(environ):
+    config = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': environ.get('DB_NAME', 'healthcare'),
+        'USER': environ.get('DB_USER', ''),
+        'PASSWORD': environ.get('DB_PASSWORD', ''),
+        'HOST': environ.get('DB_HOST', ''),
+        'PORT': environ.get('DB_PORT', ''),
+        'CONN_MAX_AGE': env_int(environ, 'DB_CONN_MAX_AGE', 60),
+        'CONN_HEALTH_CHECKS': env_bool(environ, 'DB_CONN_HEALTH_CHECKS', True),
+        'OPTIONS': {
+            'connect_timeout': env_int(environ, 'DB_CONNECT_TIMEOUT', 10),
+        },
+    }
+    if env_bool(environ, 'DB_POOL'):
+        # The pool keeps connections open itself; Django refuses to combine
+        # it with persistent connections.
+        config['CONN_MAX_AGE'] = 0
+        config['OPTIONS']['pool'] = {
+            'min_size': env_int(environ, 'DB_POOL_MIN_SIZE', 2),
+            'max_size': env_int(environ, 'DB_POOL_MAX_SIZE', 10),
+            'timeout': env_int(environ, 'DB_POOL_TIMEOUT', 30),
+        }
+    return config
+
+
+def replica_configs(primary, environ=os.environ):
+    """Copies of the primary configuration for each host in DB_REPLICA_HOSTS."""
+    hosts = [host.strip() for host in environ.get('DB_REPLICA_HOSTS', '').split(',') if host.strip()]
+    replicas = {}
+    for number, host in enumerate(hosts, start=1):
+        host, _, port = host.partition(':')
+        replicas[f'replica{number}'] = {
+            **primary,
+            'HOST': host,
+            'PORT': port or primary.get('PORT', ''),
+            'OPTIONS': dict(primary.get('OPTIONS', {})),
+            # Tests run against the primary's test database.
+            'TEST': {'MIRROR': 'default'},
+        }
+    return replicas
+
+
+def sqlite_config(base_dir, environ):
+    """
+    SQLite tuned for a web server with several writers. WAL lets readers
+    run alongside the writer, synchronous=NORMAL is durable across
+    application crashes with WAL, and IMMEDIATE transactions take the write
+    lock up front so that a waiting writer gets busy_timeout to acquire it
+    instead of failing with "database is locked" when upgrading a read.
+    """
+    busy_timeout = env_int(environ, 'SQLITE_BUSY_TIMEOUT', 5000)
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': environ.get('DB_NAME') or base_dir / 'db.sqlite3',
+        'OPTIONS': {
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                f'PRAGMA busy_timeout={busy_timeout};'
+            ),
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': busy_timeout / 1000,
+        },
+        # A file rather than the default in-memory database, so tests see
+        # the same locking behaviour as the server.
+        'TEST': {
+            'NAME': environ.get('DB_TEST_NAME') or base_dir / 'test_db.sqlite3',
+        },
+    }
@@ -0,0 +1,84 @@
+"""
+Bounded thread pool for blocking calls made from async views.
+
+Django's async ORM runs queries through sync_to_async; anything else that
+blocks (raw SQL such as the search backends, SMTP, file I/O) must not run
+on the event loop either. asyncio's default executor has no limit on the
+work queued to it, so a burst of requests would pile up behind it and hold
+a database connection per thread. Here both the threads and the queue are
+capped by ASYNC_EXECUTOR; once MAX_PENDING calls are in flight, further
+calls fail with ExecutorBusy, which async views answer with 503.
+"""
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+EXECUTOR_DEFAULTS = {
+    'MAX_WORKERS': 8,
+    'MAX_PENDING': 64,
+}
+
+
+def executor_setting(name):
+    return getattr(settings, 'ASYNC_EXECUTOR', {}).get(name, EXECUTOR_DEFAULTS[name])
+
+
+class ExecutorBusy(Exception):
+    """Raised when the executor already has MAX_PENDING calls queued or running."""
+
+
+class BoundedExecutor:
+    def __init__(self, max_workers=None, max_pending=None):
+        self._max_workers = max_workers
+        self._max_pending = max_pending
+        self._pool = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._pool is None:
+                max_workers = self._max_workers or executor_setting('MAX_WORKERS')
+                max_pending = self._max_pending or executor_setting('MAX_PENDING')
+                self._slots = threading.BoundedSemaphore(max(max_pending, max_workers))
+                self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix='async-blocking')
+
+    def submit(self, func, *args, **kwargs):
+        """Schedule func(*args, **kwargs) in the caller's context; returns a concurrent Future."""
+        if self._pool is None:
+            self._start()
+        if not self._slots.acquire(blocking=False):
+            raise ExecutorBusy
+        try:
+            future = self._pool.submit(contextvars.copy_context().run, _call, func, args, kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    async def run(self, func, *args, **kwargs):
+        return await asyncio.wrap_future(self.submit(func, *args, **kwargs))
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait)
+                self._pool = self._slots = None
+
+
+def _call(func, args, kwargs):
+    # Pool threads keep their database connections between calls; expire
+    # them the way Django does at the edges of each request.
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+blocking_executor = BoundedExecutor()
@@ -0,0 +1,142 @@
+"""
+Declarative query parameter filters for list endpoints.
+
+A FilterSet subclass declares one Filter per query parameter; a view
+opts in with ``filterset_class`` and QueryFilterBackend (the default
+filter backend) applies the parameters present in the request:
+
+    class ClientFilterSet(FilterSet):
+        area_of_residence = Filter('area_of_residence')
+        age_min = Filter('age__gte', parse=parse_integer, schema_type='integer')
+
+Values are parsed before anything is queried; a value that does not parse
+is a 400 naming the parameter. Lookups across a one-to-many relation (a
+client's enrollments, say) are grouped into a single ``pk IN (subquery)``
+condition, so they must hold for the same related row and never repeat
+rows of the list, which a join would.
+"""
+from collections import defaultdict
+from datetime import datetime, time
+
+from django.core.exceptions import FieldDoesNotExist
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import serializers
+from rest_framework.filters import BaseFilterBackend
+
+# The range of the databases' 64-bit integer columns; a value beyond it
+# cannot be bound as a query parameter.
+MIN_INTEGER, MAX_INTEGER = -2 ** 63, 2 ** 63 - 1
+
+
+def parse_integer(value):
+    """A whole number that fits a 64-bit integer column."""
+    parsed = int(value)
+    if not MIN_INTEGER <= parsed <= MAX_INTEGER:
+        raise ValueError(value)
+    return parsed
+
+
+def parse_timestamp(value):
+    """An ISO 8601 date (midnight in the current time zone) or datetime."""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        parsed = datetime.combine(day, time())
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Filter:
+    """
+    One query parameter, parsed with ``parse`` and applied as
+    ``lookup=value``. ``schema_type`` is its OpenAPI type.
+    """
+
+    def __init__(self, lookup, parse=str, error='Invalid value', help_text='', schema_type='string'):
+        self.lookup = lookup
+        self.parse = parse
+        self.error = error
+        self.help_text = help_text
+        self.schema_type = schema_type
+
+    def clean(self, value):
+        try:
+            return self.parse(value)
+        except (TypeError, ValueError):
+            raise serializers.ValidationError(self.error)
+
+
+class FilterSet:
+    """The Filter attributes of a subclass, by query parameter name, are in ``filters``."""
+    filters = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.filters = {
+            name: value
+            for base in reversed(cls.__mro__)
+            for name, value in vars(base).items()
+            if isinstance(value, Filter)
+        }
+
+    def __init__(self, query_params):
+        self.values, errors = {}, {}
+        for name, declared in self.filters.items():
+            value = query_params.get(name)
+            if value in (None, ''):
+                continue
+            try:
+                self.values[name] = declared.clean(value)
+            except serializers.ValidationError as exc:
+                errors[name] = exc.detail
+        if errors:
+            raise serializers.ValidationError(errors)
+
+    def filter(self, queryset):
+        direct, related = {}, defaultdict(dict)
+        for name, value in self.values.items():
+            lookup = self.filters[name].lookup
+            relation, _, rest = lookup.partition('__')
+            try:
+                field = queryset.model._meta.get_field(relation)
+            except FieldDoesNotExist:
+                field = None
+            if field is not None and field.one_to_many:
+                related[field][rest] = value
+            else:
+                direct[lookup] = value
+        if direct:
+            queryset = queryset.filter(**direct)
+        for field, lookups in related.items():
+            rows = field.related_model._default_manager.using(queryset.db).filter(**lookups)
+            queryset = queryset.filter(pk__in=rows.values(field.field.attname))
+        return queryset
+
+
+class QueryFilterBackend(BaseFilterBackend):
+    """Applies the view's ``filterset_class``; views without one are not filtered."""
+
+    def filter_queryset(self, request, queryset, view):
+        filterset_class = getattr(view, 'filterset_class', None)
+        if filterset_class is None:
+            return queryset
+        return filterset_class(request.query_params).filter(queryset)
+
+    def get_schema_operation_parameters(self, view):
+        filterset_class = getattr(view, 'filterset_class', None)
+        if filterset_class is None:
+            return []
+        return [
+            {
+                'name': name,
+                'required': False,
+                'in': 'query',
+                'description': declared.help_text,
+                'schema': {'type': declared.schema_type},
+            }
+            for name, declared in filterset_class.filters.items()
+        ]
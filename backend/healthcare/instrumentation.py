@@ -0,0 +1,240 @@
+"""
+Per-request performance metrics.
+
+PerformanceMiddleware counts every request by view, method and status;
+methods other than the standard HTTP ones are counted as ``other`` so a
+client cannot add labels at will. A sample of requests
+(PERF_METRICS['SAMPLE_RATE']) is measured in detail: wall time, number and
+total time of database queries, serialization time and response size,
+each as a histogram per view. The unsampled path costs a counter
+increment, so the overhead stays well under 1% at the default rate; raise
+the rate to 1.0 while investigating.
+
+Serialization time is what the views and renderers report through
+timed_serialization(): the JSON renderers' encoding, and the serializer
+``.data`` and value-row formatting that the API's own views do. The
+serializers that DRF's generic actions (retrieve, update, ...) call count
+only through rendering.
+
+Queries are timed by a wrapper added to every database connection's
+execute_wrappers when it connects. It reports to the current request
+through a ContextVar, which sync_to_async carries into the threads that
+async views run their queries in. Any query slower than SLOW_QUERY_MS is
+logged to ``healthcare.slow_queries`` with its fingerprint, whether or not
+the request is sampled.
+
+GET /metrics returns the registry in the Prometheus text format, to
+requests bearing PERF_METRICS['TOKEN'] or, if no token is set, to staff
+users logged in to the admin.
+"""
+import hashlib
+import logging
+import random
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from .metrics import BYTES_BUCKETS, COUNT_BUCKETS, registry
+
+logger = logging.getLogger('healthcare.slow_queries')
+
+PERF_METRICS_DEFAULTS = {
+    'ENABLED': True,
+    'SAMPLE_RATE': 0.05,
+    'SLOW_QUERY_MS': 200,
+    'TOKEN': '',
+}
+
+requests_total = registry.counter(
+    'healthcare_requests_total', 'Requests handled, sampled or not.', ['view', 'method', 'status'],
+)
+request_seconds = registry.histogram(
+    'healthcare_request_duration_seconds', 'Wall time of sampled requests.', ['view'],
+)
+db_queries = registry.histogram(
+    'healthcare_request_db_queries', 'Database queries per sampled request.', ['view'], buckets=COUNT_BUCKETS,
+)
+db_seconds = registry.histogram(
+    'healthcare_request_db_seconds', 'Time spent in database queries per sampled request.', ['view'],
+)
+serializer_seconds = registry.histogram(
+    'healthcare_request_serializer_seconds', 'Time spent serializing and rendering data per sampled request.', ['view'],
+)
+response_bytes = registry.histogram(
+    'healthcare_response_size_bytes', 'Body size of sampled, non-streaming responses.', ['view'],
+    buckets=BYTES_BUCKETS,
+)
+slow_queries = registry.counter(
+    'healthcare_slow_queries_total', 'Queries slower than SLOW_QUERY_MS.', ['view'],
+)
+
+_current = ContextVar('request_metrics', default=None)
+
+IN_LIST = re.compile(r'\bIN \((?:%s, )*%s\)', re.IGNORECASE)
+VALUES_LIST = re.compile(r'VALUES (\((?:%s, )*%s\))(?:, \1)+', re.IGNORECASE)
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+WHITESPACE = re.compile(r'\s+')
+HTTP_METHODS = frozenset({'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS', 'TRACE', 'CONNECT'})
+
+
+def perf_setting(name):
+    return getattr(settings, 'PERF_METRICS', {}).get(name, PERF_METRICS_DEFAULTS[name])
+
+
+def sql_fingerprint(sql):
+    """
+    Reduce a query to its shape: literals become ``?`` and IN/VALUES lists
+    collapse, so the same query with different parameters or batch sizes
+    shares one fingerprint.
+    """
+    sql = WHITESPACE.sub(' ', sql).strip()
+    sql = IN_LIST.sub('IN (...)', sql)
+    sql = VALUES_LIST.sub(r'VALUES \1, ...', sql)
+    return LITERALS.sub('?', sql)
+
+
+def method_label(request):
+    return request.method if request.method in HTTP_METHODS else 'other'
+
+
+def view_name(request):
+    """Name the view that handled a request, e.g. ``ClientViewSet.search``."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unresolved>'
+    view_class = getattr(match.func, 'cls', None)
+    if view_class is None:
+        return match._func_path
+    actions = getattr(match.func, 'actions', None) or {}
+    method = method_label(request).lower()
+    return f'{view_class.__name__}.{actions.get(method, method)}'
+
+
+class RequestMetrics:
+    __slots__ = ('request', 'sampled', 'queries', 'db_time', 'serializer_time', 'serializer_depth')
+
+    def __init__(self, request, sampled):
+        self.request = request
+        self.sampled = sampled
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+
+def time_query(execute, sql, params, many, context):
+    """execute_wrapper installed on every connection; see install_query_timer()."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.queries += 1
+        metrics.db_time += elapsed
+        if elapsed * 1000 >= perf_setting('SLOW_QUERY_MS'):
+            fingerprint = sql_fingerprint(sql)
+            view = view_name(metrics.request)
+            slow_queries.inc(view)
+            logger.warning(
+                'Slow query (%.1f ms) in %s [%s]: %s',
+                elapsed * 1000, view, hashlib.md5(fingerprint.encode()).hexdigest()[:12], fingerprint,
+            )
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """connection_created handler."""
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+@contextmanager
+def timed_serialization():
+    """
+    Count the time spent in the block as serialization time of the current
+    request, if it is sampled. Nested blocks (a view rendering data it
+    serialized in a timed block) are counted once, as the outermost one.
+    """
+    metrics = _current.get()
+    if metrics is None or not metrics.sampled:
+        yield
+        return
+    metrics.serializer_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_depth -= 1
+        if not metrics.serializer_depth:
+            metrics.serializer_time += time.perf_counter() - started
+
+
+class PerformanceMiddleware:
+    """Place first in MIDDLEWARE so the wall time covers the other middleware."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not perf_setting('ENABLED'):
+            return self.get_response(request)
+        metrics, token, started = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, metrics, started)
+        return response
+
+    async def __acall__(self, request):
+        if not perf_setting('ENABLED'):
+            return await self.get_response(request)
+        metrics, token, started = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, metrics, started)
+        return response
+
+    def start(self, request):
+        metrics = RequestMetrics(request, sampled=random.random() < perf_setting('SAMPLE_RATE'))
+        return metrics, _current.set(metrics), time.perf_counter()
+
+    def finish(self, request, response, metrics, started):
+        elapsed = time.perf_counter() - started
+        view = view_name(request)
+        requests_total.inc(view, method_label(request), str(response.status_code))
+        if not metrics.sampled:
+            return
+        request_seconds.observe(elapsed, view)
+        db_queries.observe(metrics.queries, view)
+        db_seconds.observe(metrics.db_time, view)
+        serializer_seconds.observe(metrics.serializer_time, view)
+        if not response.streaming:
+            response_bytes.observe(len(response.content), view)
+
+
+def metrics_view(request):
+    token = perf_setting('TOKEN')
+    if token:
+        authorized = constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    else:
+        authorized = request.user.is_authenticated and request.user.is_staff
+    if not authorized:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
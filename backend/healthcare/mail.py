@@ -0,0 +1,129 @@
+import logging
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .models import QueuedEmail
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_DEFAULTS = {
+    'BATCH_SIZE': 50,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_SECONDS': 30,
+    'MAX_BACKOFF_SECONDS': 3600,
+    'LEASE_SECONDS': 300,
+}
+
+
+def outbox_setting(name):
+    return getattr(settings, 'EMAIL_OUTBOX', {}).get(name, OUTBOX_DEFAULTS[name])
+
+
+def queue_mail(subject, message, recipient_list, from_email=None):
+    """Store a message for background delivery. Costs one INSERT."""
+    return QueuedEmail.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipient_list),
+    )
+
+
+def claim_batch(batch_size):
+    """
+    Lease up to ``batch_size`` due messages to this worker. The claim is a
+    conditional UPDATE, so concurrent workers never take the same row, and a
+    message whose lease runs out (the worker died mid-send) becomes due again.
+    """
+    now = timezone.now()
+    due = QueuedEmail.objects.filter(
+        status__in=[QueuedEmail.PENDING, QueuedEmail.SENDING], next_attempt_at__lte=now
+    )
+    ids = list(due.order_by('next_attempt_at', 'id').values_list('id', flat=True)[:batch_size])
+    if not ids:
+        return []
+    token = uuid.uuid4()
+    due.filter(id__in=ids).update(
+        status=QueuedEmail.SENDING,
+        claim_token=token,
+        next_attempt_at=now + timedelta(seconds=outbox_setting('LEASE_SECONDS')),
+    )
+    return list(QueuedEmail.objects.filter(claim_token=token, status=QueuedEmail.SENDING))
+
+
+def backoff(attempts):
+    delay = outbox_setting('BACKOFF_SECONDS') * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, outbox_setting('MAX_BACKOFF_SECONDS')))
+
+
+def deliver_queued_mail(batch_size=None, connection=None):
+    """
+    Send one batch of due messages over a single SMTP connection. Failed
+    messages are retried with exponential backoff until MAX_ATTEMPTS, then
+    marked failed. Returns counts of sent, retried and failed messages.
+    """
+    stats = Counter()
+    batch = claim_batch(batch_size or outbox_setting('BATCH_SIZE'))
+    if not batch:
+        return stats
+
+    connection = connection or get_connection()
+    try:
+        connection.open()
+    except Exception as exc:
+        logger.warning("Could not connect to mail server: %s", exc)
+        for queued in batch:
+            _record_failure(queued, exc, stats)
+        return stats
+
+    try:
+        for queued in batch:
+            message = EmailMessage(
+                queued.subject, queued.body, queued.from_email, queued.recipients, connection=connection
+            )
+            try:
+                message.send()
+            except Exception as exc:
+                logger.warning("Sending queued email %s failed: %s", queued.pk, exc)
+                _record_failure(queued, exc, stats)
+            else:
+                queued.status = QueuedEmail.SENT
+                queued.attempts += 1
+                queued.sent_at = timezone.now()
+                queued.claim_token = None
+                queued.save(update_fields=['status', 'attempts', 'sent_at', 'claim_token'])
+                stats['sent'] += 1
+    finally:
+        connection.close()
+    return stats
+
+
+def _record_failure(queued, exc, stats):
+    queued.attempts += 1
+    queued.last_error = str(exc)
+    queued.claim_token = None
+    if queued.attempts >= outbox_setting('MAX_ATTEMPTS'):
+        queued.status = QueuedEmail.FAILED
+        stats['failed'] += 1
+    else:
+        queued.status = QueuedEmail.PENDING
+        queued.next_attempt_at = timezone.now() + backoff(queued.attempts)
+        stats['retried'] += 1
+    queued.save(update_fields=['attempts', 'last_error', 'claim_token', 'status', 'next_attempt_at'])
+
+
+def outbox_metrics():
+    """Message counts per status and the age in seconds of the oldest unsent message."""
+    counts = dict(QueuedEmail.objects.order_by().values_list('status').annotate(Count('id')))
+    oldest = QueuedEmail.objects.filter(
+        status__in=[QueuedEmail.PENDING, QueuedEmail.SENDING]
+    ).aggregate(oldest=Min('created_at'))['oldest']
+    metrics = {status: counts.get(status, 0) for status, _ in QueuedEmail.STATUS_CHOICES}
+    metrics['oldest_unsent_seconds'] = (timezone.now() - oldest).total_seconds() if oldest else 0
+    return metrics
@@ -0,0 +1,202 @@
+import json
+import platform
+import random
+import subprocess
+import time
+from contextlib import ExitStack
+from itertools import cycle
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test import Client as TestClient, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from clients.models import Client, Enrollment
+from programs.models import Program
+from .load_test import percentile
+
+ENDPOINTS = ['client_list', 'client_search', 'client_profile', 'program_list', 'enrollment_create', 'login']
+USER_EMAIL = 'benchmark@example.com'
+USER_PASSWORD = 'benchmark-password'
+
+
+class Command(BaseCommand):
+    help = (
+        'Run the main API endpoints in process through the Django test client and report '
+        'requests/sec, p50/p99 latency and queries per request as JSON, for comparing '
+        'commits on the same data (see seed_synthetic). Everything runs in a transaction '
+        'that is rolled back, so the database is left as it was. Replicas are not used.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per endpoint (default 200).')
+        parser.add_argument('--warmup', type=int, default=20, help='Untimed requests per endpoint first (default 20).')
+        parser.add_argument('--endpoint', action='append', choices=ENDPOINTS, help='Endpoint to run; repeatable. Default: all.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the request parameters (default 0).')
+        parser.add_argument('--output', help='Also write the JSON report to this file.')
+        parser.add_argument('--compare', help='A previous JSON report to print the changes against.')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['warmup'] < 0:
+            raise CommandError('--requests must be positive and --warmup not negative')
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+        dataset = {
+            'clients': Client.objects.count(),
+            'programs': Program.objects.count(),
+            'enrollments': Enrollment.objects.count(),
+        }
+        if not dataset['clients']:
+            raise CommandError('The database has no clients; run seed_synthetic first.')
+
+        results = {}
+        with override_settings(DATABASE_REPLICAS=[]), transaction.atomic():
+            requests = Requests(options['requests'] + options['warmup'], random.Random(options['seed']))
+            for endpoint in options['endpoint'] or ENDPOINTS:
+                results[endpoint] = measure(
+                    getattr(requests, endpoint), options['requests'], options['warmup'],
+                )
+            transaction.set_rollback(True)
+
+        report = {
+            'commit': git_commit(),
+            'timestamp': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connections['default'].vendor,
+            'debug': settings.DEBUG,
+            'dataset': dataset,
+            'requests': options['requests'],
+            'warmup': options['warmup'],
+            'results': results,
+        }
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        if baseline:
+            self.stderr.write(compare(baseline, report))
+
+
+class Requests:
+    """
+    One method per endpoint that sends the next request and returns
+    (response, expected status). Parameters vary from request to request:
+    search terms and profiles are drawn from the data, and every enrollment
+    is a new one.
+    """
+
+    def __init__(self, count, rng):
+        user, _ = get_user_model().objects.update_or_create(
+            email=USER_EMAIL, defaults={'username': 'benchmark', 'is_staff': True, 'is_active': True},
+        )
+        user.set_password(USER_PASSWORD)
+        user.save()
+        self.client = TestClient(
+            HTTP_HOST=settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else 'localhost',
+            HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}',
+        )
+        self.anonymous = TestClient(HTTP_HOST=self.client.defaults['HTTP_HOST'])
+
+        sample = list(
+            Client.objects.order_by('?').values_list('id', 'last_name', 'normalized_phone')[:max(count, 100)]
+        )
+        rng.shuffle(sample)
+        self.profiles = cycle([row[0] for row in sample])
+        self.searches = cycle([row[1] if i % 4 else row[2][:6] for i, row in enumerate(sample)])
+        self.enrollees = iter([row[0] for row in sample])
+        self.program = Program.objects.create(name='Benchmark program', short_code='BENCHMARK')
+
+    def client_list(self):
+        return self.client.get(reverse('client-list')), 200
+
+    def client_search(self):
+        return self.client.get(reverse('client-search'), {'q': next(self.searches)}), 200
+
+    def client_profile(self):
+        return self.client.get(reverse('client-profile', args=[next(self.profiles)])), 200
+
+    def program_list(self):
+        return self.client.get(reverse('program-list')), 200
+
+    def enrollment_create(self):
+        client_id = next(self.enrollees, None)
+        if client_id is None:
+            raise CommandError('Not enough clients for one new enrollment per request; seed more or pass fewer --requests.')
+        payload = {'client_id': client_id, 'program_id': self.program.pk}
+        return self.client.post(reverse('enrollment-list'), payload, content_type='application/json'), 201
+
+    def login(self):
+        payload = {'email': USER_EMAIL, 'password': USER_PASSWORD}
+        return self.anonymous.post(reverse('token_obtain_pair'), payload, content_type='application/json'), 200
+
+
+def measure(send, count, warmup):
+    queries = 0
+
+    def count_query(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    for _ in range(warmup):
+        send()
+    latencies, query_counts, errors = [], [], 0
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(count_query))
+        started = time.perf_counter()
+        for _ in range(count):
+            queries = 0
+            request_started = time.perf_counter()
+            response, expected = send()
+            latencies.append(time.perf_counter() - request_started)
+            query_counts.append(queries)
+            if response.status_code != expected:
+                errors += 1
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'requests': count,
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(count / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'queries_per_request': round(sum(query_counts) / count, 2),
+        'max_queries': max(query_counts),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, report):
+    """Changes from a baseline report, one line per endpoint in both."""
+    lines = [f"Against {baseline.get('commit') or 'baseline'}:"]
+    for endpoint, result in report['results'].items():
+        before = baseline.get('results', {}).get(endpoint)
+        if not before:
+            continue
+        changes = []
+        for key in ('requests_per_second', 'p50_ms', 'p99_ms'):
+            if before[key]:
+                changes.append(f'{key} {result[key]} ({(result[key] - before[key]) / before[key]:+.1%})')
+        changes.append(f"queries {before['queries_per_request']} -> {result['queries_per_request']}")
+        lines.append(f'  {endpoint:<18} ' + ', '.join(changes))
+    return '\n'.join(lines)
@@ -0,0 +1,40 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from healthcare.api_docs import MEDIA_TYPES, encode_schema, generate_schema, schema_path
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate the OpenAPI schema and write it as openapi-<version>.json and .yaml, '
+        'which the documentation URLs then serve instead of generating it in every '
+        'process. Run it on deploy, after the code is in place.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', help="Directory to write to (default API_DOCS['SCHEMA_DIR']).")
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Write nothing; fail if the files are missing or differ from the current API.',
+        )
+
+    def handle(self, *args, **options):
+        directory = Path(options['output_dir'] or settings.API_DOCS['SCHEMA_DIR'])
+        schema = generate_schema()
+        stale = []
+        for file_format in MEDIA_TYPES:
+            path = schema_path(file_format, directory)
+            content = encode_schema(schema, file_format)
+            if options['check']:
+                if not path.exists() or path.read_bytes() != content:
+                    stale.append(str(path))
+                continue
+            directory.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(content)
+            self.stdout.write(f'Wrote {path} ({len(content) / 1024:.1f} KB)')
+        if stale:
+            raise CommandError(f'Out of date, run build_schema: {", ".join(stale)}')
+        if options['check']:
+            self.stdout.write(self.style.SUCCESS('The schema files are up to date.'))
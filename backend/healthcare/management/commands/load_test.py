@@ -0,0 +1,206 @@
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from clients.models import Client
+
+ENDPOINTS = ['search', 'profile', 'programs']
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare requests/sec and latency of the sync API with the async endpoints under '
+        'many concurrent connections. Without --url the ASGI application is driven in '
+        'process; with --url, requests go over HTTP to a running server, e.g. one started '
+        'with "uvicorn healthcare.asgi:application". Opening 1000 connections needs a file '
+        'descriptor limit (ulimit -n) above that.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Base URL of a running ASGI server, e.g. http://127.0.0.1:8000.')
+        parser.add_argument('--connections', type=int, default=1000, help='Concurrent connections (default 1000).')
+        parser.add_argument('--requests', type=int, default=10000, help='Requests per endpoint and mode (default 10000).')
+        parser.add_argument('--endpoint', action='append', choices=ENDPOINTS, help='Endpoint to test; repeatable. Default: all.')
+        parser.add_argument('--username', help='Staff user to authenticate as. Default: the first active staff user.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.filter(is_active=True, is_staff=True).order_by('pk')
+        if options['username']:
+            users = users.filter(username=options['username'])
+        user = users.first()
+        if user is None:
+            raise CommandError('No active staff user to authenticate as; create one or pass --username.')
+        client = Client.objects.order_by('pk').first()
+        if client is None:
+            raise CommandError('The database has no clients; import or seed some first.')
+
+        token = str(RefreshToken.for_user(user).access_token)
+        if options['url']:
+            transport = HTTPTransport(options['url'], token)
+        else:
+            from healthcare.asgi import application
+            transport = ASGITransport(application, token)
+
+        paths = {
+            'search': (reverse('client-search'), reverse('async-client-search'), f'?q={client.last_name}'),
+            'profile': (
+                reverse('client-profile', args=[client.pk]), reverse('async-client-profile', args=[client.pk]), '',
+            ),
+            'programs': (reverse('program-list'), reverse('async-program-list'), ''),
+        }
+        results = []
+        for endpoint in options['endpoint'] or ENDPOINTS:
+            sync_path, async_path, query = paths[endpoint]
+            for mode, path in (('sync', sync_path), ('async', async_path)):
+                result = asyncio.run(run_load(transport, path + query, options['connections'], options['requests']))
+                results.append({'endpoint': endpoint, 'mode': mode, **result})
+                if not options['json']:
+                    self.stdout.write(format_result(results[-1]))
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+
+
+def format_result(result):
+    return (
+        f"{result['endpoint']:<9} {result['mode']:<5} requests={result['requests']} errors={result['errors']} "
+        f"req/s={result['requests_per_second']} p50={result['p50_ms']}ms p99={result['p99_ms']}ms"
+    )
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+async def run_load(transport, path, connections, total):
+    """Send ``total`` GETs for ``path`` over ``connections`` concurrent connections."""
+    latencies = []
+    errors = 0
+    remaining = total
+
+    async def worker():
+        nonlocal errors, remaining
+        connection = await transport.connect()
+        try:
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                try:
+                    status = await connection.get(path)
+                except (OSError, asyncio.IncompleteReadError):
+                    status = None
+                    connection = await transport.connect()
+                latencies.append(time.perf_counter() - started)
+                if status not in (200, 304):
+                    errors += 1
+        finally:
+            await connection.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(connections, total))))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+class ASGITransport:
+    """Calls the ASGI application directly; each 'connection' is a task."""
+
+    def __init__(self, application, token):
+        self.application = application
+        self.headers = [(b'host', b'localhost'), (b'authorization', f'Bearer {token}'.encode())]
+
+    async def connect(self):
+        return self
+
+    async def close(self):
+        pass
+
+    async def get(self, path):
+        path, _, query = path.partition('?')
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+            'root_path': '', 'headers': self.headers, 'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+        }
+        status = None
+        request_sent = False
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await asyncio.Event().wait()
+
+        async def send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+
+        await self.application(scope, receive, send)
+        return status
+
+
+class HTTPTransport:
+    """Minimal HTTP/1.1 client that keeps one connection per worker alive."""
+
+    def __init__(self, url, token):
+        parts = urlsplit(url)
+        if parts.scheme != 'http':
+            raise CommandError('Only http:// URLs are supported.')
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+        self.token = token
+
+    async def connect(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        return HTTPConnection(self, reader, writer)
+
+
+class HTTPConnection:
+    def __init__(self, transport, reader, writer):
+        self.transport = transport
+        self.reader = reader
+        self.writer = writer
+
+    async def close(self):
+        self.writer.close()
+
+    async def get(self, path):
+        transport = self.transport
+        self.writer.write((
+            f'GET {transport.prefix}{path} HTTP/1.1\r\nHost: {transport.host}:{transport.port}\r\n'
+            f'Authorization: Bearer {transport.token}\r\nConnection: keep-alive\r\n\r\n'
+        ).encode())
+        await self.writer.drain()
+
+        head = await self.reader.readuntil(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        status = int(lines[0].split()[1])
+        headers = dict(line.lower().split(': ', 1) for line in lines[1:] if ': ' in line)
+        if 'content-length' in headers:
+            await self.reader.readexactly(int(headers['content-length']))
+        elif headers.get('transfer-encoding') == 'chunked':
+            while True:
+                size = int((await self.reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        return status
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from healthcare.mail import deliver_queued_mail, outbox_metrics
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued emails from the outbox, retrying failures with backoff.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Messages sent per SMTP connection.')
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox instead of exiting when it is empty.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to wait between polls in --loop mode.')
+        parser.add_argument('--stats', action='store_true', help='Print outbox metrics and exit.')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            for name, value in outbox_metrics().items():
+                self.stdout.write(f'{name} {value}')
+            return
+
+        while True:
+            stats = deliver_queued_mail(batch_size=options['batch_size'])
+            if stats:
+                self.stdout.write(
+                    f"sent={stats['sent']} retried={stats['retried']} failed={stats['failed']}"
+                )
+                continue
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,224 @@
+import json
+from base64 import b64decode, b64encode
+from datetime import date, datetime
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .filters import MAX_INTEGER, MIN_INTEGER
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination keyed on every ordering column rather than DRF's
+    first-column-plus-offset scheme.
+
+    The ordering comes from the queryset (falling back to the model's
+    ``Meta.ordering``) with ``id`` appended as a tiebreaker, so positions are
+    unique and pages stay stable while rows are being inserted. Each page is
+    a single ``WHERE (a, b, id) > (...) ORDER BY a, b, id LIMIT n`` query that
+    a matching composite index can answer without skipping over earlier rows.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_query = self.get_page_query(queryset, request, view)
+        if page_query is None:
+            return None
+        return self.set_page(list(page_query))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() for async views, fetching the page with the async ORM."""
+        page_query = self.get_page_query(queryset, request, view)
+        if page_query is None:
+            return None
+        return self.set_page([obj async for obj in page_query])
+
+    def get_page_query(self, queryset, request, view):
+        """The query for the requested page plus one row, or None if pagination is off."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse, position = self.cursor if self.cursor else (False, None)
+
+        ordering = [_invert(field) for field in self.ordering] if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            position = self.clean_position(queryset.model, position)
+            queryset = queryset.filter(_keyset_filter(ordering, position))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        reverse, position = self.cursor if self.cursor else (False, None)
+        has_following = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_following
+        else:
+            self.has_next = has_following
+            self.has_previous = position is not None
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            ordering.append('id')
+        return ordering
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        position = self._get_position_from_instance(self.page[-1], self.ordering) if self.page else None
+        return self.encode_cursor((False, position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        position = self._get_position_from_instance(self.page[0], self.ordering)
+        return self.encode_cursor((True, position))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            cursor = json.loads(b64decode(encoded.encode('ascii')).decode('ascii'))
+            reverse, position = bool(cursor['r']), cursor['p']
+            if position is not None and (
+                not isinstance(position, list) or len(position) != len(self.ordering)
+            ):
+                raise ValueError
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        return reverse, position
+
+    def clean_position(self, model, position):
+        """
+        Convert the cursor's values with their ordering fields, so that a
+        tampered cursor is a 404 rather than an error building the query.
+        """
+        cleaned = []
+        try:
+            for field, value in zip(self.ordering, position):
+                # to_python() lets None through and turns lists into strings.
+                if not isinstance(value, (str, int, float)):
+                    raise ValidationError(value)
+                value = _ordering_field(model, field.lstrip('-')).to_python(value)
+                if isinstance(value, int) and not MIN_INTEGER <= value <= MAX_INTEGER:
+                    raise ValidationError(value)
+                cleaned.append(value)
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return cleaned
+
+    def encode_cursor(self, cursor):
+        reverse, position = cursor
+        payload = json.dumps({'r': int(reverse), 'p': position}, separators=(',', ':'))
+        encoded = b64encode(payload.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def _get_position_from_instance(self, instance, ordering):
+        if isinstance(instance, dict):
+            # A row from .values()
+            return [_to_cursor_value(instance[field.lstrip('-')]) for field in ordering]
+        return [_to_cursor_value(getattr(instance, field.lstrip('-'))) for field in ordering]
+
+    def get_html_context(self):
+        return {
+            'previous_url': self.get_previous_link(),
+            'next_url': self.get_next_link(),
+        }
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for admin changelists over large tables. An unfiltered
+    changelist is counted from the database's row estimate instead of a
+    COUNT(*) over the whole table, once that estimate exceeds
+    ``exact_count_limit``. Filtered changelists are narrowed down by indexes
+    and still counted exactly.
+    """
+    exact_count_limit = 10000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where and not query.distinct:
+            estimate = estimate_row_count(self.object_list.model, self.object_list.db)
+            if estimate is not None and estimate > self.exact_count_limit:
+                return estimate
+        return super().count
+
+
+def estimate_row_count(model, using='default'):
+    """
+    Approximate number of rows in a model's table without scanning it, or
+    None if the database offers no estimate. PostgreSQL's figure is as
+    fresh as the last (auto)vacuum or ANALYZE; SQLite's largest rowid
+    ignores deleted rows.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f"SELECT max(rowid) FROM {connection.ops.quote_name(table)}")
+        else:
+            return None
+        row = cursor.fetchone()
+    # reltuples is -1 until the table is first analyzed.
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+def _invert(field):
+    return field[1:] if field.startswith('-') else f'-{field}'
+
+
+def _ordering_field(model, path):
+    """The model field an ordering expression such as ``client__last_name`` refers to."""
+    *relations, name = path.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.pk if name == 'pk' else model._meta.get_field(name)
+
+
+def _to_cursor_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _keyset_filter(ordering, position):
+    """
+    Expand ``(a, b, c) > (x, y, z)`` into ``a >= x AND (a > x OR (a = x AND
+    b > y) OR ...)``. The redundant leading ``a >= x`` gives the planner an
+    index range to seek to instead of filtering from the start of the index.
+    """
+    names = [field.lstrip('-') for field in ordering]
+    lookups = ['lt' if field.startswith('-') else 'gt' for field in ordering]
+
+    expanded = Q()
+    for i, (name, lookup) in enumerate(zip(names, lookups)):
+        condition = Q(**{f'{name}__{lookup}': position[i]})
+        for prefix_name, prefix_value in zip(names[:i], position):
+            condition &= Q(**{prefix_name: prefix_value})
+        expanded |= condition
+    return Q(**{f'{names[0]}__{lookups[0]}e': position[0]}) & expanded
@@ -0,0 +1,100 @@
+import math
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Database alias that reads in the current request go to; None is the primary.
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def replica_aliases():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def lag_tolerance():
+    return getattr(settings, 'REPLICA_LAG_TOLERANCE', 5)
+
+
+class ReplicaRouter:
+    """
+    Sends the reads of safe-method requests to a read replica chosen by
+    ReplicaRoutingMiddleware; every write, and every read outside such a
+    request (management commands, background jobs), uses the primary.
+    Once a request writes, its later reads go to the primary as well.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        _read_alias.set(None)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Picks the database that a request reads from. GET, HEAD and OPTIONS
+    requests read from a random replica in DATABASE_REPLICAS, except for
+    REPLICA_LAG_TOLERANCE seconds after the same client made a write
+    request, so that clients read their own writes while replicas catch
+    up. That window is tracked with a cookie.
+    """
+    cookie_name = 'primary_until'
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _read_alias.set(self.read_alias(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+        return self.pin_to_primary(request, response)
+
+    async def __acall__(self, request):
+        token = _read_alias.set(self.read_alias(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+        return self.pin_to_primary(request, response)
+
+    def pin_to_primary(self, request, response):
+        tolerance = lag_tolerance()
+        if request.method not in SAFE_METHODS and replica_aliases() and tolerance > 0:
+            response.set_cookie(
+                self.cookie_name, f'{time.time() + tolerance:.3f}',
+                max_age=math.ceil(tolerance), httponly=True, samesite='Lax',
+            )
+        return response
+
+    def read_alias(self, request):
+        replicas = replica_aliases()
+        if not replicas or request.method not in SAFE_METHODS:
+            return None
+        try:
+            primary_until = float(request.COOKIES.get(self.cookie_name, 0))
+        except ValueError:
+            primary_until = 0
+        if primary_until > time.time():
+            return None
+        return random.choice(replicas)
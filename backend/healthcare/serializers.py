@@ -1,23 +1,31 @@
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import update_last_login
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     username_field = 'email'
 
     def validate(self, attrs):
+        # Authenticate exactly once and mint the tokens here rather than
+        # deferring to super().validate(), which would hash the password again.
         credentials = {
             'email': attrs.get('email'),
             'password': attrs.get('password'),
         }
         user = self.user_authentication(credentials)
-        if user is None:
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
             raise serializers.ValidationError('Invalid email or password')
 
-        data = super().validate(attrs)
-        return data
+        self.user = user
+        refresh = self.get_token(user)
+        if api_settings.UPDATE_LAST_LOGIN:
+            update_last_login(None, user)
+        return {
+            'refresh': str(refresh),
+            'access': str(refresh.access_token),
+        }
 
     def user_authentication(self, credentials):
-        from django.contrib.auth import authenticate
-        return authenticate(**credentials)
-    
-    
\ No newline at end of file
+        return authenticate(self.context.get('request'), **credentials)
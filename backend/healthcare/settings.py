@@ -4,9 +4,12 @@ Django settings for healthcare project.
 Generated by 'django-admin startproject' using Django 4.2.20.
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
+from .database import database_config, env_bool, replica_configs
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -30,14 +33,16 @@ INSTALLED_APPS = [
     'rest_framework',
     'rest_framework_simplejwt',
     'rest_framework_simplejwt.token_blacklist',
-    'drf_yasg',
+    'healthcare',
     'programs',
     'clients',
 ]
 
 MIDDLEWARE = [
+    'healthcare.instrumentation.PerformanceMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'healthcare.routers.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -67,12 +72,19 @@ TEMPLATES = [
 WSGI_APPLICATION = 'healthcare.wsgi.application'
 
 # Database
+# Configured from DB_* environment variables; see healthcare/database.py.
+# Without them this is a WAL-mode SQLite database in BASE_DIR.
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_config(BASE_DIR),
 }
+DATABASES.update(replica_configs(DATABASES['default']))
+
+# Safe-method requests read from these aliases; see healthcare/routers.py.
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['healthcare.routers.ReplicaRouter']
+# Seconds after a write during which the same client reads from the
+# primary. Should exceed the replicas' usual replication lag.
+REPLICA_LAG_TOLERANCE = float(os.environ.get('DB_REPLICA_LAG_TOLERANCE', 5))
 
 # Authentication
 AUTHENTICATION_BACKENDS = [
@@ -83,12 +95,22 @@ AUTHENTICATION_BACKENDS = [
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'healthcare.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAdminUser',
     ],
+    'DEFAULT_FILTER_BACKENDS': [
+        'healthcare.filters.QueryFilterBackend',
+    ],
+    # JSONRenderer, with its time counted in the request metrics.
+    'DEFAULT_RENDERER_CLASSES': [
+        'healthcare.renderers.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'healthcare.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
 }
 
 # JWT Settings
@@ -101,6 +123,99 @@ SIMPLE_JWT = {
     'TOKEN_BLACKLIST_ENABLED': True,
 }
 
+# In-process caches used by healthcare.authentication.CachedJWTAuthentication.
+# Changes made in another worker (deactivating a user, logging out) take
+# effect here within USER_TTL and BLACKLIST_REFRESH_INTERVAL seconds.
+JWT_AUTH_CACHE = {
+    'USER_TTL': 60,
+    'USER_MAX_SIZE': 1024,
+    'BLACKLIST_REFRESH_INTERVAL': 30,
+}
+
+# Caches
+# Every worker reads the program catalog version (programs/cache.py) from
+# the default cache, so it must be shared between processes. The default
+# file-based cache in BASE_DIR/cache is shared by the workers of one host;
+# point CACHE_BACKEND and CACHE_LOCATION at memcached or Redis when workers
+# run on several hosts. The file cache unpickles what it reads, so its
+# directory must only be writable by the user the app runs as; never put
+# it in a shared directory such as /tmp.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND') or 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_LOCATION') or str(BASE_DIR / 'cache'),
+    },
+}
+
+# Client search
+# Country calling code folded into the national trunk prefix ("0") when
+# normalizing phone numbers for search and matching.
+PHONE_COUNTRY_CODE = '254'
+# Dotted path to a clients.search backend. Defaults to the indexed backend
+# for the database vendor (FTS5 on SQLite, tsvector/trigram on PostgreSQL).
+CLIENT_SEARCH_BACKEND = None
+
+# Request metrics, served in the Prometheus format at /metrics; see
+# healthcare/instrumentation.py. Only SAMPLE_RATE of requests is measured in
+# detail; every query slower than SLOW_QUERY_MS is logged.
+PERF_METRICS = {
+    'ENABLED': True,
+    'SAMPLE_RATE': float(os.environ.get('PERF_SAMPLE_RATE', 0.05)),
+    'SLOW_QUERY_MS': int(os.environ.get('PERF_SLOW_QUERY_MS', 200)),
+    # Bearer token for the scraper; without one, staff sessions only.
+    'TOKEN': os.environ.get('METRICS_TOKEN', ''),
+}
+
+# Async views (/api/async/...)
+# Thread pool for blocking calls made from async views. Calls beyond
+# MAX_PENDING are refused with 503 rather than queued without limit.
+ASYNC_EXECUTOR = {
+    'MAX_WORKERS': 8,
+    'MAX_PENDING': 64,
+}
+
+# Client and enrollment lists and the client export are built from .values()
+# rows (clients/fast_serializers.py) instead of ModelSerializers. The output
+# is identical; turn this off to fall back to the serializers.
+# Those lists and the sync feed are encoded with orjson if it is installed
+# (`pip install orjson`). It is optional and left out of requirements.txt;
+# without it, healthcare.renderers.FastJSONRenderer uses DRF's encoder,
+# producing the same bytes more slowly.
+FAST_READ_SERIALIZATION = True
+
+# Client profiles
+# Cache alias for serialized GET /api/clients/<id>/profile/ payloads, or None
+# to serialize on every request that is not answered with a 304. Entries are
+# checked against the profile's ETag, so any backend in CACHES works.
+CLIENT_PROFILE_CACHE = None
+CLIENT_PROFILE_CACHE_TIMEOUT = 300
+
+# Change feed (GET /api/sync/, clients/sync.py). Cursors stay SETTLE_SECONDS
+# behind the clock so rows committed late are still picked up; allow for
+# transaction length, replica lag and clock skew between app servers.
+# Deletions are kept for TOMBSTONE_DAYS (see prune_tombstones).
+SYNC_FEED = {
+    'PAGE_SIZE': 500,
+    'MAX_PAGE_SIZE': 2000,
+    'SETTLE_SECONDS': 10,
+    'TOMBSTONE_DAYS': 90,
+}
+
+# API documentation (/swagger/, /redoc/, /swagger.json, /swagger.yaml; see
+# healthcare/api_docs.py). The schema is read from the files that
+# build_schema writes to SCHEMA_DIR, or generated once per process if there
+# are none. With API_DOCS=0 the URLs are left out and drf_yasg is never
+# imported.
+API_DOCS = {
+    'ENABLED': env_bool(os.environ, 'API_DOCS', True),
+    'SCHEMA_DIR': os.environ.get('API_SCHEMA_DIR') or BASE_DIR / 'schema',
+}
+if API_DOCS['ENABLED']:
+    INSTALLED_APPS.append('drf_yasg')
+# The UI pages load the prebuilt schema rather than generating their own.
+SWAGGER_SETTINGS = {'SPEC_URL': 'schema-json'}
+REDOC_SETTINGS = {'SPEC_URL': 'schema-json'}
+
 # Email settings Mailpit
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'localhost'
@@ -111,6 +226,16 @@ EMAIL_HOST_USER = ''
 EMAIL_HOST_PASSWORD = ''
 DEFAULT_FROM_EMAIL = 'no-reply@healthcare.local'
 
+# Outgoing mail is queued in the database and delivered by the
+# send_queued_mail management command, never on the request path.
+EMAIL_OUTBOX = {
+    'BATCH_SIZE': 50,  # messages sent per SMTP connection
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_SECONDS': 30,  # doubled after each failed attempt
+    'MAX_BACKOFF_SECONDS': 3600,
+    'LEASE_SECONDS': 300,  # claimed messages are retried if a worker dies
+}
+
 # CORS
 CORS_ALLOWED_ORIGINS = [
     'http://localhost:3000'
@@ -124,6 +249,20 @@ SECURE_BROWSER_XSS_FILTER = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
 X_FRAME_OPTIONS = 'DENY'
 
+# Password hashing
+# PBKDF2 work factor. Each login costs one hash of this many iterations, so
+# lower it to trade brute-force resistance for login throughput. Defaults to
+# Django's own count when unset.
+PASSWORD_HASH_ITERATIONS = int(os.environ.get('PASSWORD_HASH_ITERATIONS', 0)) or None
+
+PASSWORD_HASHERS = [
+    'healthcare.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
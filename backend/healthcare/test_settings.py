@@ -0,0 +1,29 @@
+"""
+Settings for the test suite, used by ``manage.py test``: the project
+settings plus a second SQLite database, ``replica``, standing in for a read
+replica (see ReplicaRoutingTests). It is left out of DATABASE_REPLICAS, so
+requests only read from it where a test overrides that setting.
+
+A file-based default cache gets a private directory of its own, so a test
+run never shares entries with a development server.
+"""
+import atexit
+import shutil
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, CACHES, DATABASES
+
+if CACHES['default']['BACKEND'] == 'django.core.cache.backends.filebased.FileBasedCache':
+    CACHE_DIR = tempfile.mkdtemp(prefix='healthcare-test-cache-')
+    atexit.register(shutil.rmtree, CACHE_DIR, ignore_errors=True)
+    CACHES = {**CACHES, 'default': {**CACHES['default'], 'LOCATION': CACHE_DIR}}
+
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES = {
+        **DATABASES,
+        'replica': {
+            **DATABASES['default'],
+            'TEST': {**DATABASES['default'].get('TEST', {}), 'NAME': BASE_DIR / 'test_replica.sqlite3'},
+        },
+    }
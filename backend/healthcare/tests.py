@@ -0,0 +1,622 @@
+import gzip
+import json
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from clients.models import Client, Enrollment
+from programs.models import Program
+
+from . import api_docs, renderers
+from .authentication import CachedJWTAuthentication, UserCache, aauthenticate, blacklist, user_cache
+from .database import database_config, replica_configs
+from .executor import BoundedExecutor, ExecutorBusy
+from .instrumentation import db_queries, request_seconds, requests_total, response_bytes, serializer_seconds, sql_fingerprint
+from .metrics import Registry, registry
+from .renderers import FastJSONRenderer
+from .hashers import PBKDF2PasswordHasher
+from .mail import deliver_queued_mail, outbox_metrics, queue_mail
+from .models import QueuedEmail
+from .routers import ReplicaRouter, _read_alias
+
+# The SQLite stand-in for a read replica defined in healthcare.test_settings.
+REPLICA = 'replica'
+
+
+class LoginTestMixin:
+    password = 'S3cure-pass!'
+
+    def setUp(self):
+        super().setUp()
+        self.admin = get_user_model().objects.create_user(
+            username='admin', email='admin@healthcare.local', password=self.password, is_staff=True
+        )
+
+    def login(self, email='admin@healthcare.local', password=None):
+        return self.client.post(
+            reverse('token_obtain_pair'),
+            {'email': email, 'password': password or self.password},
+            format='json',
+        )
+
+
+class LoginTests(LoginTestMixin, APITestCase):
+
+    def test_password_is_hashed_once_per_login(self):
+        with mock.patch.object(PBKDF2PasswordHasher, 'verify', autospec=True, side_effect=PBKDF2PasswordHasher.verify) as verify:
+            response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), {'access', 'refresh'})
+        self.assertEqual(verify.call_count, 1)
+
+    def test_invalid_credentials(self):
+        response = self.login(password='wrong-password')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(QueuedEmail.objects.exists())
+
+    def test_only_staff_can_log_in(self):
+        self.admin.is_staff = False
+        self.admin.save()
+        response = self.login()
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn('access', response.data)
+
+    def test_hasher_cost_is_configurable(self):
+        with self.settings(PASSWORD_HASH_ITERATIONS=1000):
+            self.assertEqual(self.login().status_code, 200)
+            self.admin.refresh_from_db()
+            # The stored hash is upgraded to the configured cost on login.
+            self.assertTrue(self.admin.password.startswith('pbkdf2_sha256$1000$'))
+            self.assertEqual(self.login().status_code, 200)
+
+
+class LoginNotificationTests(LoginTestMixin, APITestCase):
+
+    def test_login_queues_notification_without_sending(self):
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages') as send:
+            response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access', response.data)
+        send.assert_not_called()
+
+        queued = QueuedEmail.objects.get()
+        self.assertEqual(queued.recipients, ['admin@healthcare.local'])
+        self.assertEqual(queued.status, QueuedEmail.PENDING)
+
+        deliver_queued_mail()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Account Login Notification')
+
+
+class OutboxDeliveryTests(TestCase):
+
+    def queue(self, count):
+        return [queue_mail(f'Subject {i}', 'Body', [f'user{i}@healthcare.local']) for i in range(count)]
+
+    def test_batch_is_sent_over_one_connection(self):
+        self.queue(5)
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.open') as open_connection:
+            stats = deliver_queued_mail(batch_size=3)
+        self.assertEqual(stats['sent'], 3)
+        self.assertEqual(open_connection.call_count, 1)
+        self.assertEqual(len(mail.outbox), 3)
+
+        call_command('send_queued_mail', stdout=mock.MagicMock())
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(QueuedEmail.objects.filter(status=QueuedEmail.SENT).count(), 5)
+
+    @override_settings(EMAIL_OUTBOX={'MAX_ATTEMPTS': 3, 'BACKOFF_SECONDS': 10})
+    def test_failures_back_off_then_give_up(self):
+        queued = self.queue(1)[0]
+        failing = mock.patch(
+            'django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('refused')
+        )
+        for attempt, delay in ((1, 10), (2, 20)):
+            with failing, self.assertLogs('healthcare.mail', 'WARNING'):
+                before = timezone.now()
+                self.assertEqual(deliver_queued_mail()['retried'], 1)
+            queued.refresh_from_db()
+            self.assertEqual((queued.status, queued.attempts), (QueuedEmail.PENDING, attempt))
+            self.assertGreaterEqual(queued.next_attempt_at, before + timedelta(seconds=delay))
+            # Not due again until the backoff elapses.
+            self.assertEqual(deliver_queued_mail(), {})
+            QueuedEmail.objects.update(next_attempt_at=timezone.now())
+
+        with failing, self.assertLogs('healthcare.mail', 'WARNING'):
+            self.assertEqual(deliver_queued_mail()['failed'], 1)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, QueuedEmail.FAILED)
+        self.assertEqual(queued.last_error, 'refused')
+
+    def test_expired_claims_are_redelivered(self):
+        self.queue(1)
+        QueuedEmail.objects.update(status=QueuedEmail.SENDING, next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(deliver_queued_mail()['sent'], 1)
+
+    def test_metrics(self):
+        self.queue(2)
+        deliver_queued_mail(batch_size=1)
+        metrics = outbox_metrics()
+        self.assertEqual((metrics['pending'], metrics['sent'], metrics['failed']), (1, 1, 0))
+        self.assertGreaterEqual(metrics['oldest_unsent_seconds'], 0)
+
+
+class CachedJWTAuthenticationTests(LoginTestMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        user_cache.clear()
+        blacklist.clear()
+        self.refresh = RefreshToken.for_user(self.admin)
+        self.access = str(self.refresh.access_token)
+
+    def authenticate(self, access=None):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {access or self.access}')
+        return CachedJWTAuthentication().authenticate(Request(request))
+
+    def test_cached_requests_cost_no_queries(self):
+        user, _ = self.authenticate()
+        self.assertEqual(user.pk, self.admin.pk)
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate()
+        self.assertEqual(user.email, self.admin.email)
+
+    def test_async_authentication_matches_sync(self):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        user, _ = async_to_sync(aauthenticate)(request)
+        self.assertEqual(user.pk, self.admin.pk)
+        with self.assertNumQueries(0):
+            user, _ = async_to_sync(aauthenticate)(request)
+        self.assertIsNone(async_to_sync(aauthenticate)(RequestFactory().get('/')))
+
+        blacklist.add(AccessToken(self.access)['jti'], timezone.now() + timedelta(hours=1))
+        with self.assertRaises(InvalidToken):
+            async_to_sync(aauthenticate)(request)
+
+    def test_user_save_invalidates_cache(self):
+        self.authenticate()
+        self.admin.is_active = False
+        self.admin.save()
+        with self.assertRaisesMessage(Exception, 'User is inactive'):
+            self.authenticate()
+
+    def test_logout_revokes_access_token_immediately(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        self.assertEqual(self.client.get(reverse('program-list')).status_code, 200)
+        response = self.client.post(reverse('logout'), {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 205)
+        self.assertEqual(self.client.get(reverse('program-list')).status_code, 401)
+
+    @override_settings(JWT_AUTH_CACHE={'BLACKLIST_REFRESH_INTERVAL': 30})
+    def test_revocation_elsewhere_applies_within_refresh_interval(self):
+        now = time.monotonic()
+        with mock.patch('healthcare.authentication.time.monotonic', return_value=now):
+            self.authenticate()
+        # Another worker blacklists the token.
+        token = RefreshToken(str(self.refresh)).access_token
+        outstanding = OutstandingToken.objects.create(
+            user=self.admin, jti=token['jti'], token=str(token), expires_at=timezone.now() + timedelta(hours=1),
+        )
+        BlacklistedToken.objects.create(token=outstanding)
+
+        access = str(token)
+        clock = 'healthcare.authentication.time.monotonic'
+        with mock.patch(clock, return_value=now + 29):
+            self.assertIsNotNone(self.authenticate(access))
+        with mock.patch(clock, return_value=now + 31), self.assertRaises(InvalidToken):
+            self.authenticate(access)
+
+    def test_blacklist_rows_committed_out_of_order_are_loaded(self):
+        def blacklisted(row_id):
+            token = RefreshToken.for_user(self.admin)
+            outstanding = OutstandingToken.objects.get(jti=token['jti'])
+            return BlacklistedToken.objects.create(id=row_id, token=outstanding).token.jti
+
+        later = blacklisted(20)
+        blacklist.refresh()
+        # A lower id, committed after the refresh above.
+        earlier = blacklisted(10)
+        blacklist.refresh()
+        self.assertTrue(blacklist.has(later))
+        self.assertTrue(blacklist.has(earlier))
+
+    def test_expired_blacklist_entries_are_dropped(self):
+        blacklist.add('expired', timezone.now() - timedelta(seconds=1))
+        blacklist.add('live', timezone.now() + timedelta(hours=1))
+        blacklist.refresh()
+        self.assertNotIn('expired', blacklist._expiry)
+        self.assertIn('live', blacklist._expiry)
+
+    def test_user_cache_eviction_and_ttl(self):
+        cache = UserCache(max_size=2, ttl=10)
+        cache.set(1, 'a')
+        cache.set(2, 'b')
+        cache.get(1)
+        cache.set(3, 'c')
+        self.assertEqual((cache.get(1), cache.get(2), cache.get(3)), ('a', None, 'c'))
+        with mock.patch('healthcare.authentication.time.monotonic', return_value=time.monotonic() + 11):
+            self.assertIsNone(cache.get(1))
+        self.assertEqual(len(cache), 1)
+
+
+class BoundedExecutorTests(SimpleTestCase):
+
+    def test_refuses_calls_beyond_max_pending(self):
+        executor = BoundedExecutor(max_workers=1, max_pending=2)
+        self.addCleanup(executor.shutdown)
+        release = threading.Event()
+        running = [executor.submit(release.wait), executor.submit(release.wait)]
+        with self.assertRaises(ExecutorBusy):
+            executor.submit(release.wait)
+        release.set()
+        for future in running:
+            future.result(timeout=5)
+        self.assertEqual(executor.submit(lambda: 'done').result(timeout=5), 'done')
+
+    def test_runs_in_the_callers_context(self):
+        executor = BoundedExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown)
+        token = _read_alias.set('replica-x')
+        self.addCleanup(_read_alias.reset, token)
+        self.assertEqual(async_to_sync(executor.run)(_read_alias.get), 'replica-x')
+
+
+class MetricsRegistryTests(SimpleTestCase):
+
+    def test_prometheus_text_format(self):
+        metrics = Registry()
+        counter = metrics.counter('demo_total', 'Things.', ['view'])
+        histogram = metrics.histogram('demo_seconds', 'Durations.', ['view'], buckets=(0.1, 1.0))
+        counter.inc('a"b')
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value, 'x')
+        self.assertEqual(metrics.render(), (
+            '# HELP demo_total Things.\n'
+            '# TYPE demo_total counter\n'
+            'demo_total{view="a\\"b"} 1\n'
+            '# HELP demo_seconds Durations.\n'
+            '# TYPE demo_seconds histogram\n'
+            'demo_seconds_bucket{view="x",le="0.1"} 1\n'
+            'demo_seconds_bucket{view="x",le="1.0"} 2\n'
+            'demo_seconds_bucket{view="x",le="+Inf"} 3\n'
+            'demo_seconds_sum{view="x"} 5.55\n'
+            'demo_seconds_count{view="x"} 3\n'
+        ))
+
+    def test_sql_fingerprint(self):
+        self.assertEqual(
+            sql_fingerprint("SELECT  *\n FROM t WHERE id IN (%s, %s, %s) AND name = 'x' LIMIT 21"),
+            'SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?',
+        )
+        self.assertEqual(
+            sql_fingerprint('INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s), (%s, %s)'),
+            'INSERT INTO t (a, b) VALUES (%s, %s), ...',
+        )
+
+
+@override_settings(PERF_METRICS={'SAMPLE_RATE': 1.0, 'SLOW_QUERY_MS': 10000, 'TOKEN': 'scrape-me'})
+class PerformanceMiddlewareTests(LoginTestMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        registry.clear()
+        self.client.force_authenticate(user=self.admin)
+
+    def test_sampled_request_is_measured(self):
+        client = Client.objects.create(first_name='Achieng', last_name='Odhiambo', age=30, phone_number='+254700000001', area_of_residence='Kisumu')
+        response = self.client.get(reverse('client-search') + '?q=achieng')
+        self.assertEqual(response.status_code, 200)
+        view = 'ClientViewSet.search'
+        self.assertEqual(requests_total.value(view, 'GET', '200'), 1)
+        self.assertEqual(request_seconds.count(view), 1)
+        self.assertEqual(serializer_seconds.count(view), 1)
+        self.assertGreater(serializer_seconds._values[(view,)][-1], 0)
+        # FTS lookup, then the clients and their enrollments.
+        self.assertEqual(db_queries._values[(view,)][-1], 3)
+        self.assertEqual(response_bytes._values[(view,)][-1], len(response.content))
+        self.assertEqual(client.pk, response.json()['results'][0]['id'])
+
+    def test_rendering_counts_as_serialization(self):
+        self.client.get(reverse('program-list'))
+        self.assertEqual(serializer_seconds.count('ProgramViewSet.list'), 1)
+        self.assertGreater(serializer_seconds._values[('ProgramViewSet.list',)][-1], 0)
+
+    def test_nonstandard_methods_share_one_label(self):
+        for method in ('BREW', 'PROPFIND'):
+            self.assertEqual(self.client.generic(method, reverse('program-list')).status_code, 405)
+        self.assertEqual(requests_total.value('ProgramViewSet.other', 'other', '405'), 2)
+        self.assertEqual(request_seconds.count('ProgramViewSet.other'), 2)
+
+    @override_settings(PERF_METRICS={'SAMPLE_RATE': 0.0, 'SLOW_QUERY_MS': 0})
+    def test_unsampled_requests_are_counted_and_slow_queries_logged(self):
+        with self.assertLogs('healthcare.slow_queries', 'WARNING') as logs:
+            self.client.get(reverse('program-list'))
+        self.assertEqual(requests_total.value('ProgramViewSet.list', 'GET', '200'), 1)
+        self.assertEqual(request_seconds.count('ProgramViewSet.list'), 0)
+        self.assertIn('in ProgramViewSet.list', logs.output[0])
+        self.assertIn('FROM "programs_program"', logs.output[0])
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('program-list'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-me')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('healthcare_requests_total{view="ProgramViewSet.list",method="GET",status="200"} 1', body)
+        self.assertIn('healthcare_request_duration_seconds_count{view="ProgramViewSet.list"} 1', body)
+
+
+class FastJSONRendererTests(SimpleTestCase):
+
+    def assertSameBytes(self, data, accepted_media_type=None):
+        self.assertEqual(
+            FastJSONRenderer().render(data, accepted_media_type),
+            JSONRenderer().render(data, accepted_media_type),
+        )
+
+    @skipUnless(renderers.orjson, 'orjson is not installed')
+    def test_matches_json_renderer(self):
+        self.assertSameBytes({
+            'text': 'Wanjirũ \u2028 \u2029 "quoted" \\ / \x1f \n\t',
+            'numbers': [0, -1, 2 ** 63 - 1], 'flags': [True, False, None],
+            'nested': [{'b': 1, 'a': []}, {}],
+            'when': timezone.now(), 'day': timezone.now().date(),
+            1: 'integer key',
+        })
+        self.assertSameBytes(None)
+
+    @skipUnless(renderers.orjson, 'orjson is not installed')
+    def test_falls_back_when_orjson_differs(self):
+        self.assertSameBytes({'big': 2 ** 70})
+        self.assertSameBytes({'a': [1, 2]}, 'application/json; indent=4')
+
+    def test_works_without_orjson(self):
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertSameBytes({'text': 'Wanjirũ \u2028', 'when': timezone.now(), 'big': 2 ** 70})
+
+
+class DatabaseConfigTests(SimpleTestCase):
+    base_dir = Path('/srv/healthcare')
+
+    def test_sqlite_by_default(self):
+        config = database_config(self.base_dir, environ={})
+        self.assertEqual(config['NAME'], self.base_dir / 'db.sqlite3')
+        self.assertEqual(config['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        self.assertIn('PRAGMA journal_mode=WAL', config['OPTIONS']['init_command'])
+        self.assertIn('PRAGMA busy_timeout=5000', config['OPTIONS']['init_command'])
+        self.assertEqual(config['TEST']['NAME'], self.base_dir / 'test_db.sqlite3')
+
+    def test_postgresql_with_persistent_connections(self):
+        config = database_config(self.base_dir, environ={
+            'DB_ENGINE': 'postgresql', 'DB_NAME': 'hc', 'DB_HOST': 'db', 'DB_CONN_MAX_AGE': '300',
+        })
+        self.assertEqual(config['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual((config['NAME'], config['HOST']), ('hc', 'db'))
+        self.assertEqual(config['CONN_MAX_AGE'], 300)
+        self.assertTrue(config['CONN_HEALTH_CHECKS'])
+        self.assertNotIn('pool', config['OPTIONS'])
+
+    def test_postgresql_pool_replaces_persistent_connections(self):
+        config = database_config(self.base_dir, environ={
+            'DB_ENGINE': 'postgres', 'DB_POOL': 'true', 'DB_POOL_MAX_SIZE': '20',
+        })
+        self.assertEqual(config['CONN_MAX_AGE'], 0)
+        self.assertEqual(config['OPTIONS']['pool'], {'min_size': 2, 'max_size': 20, 'timeout': 30})
+
+    def test_replicas_copy_the_primary(self):
+        primary = database_config(self.base_dir, environ={'DB_ENGINE': 'postgresql', 'DB_PORT': '5432'})
+        replicas = replica_configs(primary, environ={'DB_REPLICA_HOSTS': 'replica-a, replica-b:6432'})
+        self.assertEqual(list(replicas), ['replica1', 'replica2'])
+        self.assertEqual((replicas['replica1']['HOST'], replicas['replica1']['PORT']), ('replica-a', '5432'))
+        self.assertEqual((replicas['replica2']['HOST'], replicas['replica2']['PORT']), ('replica-b', '6432'))
+        self.assertEqual(replicas['replica1']['TEST'], {'MIRROR': 'default'})
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            database_config(self.base_dir, environ={'DB_ENGINE': 'oracle'})
+
+
+class SQLiteConnectionTests(TestCase):
+
+    def test_pragmas_are_applied_on_connect(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite only')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+
+@skipUnless(REPLICA in connections, 'Needs the SQLite replica stand-in')
+@override_settings(DATABASE_REPLICAS=[REPLICA], REPLICA_LAG_TOLERANCE=5)
+class ReplicaRoutingTests(APITestCase):
+    """
+    The primary and the replica hold different rows, so each response shows
+    which database served it.
+    """
+    databases = {'default', REPLICA}
+
+    def setUp(self):
+        self.admin = get_user_model().objects.create_user(
+            username='admin', email='admin@healthcare.local', password='pass12345', is_staff=True
+        )
+        self.client.force_authenticate(user=self.admin)
+        for alias in ('default', REPLICA):
+            Client.objects.using(alias).create(
+                first_name=alias.title(), last_name='Client', age=30, phone_number='+254700000001',
+                area_of_residence='Nairobi',
+            )
+
+    def names(self):
+        response = self.client.get(reverse('client-list'))
+        self.assertEqual(response.status_code, 200)
+        return sorted(row['first_name'] for row in response.data['results'])
+
+    def test_safe_requests_read_from_replica(self):
+        self.assertEqual(self.names(), ['Replica'])
+        Program.objects.using(REPLICA).create(name='Replica program', short_code='RP')
+        response = self.client.get(reverse('program-list'))
+        self.assertEqual([row['name'] for row in response.data['results']], ['Replica program'])
+
+    def test_client_reads_its_writes_within_lag_tolerance(self):
+        response = self.client.post(reverse('client-list'), {
+            'first_name': 'Written', 'last_name': 'Client', 'age': 41,
+            'phone_number': '+254700000002', 'area_of_residence': 'Nakuru',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Client.objects.filter(first_name='Written').exists())
+        self.assertFalse(Client.objects.using(REPLICA).filter(first_name='Written').exists())
+
+        self.assertEqual(self.names(), ['Default', 'Written'])
+        with mock.patch('healthcare.routers.time.time', return_value=time.time() + 6):
+            self.assertEqual(self.names(), ['Replica'])
+
+    def test_reads_after_a_write_in_the_same_request_use_primary(self):
+        router = ReplicaRouter()
+        token = _read_alias.set(REPLICA)
+        try:
+            self.assertEqual(router.db_for_read(Client), REPLICA)
+            self.assertEqual(router.db_for_write(Client), 'default')
+            self.assertIsNone(router.db_for_read(Client))
+        finally:
+            _read_alias.reset(token)
+
+    def test_primary_only_without_replicas_or_outside_requests(self):
+        self.assertEqual(Client.objects.get().first_name, 'Default')
+        with self.settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(self.names(), ['Default'])
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000)
+class BenchmarkAPICommandTests(TestCase):
+
+    def test_reports_every_endpoint_and_leaves_the_data_alone(self):
+        call_command('seed_synthetic', clients=40, programs=2, stdout=io.StringIO(), stderr=io.StringIO())
+        before = (Client.objects.count(), Enrollment.objects.count(), Program.objects.count(),
+                  get_user_model().objects.count(), QueuedEmail.objects.count())
+        out = io.StringIO()
+        call_command('benchmark_api', requests=3, warmup=1, stdout=out)
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(report['dataset'], {'clients': 40, 'programs': 2, 'enrollments': before[1]})
+        self.assertEqual(
+            list(report['results']),
+            ['client_list', 'client_search', 'client_profile', 'program_list', 'enrollment_create', 'login'],
+        )
+        for endpoint, result in report['results'].items():
+            self.assertEqual(result['errors'], 0, endpoint)
+            self.assertEqual(result['requests'], 3)
+            self.assertGreater(result['queries_per_request'], 0)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertEqual(
+            (Client.objects.count(), Enrollment.objects.count(), Program.objects.count(),
+             get_user_model().objects.count(), QueuedEmail.objects.count()),
+            before,
+        )
+
+    def test_needs_clients(self):
+        with self.assertRaisesMessage(CommandError, 'run seed_synthetic first'):
+            call_command('benchmark_api', stdout=io.StringIO())
+
+
+class APIDocsTests(SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.schema_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.schema_dir.cleanup)
+        docs = override_settings(API_DOCS={'ENABLED': True, 'SCHEMA_DIR': self.schema_dir.name})
+        docs.enable()
+        self.addCleanup(docs.disable)
+        api_docs.clear_schema_cache()
+        self.addCleanup(api_docs.clear_schema_cache)
+
+    def test_schema_is_generated_once(self):
+        with mock.patch.object(api_docs, 'generate_schema', wraps=api_docs.generate_schema) as generate:
+            for _ in range(3):
+                response = self.client.get(reverse('schema-json'))
+                self.assertEqual(response.status_code, 200)
+            self.assertEqual(self.client.get(reverse('schema-yaml')).status_code, 200)
+        self.assertEqual(generate.call_count, 1)
+        schema = json.loads(response.content)
+        self.assertEqual(schema['info']['version'], api_docs.SCHEMA_VERSION)
+        parameters = {p['name']: p for p in schema['paths']['/clients/']['get']['parameters']}
+        self.assertEqual(parameters['age_min']['type'], 'integer')
+        self.assertEqual(parameters['age_max']['type'], 'integer')
+        self.assertEqual(parameters['program']['type'], 'string')
+
+    def test_etag_and_gzip(self):
+        plain = self.client.get(reverse('schema-json'))
+        gzipped = self.client.get(reverse('schema-json'), HTTP_ACCEPT_ENCODING='br, gzip')
+        self.assertEqual(gzipped['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(gzipped.content), plain.content)
+        self.assertLess(len(gzipped.content), len(plain.content) / 4)
+        self.assertNotEqual(plain['ETag'], gzipped['ETag'])
+        self.assertFalse(plain['ETag'].startswith('W/'))
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        not_modified = self.client.get(reverse('schema-json'), HTTP_IF_NONE_MATCH=gzipped['ETag'], HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], gzipped['ETag'])
+        # The ETag of the gzip copy does not match the uncompressed one.
+        self.assertEqual(self.client.get(reverse('schema-json'), HTTP_IF_NONE_MATCH=gzipped['ETag']).status_code, 200)
+
+    def test_build_schema_files_are_served(self):
+        call_command('build_schema', stdout=io.StringIO())
+        call_command('build_schema', check=True, stdout=io.StringIO())
+        built = (Path(self.schema_dir.name) / f'openapi-{api_docs.SCHEMA_VERSION}.json').read_bytes()
+        with mock.patch.object(api_docs, 'generate_schema') as generate:
+            self.assertEqual(self.client.get(reverse('schema-json')).content, built)
+            self.assertTrue(self.client.get(reverse('schema-yaml')).content.startswith(b'swagger:'))
+        generate.assert_not_called()
+
+        (Path(self.schema_dir.name) / f'openapi-{api_docs.SCHEMA_VERSION}.yaml').write_text('swagger: "2.0"\n')
+        with self.assertRaisesMessage(CommandError, 'Out of date'):
+            call_command('build_schema', check=True, stdout=io.StringIO())
+
+    def test_ui_pages_load_the_built_schema(self):
+        with mock.patch.object(api_docs, 'generate_schema') as generate:
+            for name in ('schema-swagger-ui', 'schema-redoc'):
+                response = self.client.get(reverse(name))
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, reverse('schema-json'))
+        generate.assert_not_called()
+        legacy = self.client.get(reverse('schema-swagger-ui'), {'format': 'openapi'})
+        self.assertEqual(json.loads(legacy.content)['swagger'], '2.0')
+
+    def test_drf_yasg_is_not_imported_when_disabled(self):
+        code = (
+            'import sys, django; django.setup(); import healthcare.urls; '
+            'from django.urls import resolve; resolve("/api/clients/"); '
+            'print(any(name.startswith("drf_yasg") for name in sys.modules))'
+        )
+        env = {**os.environ, 'API_DOCS': '0', 'DJANGO_SETTINGS_MODULE': 'healthcare.settings'}
+        result = subprocess.run([sys.executable, '-c', code], cwd=settings.BASE_DIR, env=env,
+                                capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), 'False')
@@ -14,29 +14,16 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework_simplejwt.views import TokenRefreshView
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-from rest_framework import permissions
+from .instrumentation import metrics_view
 from .views import CustomTokenObtainPairView, AdminLoginView, LogoutView
 
-schema_view = get_schema_view(
-    openapi.Info(
-        title="Healthcare API",
-        default_version='v1',
-        description="API for managing clients, programs, and enrollments. Authenticate using email and password.",
-        terms_of_service="https://www.example.com/terms/",
-        contact=openapi.Contact(email="contact@example.com"),
-        license=openapi.License(name="MIT License"),
-    ),
-    public=True,
-    permission_classes=[permissions.AllowAny],
-)
-
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('api/', include([
         path('', include('programs.urls')),
         path('', include('clients.urls')),
@@ -45,6 +32,15 @@ urlpatterns = [
         path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
         path('logout/', LogoutView.as_view(), name='logout'),
     ])),
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
-]
\ No newline at end of file
+]
+
+if settings.API_DOCS['ENABLED']:
+    # api_docs imports drf_yasg only when a schema or page is first requested.
+    from .api_docs import docs_ui_view, schema_view
+
+    urlpatterns += [
+        path('swagger.json', schema_view, {'file_format': 'json'}, name='schema-json'),
+        path('swagger.yaml', schema_view, {'file_format': 'yaml'}, name='schema-yaml'),
+        path('swagger/', docs_ui_view, {'ui': 'swagger'}, name='schema-swagger-ui'),
+        path('redoc/', docs_ui_view, {'ui': 'redoc'}, name='schema-redoc'),
+    ]
@@ -1,24 +1,28 @@
-from rest_framework import generics, status
+from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.tokens import RefreshToken
 from .serializers import CustomTokenObtainPairSerializer
 from django.contrib.auth import user_logged_in
-from django.core.mail import send_mail
 from django.utils import timezone
 from datetime import datetime, timezone  # Imported timezone from datetime
+from .authentication import RevocableAccessToken, blacklist
+from .mail import queue_mail
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
     def post(self, request, *args, **kwargs):
+        # A single validation pass checks the password and mints the tokens;
+        # calling super().post() here would authenticate all over again.
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.user
         if not user.is_staff:
             return Response({"error": "Only admin users can log in"}, status=status.HTTP_403_FORBIDDEN)
-        response = super().post(request, *args, **kwargs)
+        response = Response(serializer.validated_data, status=status.HTTP_200_OK)
 
         # Trigger login notification
         ip_address = request.META.get('REMOTE_ADDR', 'Unknown')
@@ -37,16 +41,9 @@ class CustomTokenObtainPairView(TokenObtainPairView):
         Regards,
         Healthcare System
         """
-        try:
-            send_mail(
-                subject,
-                message,
-                'no-reply@healthcare.local',
-                [user.email],
-                fail_silently=False,
-            )
-        except Exception as e:
-            print(f"Email sending failed: {e}")
+        # Delivered by the send_queued_mail worker so a slow or unreachable
+        # mail server never delays the login response.
+        queue_mail(subject, message, [user.email], 'no-reply@healthcare.local')
 
         user_logged_in.send(sender=user.__class__, request=request, user=user)
         return response
@@ -54,7 +51,7 @@ class CustomTokenObtainPairView(TokenObtainPairView):
 class AdminLoginView(CustomTokenObtainPairView):
     pass
 
-class LogoutView(generics.GenericAPIView):
+class LogoutView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
@@ -62,6 +59,10 @@ class LogoutView(generics.GenericAPIView):
             refresh_token = request.data.get("refresh")
             token = RefreshToken(refresh_token)
             token.blacklist()
+            # Revoke the access token too, or it stays usable until it expires.
+            if request.auth is not None:
+                revoked, _ = RevocableAccessToken(str(request.auth)).blacklist()
+                blacklist.add(revoked.token.jti, revoked.token.expires_at)
             return Response(status=status.HTTP_205_RESET_CONTENT)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class ProgramsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'programs'
+
+    def ready(self):
+        from django.core import checks
+        from .cache import bump_version, check_shared_cache
+        from .models import Program
+        checks.register(check_shared_cache, checks.Tags.caches)
+        post_save.connect(bump_version, sender=Program, dispatch_uid='programs.catalog.save')
+        post_delete.connect(bump_version, sender=Program, dispatch_uid='programs.catalog.delete')
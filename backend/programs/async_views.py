@@ -0,0 +1,33 @@
+"""
+Async version of the program list for ASGI deployments, with the same
+payload, pagination and ETag as ProgramViewSet.list; see
+healthcare.async_api.
+"""
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from healthcare.async_api import async_api_view, json_response
+from healthcare.instrumentation import timed_serialization
+from healthcare.pagination import KeysetPagination
+from .cache import program_catalog
+from .models import Program
+from .serializers import ProgramSerializer
+from .views import list_etag
+
+
+@async_api_view
+async def program_list(request):
+    etag = list_etag(request, await program_catalog.aversion())
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        paginator = KeysetPagination()
+        page = await paginator.apaginate_queryset(Program.objects.all(), request)
+        with timed_serialization():
+            data = ProgramSerializer(page, many=True).data
+        if page is not None:
+            data = {'next': paginator.get_next_link(), 'previous': paginator.get_previous_link(), 'results': data}
+        response = json_response(data)
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
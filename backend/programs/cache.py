@@ -0,0 +1,136 @@
+import threading
+import uuid
+from collections import namedtuple
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+VERSION_KEY = 'programs:catalog:version'
+# Cache backends whose entries are private to one process.
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+ProgramEntry = namedtuple('ProgramEntry', ['pk', 'name', 'short_code'])
+
+
+def set_new_version():
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def bump_version(using=None, **kwargs):
+    """
+    post_save/post_delete handler for Program. Each worker compares the
+    shared version with the one it loaded and reloads on mismatch, so the
+    default cache must be shared between workers (see CACHES in settings
+    and check_shared_cache) for changes to propagate beyond the current
+    process.
+
+    The version is bumped straight away and again on commit, so a worker
+    that reloads before the change is visible to it reloads once more.
+    """
+    set_new_version()
+    transaction.on_commit(set_new_version, using=using)
+
+
+class ProgramCatalog:
+    """Process-local map of program id to name and short code."""
+
+    def __init__(self):
+        self._entries = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+            version = cache.get(VERSION_KEY)
+        return version
+
+    def entries(self):
+        """Return the current id -> ProgramEntry map, reloading it if stale."""
+        version = self.version
+        if version != self._version:
+            self.reload(version)
+        return self._entries
+
+    async def aversion(self):
+        """version for async views."""
+        version = await cache.aget(VERSION_KEY)
+        if version is None:
+            await cache.aadd(VERSION_KEY, uuid.uuid4().hex, None)
+            version = await cache.aget(VERSION_KEY)
+        return version
+
+    async def aentries(self):
+        """entries() for async views; a reload runs through sync_to_async."""
+        version = await self.aversion()
+        if version != self._version:
+            await sync_to_async(self.reload)(version)
+        return self._entries
+
+    def reload(self, version=None):
+        from .models import Program
+
+        version = version or self.version
+        # Read from the primary: a lagging replica would cache stale entries
+        # under the new version.
+        rows = Program.objects.using(DEFAULT_DB_ALIAS).order_by().values_list('id', 'name', 'short_code')
+        with self._lock:
+            self._entries = {row[0]: ProgramEntry(*row) for row in rows}
+            self._version = version
+
+    def get(self, program_id):
+        return self.get_many([program_id])[program_id]
+
+    def get_many(self, program_ids):
+        """
+        Return {id: ProgramEntry or None} for ``program_ids``. Ids missing
+        from the catalog are looked up in one query: the program may have
+        been created after our last reload while the version bump is still
+        in flight.
+        """
+        entries = self.entries()
+        missing = {program_id for program_id in program_ids if program_id not in entries}
+        if missing:
+            entries = self.load_missing(missing)
+        return {program_id: entries.get(program_id) for program_id in program_ids}
+
+    async def aget_many(self, program_ids):
+        """get_many() for async views; the lookup runs through sync_to_async."""
+        entries = await self.aentries()
+        missing = {program_id for program_id in program_ids if program_id not in entries}
+        if missing:
+            entries = await sync_to_async(self.load_missing)(missing)
+        return {program_id: entries.get(program_id) for program_id in program_ids}
+
+    def load_missing(self, program_ids):
+        """Add the programs ``program_ids`` to the entries and return them."""
+        from .models import Program
+
+        rows = Program.objects.using(DEFAULT_DB_ALIAS).filter(id__in=program_ids).values_list('id', 'name', 'short_code')
+        found = {row[0]: ProgramEntry(*row) for row in rows}
+        with self._lock:
+            if found:
+                self._entries = {**self._entries, **found}
+            return self._entries
+
+
+def check_shared_cache(app_configs=None, **kwargs):
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if backend in PROCESS_LOCAL_CACHES:
+        return [checks.Warning(
+            f'The default cache ({backend}) is not shared between processes, so program '
+            'changes made in one worker are not seen by the others.',
+            hint='Use a file-based, memcached or Redis cache (CACHE_BACKEND, CACHE_LOCATION).',
+            id='programs.W001',
+        )]
+    return []
+
+
+program_catalog = ProgramCatalog()
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2025-05-23 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('programs', '0002_program_short_code'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='program',
+            index=models.Index(fields=['updated_at', 'id'], name='program_updated_idx'),
+        ),
+    ]
@@ -13,4 +13,10 @@ class Program(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+    class Meta:
+        indexes = [
+            # Range scans of the sync feed.
+            models.Index(fields=['updated_at', 'id'], name='program_updated_idx'),
+        ]
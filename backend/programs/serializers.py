@@ -1,7 +1,33 @@
 from rest_framework import serializers
+from .cache import program_catalog
 from .models import Program
 
 class ProgramSerializer(serializers.ModelSerializer):
     class Meta:
         model = Program
-        fields = ['id', 'name', 'short_code', 'description', 'created_at', 'updated_at']
\ No newline at end of file
+        fields = ['id', 'name', 'short_code', 'description', 'created_at', 'updated_at']
+
+class CatalogProgramField(serializers.CharField):
+    """
+    Read-only program attribute looked up in the program catalog by the
+    object's ``program_id``, so serializing related rows needs no join or
+    extra query. The catalog is checked for staleness once per serializer
+    context, i.e. once per request.
+
+    Async views pass every program they will render in the context (see
+    ProgramCatalog.aget_many): a lookup here would query from the event
+    loop.
+    """
+
+    def __init__(self, attribute, **kwargs):
+        self.attribute = attribute
+        kwargs['source'] = 'program_id'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, program_id):
+        entries = self.context.get('program_catalog')
+        if entries is None:
+            entries = self.context['program_catalog'] = program_catalog.entries()
+        entry = entries[program_id] if program_id in entries else program_catalog.get(program_id)
+        return getattr(entry, self.attribute) if entry else None
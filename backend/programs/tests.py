@@ -1,3 +1,91 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from .cache import VERSION_KEY, check_shared_cache, program_catalog
+from .models import Program
 
-# Create your tests here.
+
+class AdminAPITestCase(APITestCase):
+
+    def setUp(self):
+        admin = get_user_model().objects.create_user(
+            username='admin', email='admin@healthcare.local', password='pass12345', is_staff=True
+        )
+        self.client.force_authenticate(user=admin)
+
+
+class ProgramListTests(AdminAPITestCase):
+
+    def test_list_is_paginated_by_id(self):
+        programs = [
+            Program.objects.create(name=f'Program {i}', short_code=f'P{i}') for i in range(5)
+        ]
+        response = self.client.get(reverse('program-list') + '?page_size=3')
+        self.assertEqual([row['id'] for row in response.data['results']], [p.id for p in programs[:3]])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([row['id'] for row in response.data['results']], [p.id for p in programs[3:]])
+        self.assertIsNone(response.data['next'])
+
+
+class ProgramCatalogTests(AdminAPITestCase):
+
+    def test_catalog_reloads_only_after_program_changes(self):
+        program = Program.objects.create(name='Tuberculosis', short_code='TB')
+        self.assertEqual(program_catalog.get(program.pk).short_code, 'TB')
+        with self.assertNumQueries(0):
+            self.assertEqual(program_catalog.get(program.pk).name, 'Tuberculosis')
+
+        program.short_code = 'TBC'
+        program.save()
+        self.assertEqual(program_catalog.get(program.pk).short_code, 'TBC')
+        program.delete()
+        self.assertNotIn(program.pk, program_catalog.entries())
+
+    def test_version_change_from_another_worker_triggers_reload(self):
+        program = Program.objects.create(name='Malaria', short_code='MAL')
+        program_catalog.entries()
+        Program.objects.filter(pk=program.pk).update(name='Malaria Control')
+        self.assertEqual(program_catalog.get(program.pk).name, 'Malaria')
+        cache.set(VERSION_KEY, 'bumped-elsewhere')
+        self.assertEqual(program_catalog.get(program.pk).name, 'Malaria Control')
+
+    def test_version_bumped_through_a_separate_cache_instance(self):
+        # Another worker has its own cache client; the default backend must
+        # be one whose entries it can see.
+        self.assertEqual(check_shared_cache(), [])
+        other_worker = caches.create_connection('default')
+        self.assertIsNot(other_worker, cache)
+        program = Program.objects.create(name='Diabetes', short_code='DM')
+        program_catalog.entries()
+        Program.objects.filter(pk=program.pk).update(short_code='DM2')
+        other_worker.set(VERSION_KEY, 'bumped-by-another-worker', None)
+        self.assertEqual(program_catalog.get(program.pk).short_code, 'DM2')
+
+    def test_missing_ids_are_looked_up_in_one_query(self):
+        programs = [Program.objects.create(name=f'Program {i}', short_code=f'P{i}') for i in range(3)]
+        program_catalog.entries()
+        created = Program.objects.bulk_create([Program(name='Late', short_code='LATE')])[0]
+        with self.assertNumQueries(1):
+            found = program_catalog.get_many([programs[0].pk, created.pk, 999999])
+        self.assertEqual(found[created.pk].short_code, 'LATE')
+        self.assertIsNone(found[999999])
+        with self.assertNumQueries(0):
+            self.assertEqual(program_catalog.get(created.pk).name, 'Late')
+
+    def test_list_supports_conditional_requests(self):
+        Program.objects.create(name='HIV', short_code='HIV')
+        url = reverse('program-list')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertEqual(response.status_code, 200)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertNotEqual(self.client.get(url + '?page_size=1')['ETag'], etag)
+
+        Program.objects.create(name='Nutrition', short_code='NUT')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
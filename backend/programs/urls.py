@@ -1,5 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import ProgramViewSet
 
 router = DefaultRouter()
@@ -7,4 +8,5 @@ router.register(r'programs', ProgramViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('async/programs/', async_views.program_list, name='async-program-list'),
 ]
\ No newline at end of file
@@ -1,7 +1,38 @@
-from rest_framework import viewsets
+import hashlib
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from clients.stats import program_stats
+from .cache import program_catalog
 from .models import Program
 from .serializers import ProgramSerializer
 
+def list_etag(request, version):
+    # Every Program write bumps the catalog version, so version plus the
+    # query string (page, cursor) identifies the response body.
+    key = f'{version}:{request.get_full_path()}'
+    return f'"{hashlib.md5(key.encode()).hexdigest()}"'
+
 class ProgramViewSet(viewsets.ModelViewSet):
     queryset = Program.objects.all()
-    serializer_class = ProgramSerializer
\ No newline at end of file
+    serializer_class = ProgramSerializer
+
+    def list(self, request, *args, **kwargs):
+        etag = list_etag(request, program_catalog.version)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = super().list(request, *args, **kwargs)
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """
+        Enrollment totals per program, broken down by the clients' area of
+        residence and by month. Served from the EnrollmentStat summary rows.
+        """
+        return Response({"results": program_stats()})